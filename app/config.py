@@ -6,12 +6,24 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 HELP_URL = os.getenv("HELP_URL")
-# DB_HOST = os.getenv("DB_HOST")
-# DB_USER = os.getenv("DB_USER")
-# DB_PASSWORD = os.getenv("DB_PASSWORD")
-# DB_NAME = os.getenv("DB_NAME")
-# DB_TYPE = os.getenv("DB_TYPE", "sqlite") # Выбор СУБД ('mysql' или 'sqlite'). Значение по умолчанию - sqlite
+DB_TYPE = os.getenv("DB_TYPE", "sqlite") # Выбор СУБД ('postgresql' или 'sqlite'). Значение по умолчанию - sqlite
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_NAME = os.getenv("DB_NAME", "poizon_bot")
 SQLITE_FILE = os.getenv("SQLITE_FILE", "poizon_bot.db")
+
+# Профиль SQLite: применяется к каждому новому соединению (PRAGMA).
+# Пустое значение отключает соответствующую настройку.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = os.getenv("SQLITE_CACHE_SIZE", "-20000")  # отрицательное значение — в КиБ (~20 МБ)
+SQLITE_MMAP_SIZE = os.getenv("SQLITE_MMAP_SIZE", "268435456")  # 256 МБ
+SQLITE_BUSY_TIMEOUT = os.getenv("SQLITE_BUSY_TIMEOUT", "5000")  # мс
+# Пул соединений к БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 # # Получение id админов из .env файла, при отсутствии переменной, вернет пустой список
 # ADMIN_IDS = [int(admin_id) for admin_id in os.getenv("ADMIN_IDS", "").split(",") if admin_id]
 
@@ -19,6 +31,71 @@ SQLITE_FILE = os.getenv("SQLITE_FILE", "poizon_bot.db")
 ADMIN_IDS = [int(admin_id) for admin_id in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if admin_id]
 MANAGER_TELEGRAM_ID = os.getenv("MANAGER_TELEGRAM_ID")
 
+# Курс юаня ЦБ РФ: адрес сервиса, имя курса в таблице exchange_rates и период обновления (сек.).
+# По умолчанию курс пишется в cny_to_rub — его читают расчет цены и корзина, поэтому курс из прайса
+# администратора перезаписывается при обновлении. CBR_REFRESH_INTERVAL=0 отключает фоновое обновление
+# (курс задается только прайсом); другое CBR_RATE_NAME сохраняет курс ЦБ отдельно, не влияя на цены.
+CBR_URL = os.getenv("CBR_URL", "https://www.cbr-xml-daily.ru/daily_json.js")
+CBR_RATE_NAME = os.getenv("CBR_RATE_NAME", "cny_to_rub")
+CBR_REFRESH_INTERVAL = int(os.getenv("CBR_REFRESH_INTERVAL", "3600"))
+
+# Кэш профилей пользователей по Telegram ID: максимальный размер и время жизни записи (сек.)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# Хранилище состояний FSM: 'memory' (по умолчанию aiogram), 'sqlite' (таблица fsm_records в БД бота)
+# или 'redis' (нужен пакет redis и REDIS_URL). FSM_FLUSH_DELAY — задержка (сек.) пакетной записи в БД,
+# FSM_CACHE_SIZE — сколько записей 'sqlite' держит в памяти (давно не использованные читаются из БД заново).
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+FSM_FLUSH_DELAY = float(os.getenv("FSM_FLUSH_DELAY", "1.0"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Лимиты исходящих сообщений Telegram: всего сообщений в секунду, в секунду на один чат
+# и допустимая пачка сообщений в один чат
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "3"))
+
+# Режим работы: 'polling' (по умолчанию) или 'webhook' (aiohttp-сервер за обратным прокси).
+# WEBHOOK_BASE_URL — публичный адрес (https://example.com); если пусто, webhook в Telegram не
+# регистрируется (удобно для локальной проверки POST-запросами). WEBHOOK_WORKERS > 1 запускает
+# несколько процессов на одном порту (SO_REUSEPORT, только Linux); для этого нужен FSM_STORAGE=redis,
+# кэши профилей и цен в памяти процессов отключаются, а лимиты TG_* делятся между процессами.
+BOT_RUN_MODE = os.getenv("BOT_RUN_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+
+# Метрики обработчиков: сводка в лог раз в METRICS_LOG_INTERVAL сек. (0 — выключено) и
+# GET /metrics в формате Prometheus. В режиме webhook /metrics отдает тот же сервер,
+# в режиме polling — отдельный на METRICS_HOST:METRICS_PORT (0 — не запускать).
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "300"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Логирование: запись в файл с ротацией по размеру выполняет отдельный поток.
+# LOG_FORMAT: 'json' (одна JSON-строка на запись) или 'text'
+LOG_FILE = os.getenv("LOG_FILE", "poison_bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() in ("1", "true", "yes")
+
+# Уведомления клиентов о смене статуса заказа (таблица order_events — outbox).
+# События копятся NOTIFY_FLUSH_INTERVAL сек. и отправляются пачками до NOTIFY_BATCH_SIZE;
+# раз в NOTIFY_POLL_INTERVAL сек. таблица проверяется и без сигнала (события других процессов).
+# Клиенту, которому отправка не удалась, повтор не раньше чем через NOTIFY_RETRY_DELAY сек.
+# (пауза удваивается с каждой неудачей, до часа).
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+NOTIFY_FLUSH_INTERVAL = float(os.getenv("NOTIFY_FLUSH_INTERVAL", "2"))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "30"))
+NOTIFY_RETRY_DELAY = float(os.getenv("NOTIFY_RETRY_DELAY", "30"))
+
 
 # Создаем каталог для сохранения скриншотов, если его нет
 PAY_SCREENS_DIR = "pay_screens"
@@ -1,58 +1,172 @@
 
+import asyncio
 import datetime
-from typing import Optional, List
+from typing import Any, Optional, List, Dict, Tuple
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, ForeignKey
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, joinedload
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy import MetaData, select
+from sqlalchemy import MetaData, select, update, func, event, case
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects import postgresql, sqlite
 import string
 import logging  # Импортируем модуль logging
 import sqlalchemy
-import pandas as pd # Import pandas
 
-from app.database.models import User, Order, Base, DATABASE_URL, ExchangeRate, DeliveryPrice, PaymentDetails  # Добавляем импорт PaymentDetails
+from app.database.models import (User, Order, Base, DATABASE_URL, ExchangeRate, DeliveryPrice, PaymentDetails,
+                                 Counter, MediaFile, OrderEvent, OrderStat)
+from app.config import (USER_CACHE_SIZE, USER_CACHE_TTL, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS,
+                        SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+from app.utils.cache import AsyncTTLCache
+from app.utils.events import EventBus, OrderStatusChanged
+from app.utils.order_stats import OrderChange, Stats, order_stat_deltas, compute_order_stats, diff_order_stats
+from app.utils.reports import REPORT_WRITERS
+
+# Размер порции строк при выгрузке отчетов
+EXPORT_CHUNK_SIZE = 1000
+
+# Коды пользователей: буква (кроме F) + номер 001-999
+USER_CODE_LETTERS = [letter for letter in string.ascii_uppercase if letter != 'F']
+USER_CODE_COUNTER = "user_code"
+
+
+def user_code_from_index(index: int) -> Optional[str]:
+    """Возвращает код пользователя по порядковому номеру (0 -> A001) или None, если коды закончились."""
+    if not 0 <= index < len(USER_CODE_LETTERS) * 999:
+        return None
+    letter, number = divmod(index, 999)
+    return f"{USER_CODE_LETTERS[letter]}{number + 1:03}"
+
+
+def user_code_to_index(code: Optional[str]) -> int:
+    """Обратное преобразование к user_code_from_index; -1 для пустого или некорректного кода."""
+    if not code or len(code) != 4 or code[0] not in USER_CODE_LETTERS or not code[1:].isdigit():
+        return -1
+    return USER_CODE_LETTERS.index(code[0]) * 999 + int(code[1:]) - 1
+
+# --- Настройка движка БД ---
+
+# Профиль SQLite по умолчанию (см. app.config)
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,  # WAL: читатели не блокируются писателем
+    "synchronous": SQLITE_SYNCHRONOUS,  # NORMAL безопасен в режиме WAL и не делает fsync на каждый commit
+    "cache_size": SQLITE_CACHE_SIZE,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+}
+
+
+def parse_order_id(order_code) -> Optional[int]:
+    """Код заказа — это его id; введенный менеджером текст приводим к int (PostgreSQL не сравнивает int с текстом)."""
+    try:
+        return int(str(order_code).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def create_db_engine(db_url: str, sqlite_pragmas: Optional[Dict[str, str]] = None,
+                     pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """
+    Создает асинхронный движок SQLAlchemy.
+
+    Для файловой SQLite задается явный размер пула и на каждое новое соединение
+    применяются PRAGMA из sqlite_pragmas (по умолчанию SQLITE_PRAGMAS; {} — без настройки).
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite":
+        return create_async_engine(db_url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+    in_memory = url.database in (None, "", ":memory:")
+    engine_kwargs = {} if in_memory else {"pool_size": pool_size, "max_overflow": max_overflow}
+    engine = create_async_engine(db_url, **engine_kwargs)
+
+    pragmas = SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas
+    pragmas = {name: value for name, value in pragmas.items() if value}
+    if pragmas:
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
 
-# --- Настройка логирования ---
-logging.basicConfig(filename="poison_bot.log", level=logging.ERROR,
-                    format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
 
 # --- Асинхронные методы работы с БД ---
 
 class Database:
-    def __init__(self, db_url: str):
-        self.engine = create_async_engine(db_url)
+    def __init__(self, db_url: str, user_cache_size: int = USER_CACHE_SIZE, user_cache_ttl: float = USER_CACHE_TTL,
+                 sqlite_pragmas: Optional[Dict[str, str]] = None, local_caches: bool = True):
+        self.engine = create_db_engine(db_url, sqlite_pragmas)
         self.async_session_maker = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        # local_caches=False (несколько процессов бота) отключает кэши профилей и цен в памяти:
+        # изменения, сделанные в одном процессе, иначе не видны остальным.
+        # Кэш профилей пользователей по tg_id (сбрасывается в add_or_update_user)
+        self.user_cache = AsyncTTLCache(maxsize=user_cache_size if local_caches else 0, ttl=user_cache_ttl)
+        # Кэш цен: таблицы exchange_rates и delivery_prices целиком в памяти.
+        # None означает, что кэш еще не загружен; без local_caches таблицы читаются при каждом запросе.
+        self.pricing_cache = local_caches
+        self._exchange_rates: Optional[Dict[str, float]] = None
+        self._delivery_prices: Optional[Dict[Tuple[str, str], float]] = None
+        self._pricing_lock = asyncio.Lock()
+        # События (OrderStatusChanged) публикуются после commit транзакции, в которой они записаны
+        self.events = EventBus()
 
     async def create_db_and_tables(self):
         try:
             async with self.engine.begin() as conn:
                 # await conn.run_sync(Base.metadata.drop_all)
                 await conn.run_sync(Base.metadata.create_all)
+                await conn.run_sync(self._create_missing_indexes)
         except Exception as e:
             logging.error(f"Error creating database and tables: {e}")
             raise
 
+    @staticmethod
+    def _create_missing_indexes(conn):
+        """
+        Миграция для существующих файлов БД: create_all не трогает уже созданные таблицы,
+        поэтому индексы, добавленные в модели позже, создаются отдельно (данные не меняются).
+        """
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
     async def get_async_session(self) -> AsyncSession:
         return self.async_session_maker()
 
-    async def generate_unique_code_for_user(self) -> str:
-        """Generates a unique user code in the range A001-Z999."""
-        try:
-            async with await self.get_async_session() as session:
-                query = select(User.unique_code).distinct()
-                result = await session.execute(query)
-                existing_codes = [row[0] for row in result.all()]
+    async def generate_unique_code_for_user(self) -> Optional[str]:
+        """
+        Generates a unique user code in the range A001-Z999.
 
-                for letter in string.ascii_uppercase:
-                    if letter == 'F': continue
-                    for number in range(1, 1000):
-                        code = f"{letter}{number:03}"
-                        if code not in existing_codes:
-                            return code
-                return None  # Handle the unlikely case of all codes being exhausted
+        Код берется из счетчика в таблице counters атомарным UPDATE ... RETURNING,
+        поэтому выдача занимает O(1) и параллельные регистрации не получают одинаковых кодов.
+        При первом запуске счетчик продолжает нумерацию после максимального существующего кода.
+        """
+        try:
+            for _ in range(2):
+                try:
+                    async with await self.get_async_session() as session:
+                        result = await session.execute(
+                            update(Counter).where(Counter.name == USER_CODE_COUNTER)
+                            .values(value=Counter.value + 1).returning(Counter.value)
+                        )
+                        value = result.scalar_one_or_none()
+                        if value is None:
+                            max_code = await session.scalar(
+                                select(func.max(User.unique_code)).where(func.length(User.unique_code) == 4))
+                            value = user_code_to_index(max_code) + 2
+                            session.add(Counter(name=USER_CODE_COUNTER, value=value))
+                        await session.commit()
+                        return user_code_from_index(value - 1)  # None, если коды закончились
+                except IntegrityError:
+                    # Счетчик одновременно создала другая регистрация — повторяем через UPDATE
+                    continue
+            raise RuntimeError("Failed to allocate user code")
         except Exception as e:
-            logging.error(f"Error generating unique code for order: {e}")
+            logging.error(f"Error generating unique code for user: {e}")
             raise
 
     async def add_or_update_user(self, tg_id: int, full_name: str, phone_number: str, main_address: str, 
@@ -99,9 +213,11 @@ class Database:
 
                 await session.commit()
                 await session.refresh(user)
-                return user
+            self.user_cache.invalidate(tg_id)
+            return user
         except Exception as e:
             logging.error(f"Error adding or updating user: {e}")
+            self.user_cache.invalidate(tg_id)
             return None
 
 
@@ -124,13 +240,16 @@ class Database:
             logging.error(f"Error getting user by id: {e}")
             raise
 
+    async def _load_user_by_tg_id(self, tg_id: int) -> Optional[User]:
+        async with await self.get_async_session() as session:
+            stmt = select(User).where(User.tg_id == tg_id)
+            result = await session.execute(stmt)
+            return result.scalars().first() # Возвращает один объект User
+
     async def get_user_by_tg_id(self, tg_id: int) -> Optional[User]:
+        """Возвращает профиль пользователя по Telegram ID (через кэш self.user_cache)."""
         try:
-            async with await self.get_async_session() as session:
-                stmt = select(User).where(User.tg_id == tg_id)
-                result = await session.execute(stmt)
-                user = result.scalars().first() # Возвращает один объект User
-                return user
+            return await self.user_cache.get_or_load(tg_id, lambda: self._load_user_by_tg_id(tg_id))
         except Exception as e:
             logging.error(f"Error getting user by tg_id: {e}")
             return None
@@ -144,12 +263,42 @@ class Database:
                               price=price, delivery_method=delivery_method, total_price=total_price,
                               promocode=promocode)
                 session.add(order)
+                await session.flush()
+                await self._add_order_stats(session, [self._new_order_change(order)])
                 await session.commit()
                 return order
         except Exception as e:
             logging.error(f"Error adding order: {e}")
             raise
 
+    async def add_orders_bulk(self, user_id: int, items: List[dict]) -> List[int]:
+        """
+        Добавляет несколько заказов пользователя в одной транзакции (один commit на всю корзину).
+
+        Args:
+            user_id: ID пользователя в БД.
+            items: Список товаров (словари с ключами category, size, color, link, price,
+                   delivery_method, total_price и необязательным promocode).
+
+        Returns:
+            Список ID созданных заказов в порядке items.
+        """
+        try:
+            async with await self.get_async_session() as session:
+                orders = [Order(user_id=user_id, category=item.get('category'), size=item.get('size'),
+                                color=item.get('color'), link=item.get('link'), price=item.get('price'),
+                                delivery_method=item.get('delivery_method'),
+                                total_price=item.get('total_price'), promocode=item.get('promocode'))
+                          for item in items]
+                session.add_all(orders)
+                await session.flush()
+                await self._add_order_stats(session, [self._new_order_change(order) for order in orders])
+                await session.commit()
+                return [order.id for order in orders]
+        except Exception as e:
+            logging.error(f"Error adding orders in bulk: {e}")
+            raise
+
     async def get_orders_by_user(self, user_id: int):
         try:
             async with await self.get_async_session() as session:
@@ -170,9 +319,12 @@ class Database:
             raise
 
     async def get_order_by_code(self, order_code: str) -> Optional[Order]:
+        order_id = parse_order_id(order_code)
+        if order_id is None:
+            return None
         try:
             async with await self.get_async_session() as session:
-                result = await session.execute(select(Order).where(Order.id == order_code))
+                result = await session.execute(select(Order).where(Order.id == order_id))
                 order = result.scalars().first()
                 return order
         except Exception as e:
@@ -206,18 +358,69 @@ class Database:
 
 
 
+    async def get_orders_page_by_status(self, status: str, after_id: Optional[int] = None,
+                                        before_id: Optional[int] = None,
+                                        limit: int = 20) -> Tuple[List[Order], bool]:
+        """
+        Возвращает одну страницу заказов со статусом status (keyset-пагинация по id).
+
+        Args:
+            status: Статус заказа.
+            after_id: Вернуть заказы с id больше after_id (следующая страница).
+            before_id: Вернуть заказы с id меньше before_id (предыдущая страница).
+            limit: Размер страницы.
+
+        Returns:
+            Кортеж (заказы по возрастанию id вместе с пользователями,
+            есть ли еще заказы дальше в направлении запроса).
+        """
+        try:
+            async with await self.get_async_session() as session:
+                stmt = select(Order).where(Order.status == status).options(joinedload(Order.user))
+                if before_id is not None:
+                    stmt = stmt.where(Order.id < before_id).order_by(Order.id.desc())
+                else:
+                    if after_id is not None:
+                        stmt = stmt.where(Order.id > after_id)
+                    stmt = stmt.order_by(Order.id)
+                result = await session.execute(stmt.limit(limit + 1))
+                orders = list(result.scalars().all())
+
+            has_more = len(orders) > limit
+            orders = orders[:limit]
+            if before_id is not None:
+                orders.reverse()
+            return orders, has_more
+        except Exception as e:
+            logging.error(f"Error getting orders page by status: {e}")
+            raise
+
     async def update_order_status(self, order_code: str, new_status: str):
+        """
+        Меняет статус заказа. В той же транзакции в outbox (order_events) пишется событие
+        для уведомления клиента; после commit оно публикуется в self.events.
+        Повторная установка того же статуса событий не создает.
+        """
+        order_id = parse_order_id(order_code)
+        if order_id is None:
+            return False
         try:
             async with await self.get_async_session() as session:
 
                 order = await session.execute(
-                    select(Order).where(Order.id == order_code)
+                    select(Order).where(Order.id == order_id)
                 )
                 order = order.scalar_one_or_none()
 
                 if order:
-                    order.status = new_status
+                    events = []
+                    if order.status != new_status:
+                        events = await self._add_status_events(session, [(order.id, order.status, new_status)])
+                        await self._add_order_stats(session, [(order.status, new_status, order.total_price,
+                                                               order.order_date, order.category)])
+                        order.status = new_status
                     await session.commit()
+                    self._publish(events)
                     return True
                 else:
                     return False
@@ -228,6 +431,206 @@ class Database:
                 await session.rollback()
             return False
 
+    async def update_orders_bulk(self, order_ids: List[int], new_status: Optional[str] = None,
+                                 tracking: Optional[Dict[int, Tuple[Optional[str], Optional[datetime.datetime]]]] = None
+                                 ) -> Dict[int, str]:
+        """
+        Массово меняет статус и/или трек-номера заказов в одной транзакции.
+
+        Статус ставится одним UPDATE ... WHERE id IN (...), трек-номер и срок доставки —
+        одним пакетным UPDATE по первичному ключу (None в tracking — поле не меняется).
+        События смены статуса пишутся в order_events, как в update_order_status.
+
+        Returns:
+            {id заказа: "updated" | "unchanged" | "not_found"} для всех order_ids и ключей tracking.
+        """
+        tracking = tracking or {}
+        requested = sorted(set(order_ids) | set(tracking))
+        results: Dict[int, str] = {order_id: "not_found" for order_id in requested}
+        if not requested:
+            return results
+        try:
+            async with await self.get_async_session() as session:
+                current = {row.id: row for row in (await session.execute(
+                    select(Order.id, Order.status, Order.total_price, Order.order_date, Order.category,
+                           Order.tracking_number, Order.estimated_delivery)
+                    .where(Order.id.in_(requested)))).all()}
+                events = []
+                for order_id in current:
+                    results[order_id] = "unchanged"
+
+                if new_status is not None:
+                    # Статус меняется только у заказов из order_ids, не у тех, что есть лишь в tracking
+                    status_ids = set(order_ids)
+                    changed = [row for row in current.values() if row.id in status_ids and row.status != new_status]
+                    if changed:
+                        await session.execute(
+                            update(Order).where(Order.id.in_([row.id for row in changed])).values(status=new_status)
+                            .execution_options(synchronize_session=False)
+                        )
+                        events = await self._add_status_events(
+                            session, [(row.id, row.status, new_status) for row in changed])
+                        await self._add_order_stats(session, [(row.status, new_status, row.total_price,
+                                                               row.order_date, row.category) for row in changed])
+                        results.update({row.id: "updated" for row in changed})
+
+                tracking_rows = []
+                for order_id, (tracking_number, estimated_delivery) in tracking.items():
+                    order = current.get(order_id)
+                    if order is None:
+                        continue
+                    row = {"id": order_id}
+                    if tracking_number is not None and tracking_number != order.tracking_number:
+                        row["tracking_number"] = tracking_number
+                    if estimated_delivery is not None and estimated_delivery != order.estimated_delivery:
+                        row["estimated_delivery"] = estimated_delivery
+                    if len(row) > 1:
+                        tracking_rows.append(row)
+                        results[order_id] = "updated"
+                if tracking_rows:
+                    await session.execute(update(Order), tracking_rows)  # ORM bulk UPDATE по id
+
+                await session.commit()
+            self._publish(events)
+            return results
+        except Exception as e:
+            logging.error(f"Error updating orders in bulk: {e}")
+            raise
+
+    @staticmethod
+    async def _add_status_events(session: AsyncSession,
+                                 changes: List[Tuple[int, Optional[str], str]]) -> List[OrderStatusChanged]:
+        """Добавляет в текущую транзакцию события (order_id, старый статус, новый статус) в order_events."""
+        rows = [OrderEvent(order_id=order_id, old_status=old_status, new_status=new_status)
+                for order_id, old_status, new_status in changes]
+        session.add_all(rows)
+        await session.flush()  # id событий нужны подписчикам
+        return [OrderStatusChanged(row.id, row.order_id, row.old_status, row.new_status) for row in rows]
+
+    def _publish(self, events: List[OrderStatusChanged]):
+        for event_item in events:
+            self.events.publish(event_item)
+
+    # ----------------------------------------------------------
+    # Агрегаты заказов (order_stats)
+    # ----------------------------------------------------------
+
+    @staticmethod
+    def _new_order_change(order: Order) -> OrderChange:
+        return None, order.status, order.total_price, order.order_date, order.category
+
+    async def _add_order_stats(self, session: AsyncSession, changes: List[OrderChange]):
+        """
+        Применяет приращения агрегатов в текущей транзакции одним
+        INSERT ... ON CONFLICT DO UPDATE SET orders = orders + excluded.orders, ...
+        """
+        deltas = order_stat_deltas(changes)
+        if not deltas:
+            return
+        stmt = self._insert(OrderStat).values([{"kind": kind, "key": key, "orders": orders, "revenue": revenue}
+                                               for (kind, key), (orders, revenue) in deltas.items()])
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["kind", "key"],
+            set_={"orders": OrderStat.orders + stmt.excluded.orders,
+                  "revenue": OrderStat.revenue + stmt.excluded.revenue}))
+
+    async def get_order_stats(self) -> Stats:
+        """Агрегаты заказов {(kind, key): (число, сумма)} — чтение небольшой таблицы order_stats."""
+        try:
+            async with await self.get_async_session() as session:
+                result = await session.execute(
+                    select(OrderStat.kind, OrderStat.key, OrderStat.orders, OrderStat.revenue))
+                return {(kind, key): (orders, revenue) for kind, key, orders, revenue in result.all()}
+        except Exception as e:
+            logging.error(f"Error getting order stats: {e}")
+            raise
+
+    async def rebuild_order_stats(self) -> List[Tuple[str, str, Tuple, Tuple]]:
+        """
+        Пересчитывает order_stats с нуля по таблице orders (группировки pandas) и заменяет
+        таблицу в одной транзакции.
+
+        Транзакция начинается с записи в order_stats (DELETE ... RETURNING, в PostgreSQL еще
+        и LOCK TABLE), и только потом читаются заказы: приращения других транзакций ждут ее
+        commit и ложатся поверх пересчета, а не теряются. В SQLite запись сразу берет
+        блокировку базы, поэтому снимок чтения не устаревает (нет SQLITE_BUSY_SNAPSHOT);
+        остальные записи ждут пересчета (SQLITE_BUSY_TIMEOUT).
+
+        Returns:
+            Расхождения прежних (инкрементальных) агрегатов с пересчитанными.
+        """
+        try:
+            async with await self.get_async_session() as session:
+                async with session.begin():
+                    if self.engine.dialect.name == "postgresql":
+                        await session.execute(sqlalchemy.text("LOCK TABLE order_stats IN EXCLUSIVE MODE"))
+                    current = {(kind, key): (orders, revenue) for kind, key, orders, revenue in (
+                        await session.execute(sqlalchemy.delete(OrderStat).returning(
+                            OrderStat.kind, OrderStat.key, OrderStat.orders, OrderStat.revenue))).all()}
+                    rows = (await session.execute(
+                        select(Order.status, Order.total_price, Order.order_date, Order.category))).all()
+                    rebuilt = await asyncio.to_thread(compute_order_stats, [tuple(row) for row in rows])
+                    if rebuilt:
+                        await session.execute(sqlalchemy.insert(OrderStat), [
+                            {"kind": kind, "key": key, "orders": orders, "revenue": revenue}
+                            for (kind, key), (orders, revenue) in rebuilt.items()])
+            return diff_order_stats(current, rebuilt)
+        except Exception as e:
+            logging.error(f"Error rebuilding order stats: {e}")
+            raise
+
+    async def ensure_order_stats(self):
+        """Заполняет order_stats при первом запуске на базе, где заказы уже есть."""
+        async with await self.get_async_session() as session:
+            has_stats = await session.scalar(select(OrderStat.kind).limit(1))
+            has_orders = await session.scalar(select(Order.id).limit(1))
+        if has_orders is not None and has_stats is None:
+            await self.rebuild_order_stats()
+            logging.info("Order stats rebuilt from orders table")
+
+    async def get_pending_order_events(self, limit: int = 100, exclude_tg_ids: Optional[List[int]] = None
+                                       ) -> List[Tuple[OrderEvent, Order, int]]:
+        """
+        Неотправленные события смены статуса (старые первыми) вместе с заказом и tg_id клиента.
+        События клиентов из exclude_tg_ids пропускаются (отправка им отложена).
+
+        Returns:
+            Список (событие, заказ, tg_id клиента).
+        """
+        try:
+            async with await self.get_async_session() as session:
+                stmt = (
+                    select(OrderEvent, Order, User.tg_id)
+                    .join(Order, Order.id == OrderEvent.order_id)
+                    .join(User, User.id == Order.user_id)
+                    .where(OrderEvent.sent_at.is_(None))
+                    .order_by(OrderEvent.id)
+                    .limit(limit)
+                )
+                if exclude_tg_ids:
+                    stmt = stmt.where(User.tg_id.notin_(exclude_tg_ids))
+                result = await session.execute(stmt)
+                return [tuple(row) for row in result.all()]
+        except Exception as e:
+            logging.error(f"Error getting pending order events: {e}")
+            raise
+
+    async def mark_order_events_sent(self, event_ids: List[int]) -> int:
+        """Отмечает события отправленными одним UPDATE; возвращает число обновленных строк."""
+        if not event_ids:
+            return 0
+        try:
+            async with await self.get_async_session() as session:
+                result = await session.execute(
+                    update(OrderEvent).where(OrderEvent.id.in_(event_ids), OrderEvent.sent_at.is_(None))
+                    .values(sent_at=datetime.datetime.utcnow())
+                )
+                await session.commit()
+                return result.rowcount
+        except Exception as e:
+            logging.error(f"Error marking order events sent: {e}")
+            raise
+
     async def save_payment_screenshot(self, order_id: str, file_path: str):
         try:
             async with await self.get_async_session() as session:
@@ -241,6 +644,74 @@ class Database:
             logging.error(f"Error saving payment screenshot: {e}")
             raise
 
+    async def save_payment_screenshots(self, order_ids: List[int], file_path: str) -> int:
+        """
+        Сохраняет путь к скриншоту оплаты сразу для нескольких заказов одним UPDATE.
+        Заказы в статусе "Создан" переводятся в "Оплачен" (с событиями в order_events).
+
+        Returns:
+            Количество обновленных заказов.
+        """
+        try:
+            async with await self.get_async_session() as session:
+                # Заказы, которые станут "Оплачен", — для событий и агрегатов order_stats
+                unpaid = (await session.execute(
+                    select(Order.id, Order.total_price, Order.order_date, Order.category)
+                    .where(Order.id.in_(order_ids), Order.status == "Создан"))).all()
+                result = await session.execute(
+                    update(Order).where(Order.id.in_(order_ids)).values(
+                        payment_screenshot=file_path,
+                        status=case((Order.status == "Создан", "Оплачен"), else_=Order.status),
+                    )
+                )
+                events = await self._add_status_events(session, [(row.id, "Создан", "Оплачен") for row in unpaid])
+                await self._add_order_stats(session, [("Создан", "Оплачен", *row[1:]) for row in unpaid])
+                await session.commit()
+            self._publish(events)
+            return result.rowcount
+        except Exception as e:
+            logging.error(f"Error saving payment screenshots: {e}")
+            raise
+
+    async def mark_latest_unpaid_order_paid(self, tg_id: int, file_path: str) -> Optional[int]:
+        """
+        Привязывает скриншот оплаты к последнему неоплаченному ("Создан") заказу пользователя
+        и переводит заказ в "Оплачен" (с событием в order_events).
+
+        Один запрос: UPDATE ... WHERE id = (SELECT ... ORDER BY order_date DESC LIMIT 1) RETURNING id.
+        Подзапрос идет по индексам users.tg_id и ix_orders_user_id_status_order_date и сортирует
+        только неоплаченные заказы этого пользователя.
+
+        Returns:
+            id обновленного заказа или None, если неоплаченных заказов нет.
+        """
+        latest_unpaid = (
+            select(Order.id)
+            .where(Order.user_id.in_(select(User.id).where(User.tg_id == tg_id)), Order.status == "Создан")
+            .order_by(Order.order_date.desc(), Order.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        try:
+            async with await self.get_async_session() as session:
+                result = await session.execute(
+                    update(Order)
+                    .where(Order.id == latest_unpaid)
+                    .values(payment_screenshot=file_path, status="Оплачен")
+                    .returning(Order.id, Order.total_price, Order.order_date, Order.category)
+                )
+                row = result.one_or_none()
+                events = []
+                if row is not None:
+                    events = await self._add_status_events(session, [(row.id, "Создан", "Оплачен")])
+                    await self._add_order_stats(session, [("Создан", "Оплачен", *row[1:])])
+                await session.commit()
+            self._publish(events)
+            return row.id if row is not None else None
+        except Exception as e:
+            logging.error(f"Error marking latest unpaid order as paid: {e}")
+            raise
+
     async def update_order_tracking_info(self, order_id: int, tracking_number: str,
                                            estimated_delivery: datetime.datetime):
         try:
@@ -290,7 +761,7 @@ class Database:
 
         # Определяем список "активных" статусов.  Этот список можно изменить
         # в соответствии с вашей логикой.
-        active_statuses = ["Создан", "Оплачен", "В обработке", "Отправлен"]
+        active_statuses = ["Создан", "Оплачен", "В обработке", "Доставка по Китаю", "Доставка по РФ", "Отправлен"]
 
         # Используем join для объединения таблиц users и orders
         # Фильтруем по tg_id пользователя и статусу заказа
@@ -310,8 +781,49 @@ class Database:
     # Методы для работы с курсом валют и ценами доставки
     # ----------------------------------------------------------
 
-    async def add_or_update_exchange_rate(self, rate_name: str, rate_value: float):
-        """Adds or updates an exchange rate in the database."""
+    async def load_pricing_cache(self):
+        """
+        Загружает таблицы exchange_rates и delivery_prices в память.
+
+        Новые словари собираются целиком и подменяются одним шагом, поэтому
+        обработчики видят либо старый, либо новый прайс, но не их смесь.
+        """
+        if not self.pricing_cache:
+            return
+        try:
+            async with self._pricing_lock:
+                self._exchange_rates, self._delivery_prices = await self._load_pricing()
+        except Exception as e:
+            logging.error(f"Error loading pricing cache: {e}")
+            raise
+
+    async def _load_pricing(self) -> Tuple[Dict[str, float], Dict[Tuple[str, str], float]]:
+        """Читает курсы и цены доставки из БД: ({имя курса: значение}, {(категория, способ доставки): цена})."""
+        async with await self.get_async_session() as session:
+            rates = await session.execute(select(ExchangeRate.rate_name, ExchangeRate.rate_value))
+            prices = await session.execute(
+                select(DeliveryPrice.category, DeliveryPrice.delivery_type, DeliveryPrice.price)
+            )
+            exchange_rates = {name: value for name, value in rates.all()}
+            delivery_prices = {(category, delivery_type): price
+                               for category, delivery_type, price in prices.all()}
+        return exchange_rates, delivery_prices
+
+    async def _ensure_pricing_cache(self) -> Tuple[Dict[str, float], Dict[Tuple[str, str], float]]:
+        """Курсы и цены доставки из кэша (или прямо из БД, если кэш отключен)."""
+        if not self.pricing_cache:
+            return await self._load_pricing()
+        if self._exchange_rates is None or self._delivery_prices is None:
+            await self.load_pricing_cache()
+        return self._exchange_rates, self._delivery_prices
+
+    async def add_or_update_exchange_rate(self, rate_name: str, rate_value: float, refresh_cache: bool = True):
+        """
+        Adds or updates an exchange rate in the database.
+
+        При refresh_cache=False кэш цен не перечитывается: так делает массовое
+        обновление, которое перезагружает кэш один раз после всех записей.
+        """
         try:
             async with await self.get_async_session() as session:
                 # Check if the rate already exists
@@ -328,6 +840,8 @@ class Database:
                     new_rate = ExchangeRate(rate_name=rate_name, rate_value=rate_value)
                     session.add(new_rate)
                 await session.commit()
+            if refresh_cache:
+                await self.load_pricing_cache()
         except Exception as e:
             logging.error(f"Error adding/updating exchange rate: {e}")
             if session.in_transaction():
@@ -335,20 +849,17 @@ class Database:
             raise
 
     async def get_exchange_rate(self, rate_name: str) -> Optional[float]:
-        """Retrieves an exchange rate from the database by name."""
+        """Retrieves an exchange rate by name (from the pricing cache)."""
         try:
-            async with await self.get_async_session() as session:
-                result = await session.execute(
-                    select(ExchangeRate.rate_value).where(ExchangeRate.rate_name == rate_name)
-                )
-                rate_value = result.scalar_one_or_none()
-                return rate_value
+            exchange_rates, _ = await self._ensure_pricing_cache()
+            return exchange_rates.get(rate_name)
         except Exception as e:
             logging.error(f"Error getting exchange rate: {e}")
             raise
 
-    async def add_or_update_delivery_price(self, category: str, delivery_type: str, price: float):
-        """Adds or updates a delivery price in the database."""
+    async def add_or_update_delivery_price(self, category: str, delivery_type: str, price: float,
+                                           refresh_cache: bool = True):
+        """Adds or updates a delivery price in the database (see add_or_update_exchange_rate)."""
         try:
             async with await self.get_async_session() as session:
                 # Check if the price already exists
@@ -366,26 +877,126 @@ class Database:
                     new_price = DeliveryPrice(category=category, delivery_type=delivery_type, price=price)
                     session.add(new_price)
                 await session.commit()
+            if refresh_cache:
+                await self.load_pricing_cache()
         except Exception as e:
             logging.error(f"Error adding/updating delivery price: {e}")
             if session.in_transaction():
                 await session.rollback()
             raise
 
-    async def get_delivery_price(self, category: str, delivery_type: str) -> Optional[float]:
-        """Retrieves a delivery price from the database."""
+    def _insert(self, model):
+        """INSERT диалекта движка (SQLite или PostgreSQL) — с поддержкой ON CONFLICT."""
+        dialect = postgresql if self.engine.dialect.name == "postgresql" else sqlite
+        return dialect.insert(model)
+
+    def _upsert(self, model, index_elements: List[str], update_column: str, rows: List[dict]):
+        """INSERT ... ON CONFLICT DO UPDATE для диалекта движка (SQLite или PostgreSQL)."""
+        stmt = self._insert(model).values(rows)
+        return stmt.on_conflict_do_update(index_elements=index_elements,
+                                          set_={update_column: getattr(stmt.excluded, update_column)})
+
+    async def apply_price_list(self, exchange_rates: Dict[str, float],
+                               delivery_prices: Dict[Tuple[str, str], float]) -> Dict[str, Any]:
+        """
+        Массово применяет прайс: сравнивает его с текущими таблицами и записывает
+        только новые и изменившиеся строки — по одному INSERT ... ON CONFLICT на таблицу
+        в одной транзакции. Пары, которых нет в прайсе, не удаляются.
+
+        Returns:
+            {"added": [(ключ, цена)], "changed": [(ключ, было, стало)], "unchanged": число};
+            ключ — имя курса или "способ доставки / категория".
+        """
+        diff: Dict[str, Any] = {"added": [], "changed": [], "unchanged": 0}
         try:
             async with await self.get_async_session() as session:
-                result = await session.execute(
-                    select(DeliveryPrice.price).where(DeliveryPrice.category == category,
-                                                        DeliveryPrice.delivery_type == delivery_type)
-                )
-                price = result.scalar_one_or_none()
-                return price
+                async with session.begin():
+                    current_rates = dict((await session.execute(
+                        select(ExchangeRate.rate_name, ExchangeRate.rate_value))).all())
+                    current_prices = {(category, delivery_type): price for category, delivery_type, price in
+                                      (await session.execute(select(DeliveryPrice.category,
+                                                                    DeliveryPrice.delivery_type,
+                                                                    DeliveryPrice.price))).all()}
+
+                    rate_rows, price_rows = [], []
+                    for name, value in exchange_rates.items():
+                        if self._diff_value(diff, name, current_rates.get(name), value):
+                            rate_rows.append({"rate_name": name, "rate_value": value})
+                    for (category, delivery_type), price in delivery_prices.items():
+                        if self._diff_value(diff, f"{delivery_type} / {category}",
+                                            current_prices.get((category, delivery_type)), price):
+                            price_rows.append({"category": category, "delivery_type": delivery_type,
+                                               "price": price})
+
+                    if rate_rows:
+                        await session.execute(self._upsert(ExchangeRate, ["rate_name"], "rate_value", rate_rows))
+                    if price_rows:
+                        await session.execute(self._upsert(DeliveryPrice, ["category", "delivery_type"],
+                                                           "price", price_rows))
+            if diff["added"] or diff["changed"]:
+                await self.load_pricing_cache()
+            return diff
+        except Exception as e:
+            logging.error(f"Error applying price list: {e}")
+            raise
+
+    @staticmethod
+    def _diff_value(diff: Dict[str, Any], key: str, old: Optional[float], new: float) -> bool:
+        """Учитывает значение в отчете apply_price_list; True — строку нужно записать."""
+        if old is None:
+            diff["added"].append((key, new))
+        elif float(old) != float(new):
+            diff["changed"].append((key, old, new))
+        else:
+            diff["unchanged"] += 1
+            return False
+        return True
+
+    async def get_delivery_price(self, category: str, delivery_type: str) -> Optional[float]:
+        """Retrieves a delivery price (from the pricing cache)."""
+        try:
+            _, delivery_prices = await self._ensure_pricing_cache()
+            return delivery_prices.get((category, delivery_type))
         except Exception as e:
             logging.error(f"Error getting delivery price: {e}")
             raise
 
+    async def price_cart(self, cart_items: List[dict]) -> Optional[Tuple[List[float], float]]:
+        """
+        Рассчитывает стоимость товаров корзины: цена в CNY по курсу cny_to_rub плюс доставка.
+
+        Все пары (категория, способ доставки) берутся из кэша цен, поэтому цена
+        корзины не зависит от ее размера и считается одинаково на всех экранах.
+
+        Args:
+            cart_items: Список товаров корзины (словари с ключами price, category, delivery_method).
+
+        Returns:
+            Кортеж (список цен товаров в рублях, общая стоимость) или None, если курс не задан.
+        """
+        try:
+            exchange_rates, delivery_prices = await self._ensure_pricing_cache()
+
+            cny_to_rub = exchange_rates.get("cny_to_rub")
+            if cny_to_rub is None:
+                logging.error("Exchange rate cny_to_rub is not set")
+                return None
+
+            item_prices = []
+            for item in cart_items:
+                category = item.get('category')
+                delivery_method = item.get('delivery_method')
+                delivery_price_rub = delivery_prices.get((category, delivery_method))
+                if delivery_price_rub is None:
+                    logging.error(f"Delivery price not found for category '{category}' and type '{delivery_method}'")
+                    delivery_price_rub = 0
+                item_prices.append(item.get('price') * float(cny_to_rub) + delivery_price_rub)
+
+            return item_prices, sum(item_prices)
+        except Exception as e:
+            logging.error(f"Error pricing cart: {e}")
+            raise
+
     # ----------------------------------------------------------
     # Методы для работы с параметрами оплаты
     # ----------------------------------------------------------
@@ -431,6 +1042,32 @@ class Database:
             logging.error(f"Error getting payment details: {e}")
             raise
 
+    # ----------------------------------------------------------
+    # Методы для работы с file_id статических файлов
+    # ----------------------------------------------------------
+
+    async def get_media_file_id(self, path: str, sha256: str) -> Optional[str]:
+        """Returns the stored Telegram file_id for the file if its content hash still matches."""
+        try:
+            async with await self.get_async_session() as session:
+                result = await session.execute(
+                    select(MediaFile.file_id).where(MediaFile.path == path, MediaFile.sha256 == sha256)
+                )
+                return result.scalar_one_or_none()
+        except Exception as e:
+            logging.error(f"Error getting media file_id for {path}: {e}")
+            raise
+
+    async def save_media_file_id(self, path: str, sha256: str, file_id: str):
+        """Stores (or replaces) the Telegram file_id for the file content."""
+        try:
+            async with await self.get_async_session() as session:
+                await session.merge(MediaFile(path=path, sha256=sha256, file_id=file_id))
+                await session.commit()
+        except Exception as e:
+            logging.error(f"Error saving media file_id for {path}: {e}")
+            raise
+
     async def close(self):
         try:
             await self.engine.dispose()
@@ -440,27 +1077,45 @@ class Database:
     # Методы для выгрузки данных в Excel (возвращают путь к файлу)
     # ----------------------------------------------------------
 
-    async def export_users_to_excel(self, excel_filename="data/users_report.xlsx") -> Optional[str]:
-        """Exports the contents of the 'users' table to an Excel file and returns the file path."""
-        try:
-            async with await self.get_async_session() as session:
-                # Fetch all users from the database
-                users = await session.execute(select(User))
-                users = users.scalars().all()
-
-                # Convert users to a list of dictionaries
-                user_list = [user.__dict__ for user in users]
-
-                # Create a Pandas DataFrame from the list
-                df = pd.DataFrame(user_list)
+    async def export_table(self, model, filename: str, file_format: str = 'xlsx',
+                           chunk_size: int = EXPORT_CHUNK_SIZE) -> Optional[str]:
+        """
+        Потоково выгружает таблицу модели в файл отчета и возвращает путь к файлу.
 
-                # Remove unnecessary columns (e.g., '_sa_instance_state')
-                df = df = df.drop(columns=['_sa_instance_state'], errors='ignore')
+        Выбираются только кортежи колонок, порциями по chunk_size строк (keyset по id),
+        а запись в файл выполняется в рабочем потоке. Память не зависит от размера
+        таблицы, и бот продолжает отвечать другим пользователям во время выгрузки.
 
-                # Save the DataFrame to an Excel file
-                df.to_excel(excel_filename, index=False)
+        Args:
+            model: ORM-модель (User, Order, ...).
+            filename: Путь к файлу отчета.
+            file_format: 'xlsx' или 'csv'.
+            chunk_size: Количество строк в одной порции.
+        """
+        columns = list(model.__table__.columns)
+        writer = await asyncio.to_thread(REPORT_WRITERS[file_format], filename,
+                                         [column.name for column in columns])
+        try:
+            last_id = None
+            while True:
+                stmt = select(*columns).order_by(model.id).limit(chunk_size)
+                if last_id is not None:
+                    stmt = stmt.where(model.id > last_id)
+                async with await self.get_async_session() as session:
+                    result = await session.execute(stmt)
+                    rows = result.all()
+                if not rows:
+                    break
+                await asyncio.to_thread(writer.write_rows, rows)
+                last_id = rows[-1].id
+        finally:
+            await asyncio.to_thread(writer.close)
+        return filename
 
-            return excel_filename  # Return the file path
+    async def export_users_to_excel(self, excel_filename="data/users_report.xlsx") -> Optional[str]:
+        """Exports the contents of the 'users' table to an Excel file and returns the file path."""
+        try:
+            return await self.export_table(User, excel_filename, 'xlsx')
         except Exception as e:
             logging.error(f"Error exporting 'users' table to Excel: {e}")
             return None  # Return None in case of an error
@@ -468,28 +1123,27 @@ class Database:
     async def export_orders_to_excel(self, excel_filename="data/orders_report.xlsx") -> Optional[str]:
         """Exports the contents of the 'orders' table to an Excel file and returns the file path."""
         try:
-            async with await self.get_async_session() as session:
-                # Fetch all orders from the database
-                orders = await session.execute(select(Order))
-                orders = orders.scalars().all()
-
-                # Convert orders to a list of dictionaries
-                order_list = [order.__dict__ for order in orders]
-
-                # Create a Pandas DataFrame from the list
-                df = pd.DataFrame(order_list)
-
-                # Remove unnecessary columns (e.g., '_sa_instance_state')
-                df = df.drop(columns=['_sa_instance_state'], errors='ignore')
-
-                # Save the DataFrame to an Excel file
-                df.to_excel(excel_filename, index=False)
-
-            return excel_filename  # Return the file path
+            return await self.export_table(Order, excel_filename, 'xlsx')
         except Exception as e:
             logging.error(f"Error exporting 'orders' table to Excel: {e}")
             return None  # Return None in case of an error
 
+    async def export_users_to_csv(self, csv_filename="data/users_report.csv") -> Optional[str]:
+        """Exports the contents of the 'users' table to a CSV file and returns the file path."""
+        try:
+            return await self.export_table(User, csv_filename, 'csv')
+        except Exception as e:
+            logging.error(f"Error exporting 'users' table to CSV: {e}")
+            return None
+
+    async def export_orders_to_csv(self, csv_filename="data/orders_report.csv") -> Optional[str]:
+        """Exports the contents of the 'orders' table to a CSV file and returns the file path."""
+        try:
+            return await self.export_table(Order, csv_filename, 'csv')
+        except Exception as e:
+            logging.error(f"Error exporting 'orders' table to CSV: {e}")
+            return None
+
 # --- Пример использования ---
 
 async def main():
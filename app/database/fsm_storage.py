@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+
+from app.config import FSM_STORAGE, FSM_FLUSH_DELAY, FSM_CACHE_SIZE, REDIS_URL
+from app.database.database import Database
+from app.database.models import FsmRecord
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Постоянное хранилище FSM в таблице fsm_records базы бота.
+
+    Чтение идет из памяти (запись загружается из БД при первом обращении к ключу),
+    а изменения копятся и сбрасываются в БД одной транзакцией не чаще, чем раз
+    в flush_delay секунд. Так серия state.update_data в сценарии заказа стоит
+    одну запись на диск, а корзина переживает перезапуск бота.
+
+    В памяти держится не больше max_records записей (LRU): давно не использованные
+    записи, уже сохраненные в БД, вытесняются и при следующем обращении читаются заново.
+    """
+
+    def __init__(self, db: Database, flush_delay: float = FSM_FLUSH_DELAY,
+                 key_builder: Optional[KeyBuilder] = None, max_records: int = FSM_CACHE_SIZE):
+        self.db = db
+        self.flush_delay = flush_delay
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.max_records = max_records
+        self._records: "OrderedDict[str, Tuple[Optional[str], Dict[str, Any]]]" = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flushing: set[str] = set()  # Записываются сейчас: вытеснять нельзя
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _get_record(self, key: StorageKey) -> Tuple[str, Optional[str], Dict[str, Any]]:
+        record_key = self.key_builder.build(key)
+        if record_key not in self._records:
+            async with await self.db.get_async_session() as session:
+                record = await session.get(FsmRecord, record_key)
+            # Пока шел запрос, запись могла появиться в памяти — она новее
+            if record_key not in self._records:
+                self._records[record_key] = (record.state, dict(record.data or {})) if record else (None, {})
+                self._evict()
+        self._records.move_to_end(record_key)
+        state, data = self._records[record_key]
+        return record_key, state, data
+
+    def _evict(self):
+        """Вытесняет давно не использованные записи сверх max_records, уже сохраненные в БД."""
+        excess = len(self._records) - self.max_records
+        if excess <= 0:
+            return
+        # От давно использованных к недавним; последняя запись — та, к которой обращаются сейчас
+        for record_key in list(self._records)[:-1]:
+            if excess <= 0:
+                break
+            if record_key in self._dirty or record_key in self._flushing:
+                continue
+            del self._records[record_key]
+            excess -= 1
+
+    def _mark_dirty(self, record_key: str):
+        self._dirty.add(record_key)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing FSM storage: {e}")
+
+    async def flush(self):
+        """Записывает накопленные изменения в БД одной транзакцией."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            self._flushing = dirty
+            try:
+                async with await self.db.get_async_session() as session:
+                    for record_key in dirty:
+                        state, data = self._records.get(record_key, (None, {}))
+                        if state is None and not data:
+                            await session.execute(delete(FsmRecord).where(FsmRecord.key == record_key))
+                        else:
+                            await session.merge(FsmRecord(key=record_key, state=state, data=data))
+                    await session.commit()
+            except BaseException:
+                # Не теряем изменения (в том числе при отмене задачи во время записи): попробуем записать их при следующем сбросе
+                self._dirty |= dirty
+                raise
+            finally:
+                self._flushing = set()
+            self._evict()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record_key, _, data = await self._get_record(key)
+        self._records[record_key] = (state.state if isinstance(state, State) else state, data)
+        self._mark_dirty(record_key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, state, _ = await self._get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record_key, state, _ = await self._get_record(key)
+        self._records[record_key] = (state, data.copy())
+        self._mark_dirty(record_key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, _, data = await self._get_record(key)
+        return data.copy()
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+
+def create_fsm_storage(db: Database, backend: str = FSM_STORAGE) -> BaseStorage:
+    """Создает хранилище FSM по настройке FSM_STORAGE: memory, sqlite или redis."""
+    if backend == "sqlite":
+        return DatabaseStorage(db)
+    if backend == "redis":
+        # redis — необязательная зависимость, нужна только для этого режима
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(REDIS_URL)
+    if backend != "memory":
+        logger.warning(f"Unknown FSM_STORAGE '{backend}', falling back to memory")
+    return MemoryStorage()
@@ -1,17 +1,23 @@
 import datetime
 from typing import Optional
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Float, ForeignKey, JSON
+from sqlalchemy.engine import URL
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy import MetaData
 from sqlalchemy.schema import CreateTable
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 
-from app.config import SQLITE_FILE
+from app.config import SQLITE_FILE, DB_TYPE, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 # --- Конфигурация ---
 
-DATABASE_URL = f"sqlite+aiosqlite:///./{SQLITE_FILE}"  # URL вашей базы данных (sqlite для примера)
+if DB_TYPE == "postgresql":
+    # PostgreSQL через asyncpg (pip install asyncpg): несколько процессов бота могут работать с одной БД
+    DATABASE_URL = URL.create("postgresql+asyncpg", username=DB_USER, password=DB_PASSWORD,
+                              host=DB_HOST, port=DB_PORT, database=DB_NAME).render_as_string(hide_password=False)
+else:
+    DATABASE_URL = f"sqlite+aiosqlite:///./{SQLITE_FILE}"  # URL вашей базы данных (sqlite для примера)
 
 # --- Базовая модель ---
 Base = declarative_base()
@@ -22,10 +28,10 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    tg_id = Column(Integer)
+    tg_id = Column(BigInteger, index=True)  # Telegram ID не помещается в 32 бита
     full_name = Column(String, nullable=False)
     phone_number = Column(String, nullable=False, unique=True)
-    unique_code = Column(String)  # Код для заказов (генерировать при регистрации)
+    unique_code = Column(String, index=True)  # Код для заказов (генерировать при регистрации)
     main_address = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     telegram_link = Column(String, nullable=True)  # Ссылка на профиль
@@ -50,13 +56,17 @@ class Order(Base):
     total_price = Column(Float) #Цена с доставкой
     promocode = Column(String, nullable=True)  # Промокод (может быть пустым)
     payment_screenshot = Column(String, nullable=True)  # Путь к скриншоту оплаты (может быть пустым)
-    status = Column(String, default="Создан")  # Статус заказа (Создан, Оплачен, В обработке, Отправлен, Завершен, Отменен)
+    status = Column(String, default="Создан", index=True)  # Статус заказа (Создан, Оплачен, В обработке, Отправлен, Завершен, Отменен)
     #Дополнительные поля для отслеживания
     tracking_number = Column(String, nullable=True)
     estimated_delivery = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="orders") # Связь с таблицей пользователей
 
+    # Составной индекс покрывает и выборки только по user_id / user_id+status (левый префикс),
+    # а order_date в конце отдает последний заказ со статусом без сортировки
+    __table_args__ = (Index('ix_orders_user_id_status_order_date', 'user_id', 'status', 'order_date'),)
+
     def __repr__(self):
         return f"Order(id={self.id}, user_id={self.user_id}, order_date={self.order_date})"
     
@@ -86,6 +96,80 @@ class DeliveryPrice(Base):
     def __repr__(self):
         return f"<DeliveryPrice(category='{self.category}', delivery_type='{self.delivery_type}', price={self.price})>"
     
+class Counter(Base):
+    """Именованные счетчики (например, для выдачи кодов пользователей)."""
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Counter(name='{self.name}', value={self.value})>"
+
+
+class FsmRecord(Base):
+    """Состояние и данные FSM одного чата/пользователя (для постоянного хранилища FSM)."""
+    __tablename__ = "fsm_records"
+
+    key = Column(String, primary_key=True)  # Ключ aiogram StorageKey (fsm:chat_id:user_id)
+    state = Column(String, nullable=True)
+    data = Column(JSON, nullable=False, default=dict)
+
+    def __repr__(self):
+        return f"<FsmRecord(key='{self.key}', state='{self.state}')>"
+
+
+class MediaFile(Base):
+    """Telegram file_id загруженного статического файла (картинки, шаблоны документов)."""
+    __tablename__ = "media_files"
+
+    path = Column(String, primary_key=True)  # Путь к файлу относительно рабочей папки бота
+    sha256 = Column(String, nullable=False)  # Хэш содержимого, для которого получен file_id
+    file_id = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MediaFile(path='{self.path}', sha256='{self.sha256[:12]}')>"
+
+
+class OrderEvent(Base):
+    """
+    Outbox событий смены статуса заказа: пишется в той же транзакции, что и новый статус,
+    и помечается sent_at после отправки уведомления клиенту (OrderNotifier).
+    """
+    __tablename__ = "order_events"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    old_status = Column(String, nullable=True)
+    new_status = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)  # NULL — уведомление еще не отправлено
+
+    # Очередь неотправленных: WHERE sent_at IS NULL ORDER BY id
+    __table_args__ = (Index('ix_order_events_sent_at_id', 'sent_at', 'id'),)
+
+    def __repr__(self):
+        return f"<OrderEvent(id={self.id}, order_id={self.order_id}, new_status='{self.new_status}')>"
+
+
+class OrderStat(Base):
+    """
+    Агрегаты заказов, которые обновляются вместе с заказами (Database._add_order_stats):
+    kind="status" — число и сумма заказов в каждом статусе; kind="day" / "category" —
+    число и выручка неотмененных заказов по дню оформления (ГГГГ-ММ-ДД, UTC) и категории.
+    """
+    __tablename__ = "order_stats"
+
+    kind = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<OrderStat(kind='{self.kind}', key='{self.key}', orders={self.orders}, revenue={self.revenue})>"
+
+
 class PaymentDetails(Base):
         __tablename__ = "payment_details"
 
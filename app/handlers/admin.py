@@ -1,16 +1,20 @@
-import os
-import json
+import asyncio
 import logging
 from typing import Dict, Any
 from aiogram import F, Router, Bot
 from aiogram.types import (Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, Document,
     InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile)
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from typing import Optional, List
 
+from app.config import is_admin
 from app.database.database import Database
 from app.database.models import Order
+from app.utils.order_stats import format_stats_dashboard
+from app.utils.price_import import (PriceImportError, PriceList, SHEET_RATE_ROW, format_import_report,
+                                    parse_price_file, price_file_type)
 from app.keyboards.admin_kb import (create_inline_keyboard, CALLBACK_DATA_PREFIX, 
                                     order_status_keyboard, admin_keyboard)
 
@@ -101,7 +105,7 @@ async def process_user_tg_id(message: Message, state: FSMContext, db: Database):
             order_info = format_order_for_telegram(order)
             order_message += order_info
             order_message += '\n'
-        print(order_message)
+        logger.debug(order_message)
         await message.answer(
             f"Активные заказы пользователя ({user_tg_id}): {order_message}")
             
@@ -168,7 +172,7 @@ async def show_all_orders(callback: CallbackQuery, db: Database):
             order_info = format_order_for_telegram(order)
             order_message += order_info
             order_message += '\n'
-        print(order_message)
+        logger.debug(order_message)
         await callback.message.answer(
             f"Информация о заказах пользователя {tg_id}: {order_message}") # Уведомление вверху экрана
     
@@ -176,11 +180,10 @@ async def show_all_orders(callback: CallbackQuery, db: Database):
     await callback.message.answer('Основное меню:', reply_markup=admin_keyboard)
 
 
-@router.callback_query(F.data == "orders_report")
-async def orders_report(callback: CallbackQuery, db: Database, bot: Bot):
-    """Обработчик для кнопки 'Все заказы'."""
+async def send_report(callback: CallbackQuery, bot: Bot, export_report):
+    """Формирует отчет функцией export_report и отправляет файл администратору."""
     try:
-        filepath = await db.export_orders_to_excel()
+        filepath = await export_report()
         if filepath:
             try:
                 document = FSInputFile(filepath)  # Создаем FSInputFile
@@ -195,120 +198,117 @@ async def orders_report(callback: CallbackQuery, db: Database, bot: Bot):
         await callback.message.answer("Произошла ошибка при генерации отчета.")
     finally:
         await callback.answer()  # Обязательно нужно ответить на callbackQuery
-    
+
     await callback.message.answer('Основное меню:', reply_markup=admin_keyboard)
 
 
+@router.callback_query(F.data == "orders_report")
+async def orders_report(callback: CallbackQuery, db: Database, bot: Bot):
+    """Обработчик для кнопки 'Отчет [Заказы]'."""
+    await send_report(callback, bot, db.export_orders_to_excel)
+
+
 @router.callback_query(F.data == "users_report")
 async def users_report(callback: CallbackQuery, db: Database, bot: Bot):
-    """Обработчик для кнопки 'Все заказы'."""
-    try:
-        filepath = await db.export_users_to_excel()
-        if filepath:
-            try:
-                document = FSInputFile(filepath)  # Создаем FSInputFile
-                await bot.send_document(callback.message.chat.id, document=document)  # Отправляем документ
-            except FileNotFoundError:
-                await callback.message.answer("Ошибка: Файл не найден.")
-        else:
-            await callback.message.answer("Ошибка при генерации отчета. Пожалуйста, проверьте логи.")
+    """Обработчик для кнопки 'Отчет [Пользователи]'."""
+    await send_report(callback, bot, db.export_users_to_excel)
 
-    except Exception as e:
-        logging.error(f"Error in generate_report handler: {e}")
-        await callback.message.answer("Произошла ошибка при генерации отчета.")
-    finally:
-        await callback.answer()  # Обязательно нужно ответить на callbackQuery
 
-    await callback.message.answer('Основное меню:', reply_markup=admin_keyboard)
-    
+@router.callback_query(F.data == "orders_report_csv")
+async def orders_report_csv(callback: CallbackQuery, db: Database, bot: Bot):
+    """Обработчик для кнопки 'Заказы CSV'."""
+    await send_report(callback, bot, db.export_orders_to_csv)
+
+
+@router.callback_query(F.data == "users_report_csv")
+async def users_report_csv(callback: CallbackQuery, db: Database, bot: Bot):
+    """Обработчик для кнопки 'Пользователи CSV'."""
+    await send_report(callback, bot, db.export_users_to_csv)
+
+
+@router.message(Command("stats"), F.from_user.id.func(is_admin))
+async def stats_command(message: Message, db: Database):
+    """Сводка по заказам из агрегатов order_stats (без выгрузки всех заказов)."""
+    await message.answer(format_stats_dashboard(await db.get_order_stats()))
+
+
+@router.callback_query(F.data == "admin_stats", F.from_user.id.func(is_admin))
+async def stats_button(callback: CallbackQuery, db: Database):
+    """Обработчик кнопки 'Статистика'."""
+    await callback.message.answer(format_stats_dashboard(await db.get_order_stats()))
+    await callback.answer()
 
 
+@router.message(Command("stats_rebuild"), F.from_user.id.func(is_admin))
+async def stats_rebuild_command(message: Message, db: Database):
+    """Пересчитывает агрегаты с нуля по таблице orders и показывает расхождения."""
+    mismatches = await db.rebuild_order_stats()
+    if mismatches:
+        lines = [f"Агрегаты пересчитаны, исправлено расхождений: {len(mismatches)}"]
+        lines += [f"• {kind} «{key}»: {old[0]} шт./{old[1]:.2f} → {new[0]} шт./{new[1]:.2f}"
+                  for kind, key, old, new in mismatches[:30]]
+        logger.warning(f"Order stats rebuilt with {len(mismatches)} mismatches")
+    else:
+        lines = ["Агрегаты пересчитаны, расхождений нет."]
+    await message.answer("\n".join(lines))
+
 
 @router.callback_query(F.data == "update_prices")
 async def show_upload_prompt(callback: CallbackQuery):
     """Обработчик для кнопки 'Загрузить цены'"""
-    await callback.message.answer("Загрузите JSON файл для обновления цен доставки и курса валют.")
+    await callback.message.answer(
+        "Загрузите файл для обновления цен доставки и курса валют:\n"
+        "• JSON (цены, курс и реквизиты оплаты);\n"
+        "• CSV или XLSX с колонками delivery_type, category, price "
+        f"(строка с delivery_type = {SHEET_RATE_ROW} задает курс, category — его имя).")
     await callback.answer()  # Отправляем подтверждение, что callback обработан
 
 
-@router.message(F.document)
+@router.message(F.document, F.from_user.id.func(is_admin), StateFilter(None))
 async def handle_document(message: Message, bot: Bot, db: Database):
-    """Обработчик для загрузки JSON файла с ценами и курсом."""
+    """Обработчик для загрузки прайса (JSON, CSV или XLSX) с ценами и курсом."""
     document: Document = message.document # Исправлено: Получение document из message, а не из callback
-    if document.mime_type == 'application/json':
-        # Скачиваем файл
-        file_id = document.file_id
-        file = await bot.get_file(file_id)
-        file_path_dl = file.file_path
-        file_path = f"{document.file_name}"  # Убираем временное имя (оно будет создано при скачивании)
-        await bot.download_file(file_path_dl, file_path)
-
-        try:
-            # Обновляем данные в БД
-            success = await update_data_from_json(file_path, db) # Передаем db
-            if success:
-                await message.reply("Цены доставки и курс валют и реквизиты оплаты успешно обновлены!")
-            else:
-                await message.reply("Ошибка при обновлении данных. Проверьте формат файла.")
-        except Exception as e:
-            logger.error(f"Ошибка при обработке JSON файла: {e}", exc_info=True)
-            await message.reply("Произошла ошибка при обработке JSON файла. Проверьте его формат.")
-        finally:
-            try:
-                os.remove(file_path) # Пытаемся удалить файл
-            except Exception as e:
-                logger.warning(f"Не удалось удалить временный файл {file_path}: {e}") # Логируем, если не удалось удалить
-    else:
-        await message.reply("Пожалуйста, загрузите JSON файл.")
-
+    file_type = price_file_type(document.file_name, document.mime_type)
+    if file_type is None:
+        await message.reply("Пожалуйста, загрузите файл JSON, CSV или XLSX.")
+        return
 
-async def update_data_from_json(file_path: str, db: Database) -> bool:
-    """Обновляет курс валют, цены доставки и параметры оплаты из JSON файла."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as jsonfile:
-            data: Dict[str, Any] = json.load(jsonfile)
-
-        # Обновление курса юаня
-        if 'exchange_rate' in data and 'cny_to_rub' in data['exchange_rate']:
-            cny_to_rub = data['exchange_rate']['cny_to_rub']
-            await db.add_or_update_exchange_rate("cny_to_rub", cny_to_rub)
-            logger.info(f"Курс cny_to_rub обновлен: {cny_to_rub}")
-        else:
-            logger.warning("Курс cny_to_rub не найден в JSON.")
-
-        # Обновление цен доставки
-        if 'delivery_types' in data:
-            for delivery_type, category_prices in data['delivery_types'].items():
-                for category, price in category_prices.items():
-                    await db.add_or_update_delivery_price(category, delivery_type, price)
-                    logger.info(f"Цена доставки обновлена: {delivery_type}, {category}, {price}")
-        else:
-            logger.warning("Секция 'delivery_types' не найдена в JSON.")
-
-        # Обновление параметров оплаты
-        if 'payment_details' in data:
-            payment_details = data['payment_details']
-            phone_number = payment_details.get('phone_number')
-            card_number = payment_details.get('card_number')
-            FIO = payment_details.get('FIO')
-
-            if phone_number and card_number:
-                await db.add_or_update_payment_details(phone_number, card_number, FIO)
-                logger.info(
-                    f"Параметры оплаты обновлены: phone_number={phone_number}, ФИО={FIO}, card_number=****** (скрыто)")
-            else:
-                logger.warning("Не все параметры оплаты (phone_number, card_number, FIO) найдены в JSON.")
+        # Файл скачивается в память, без временного файла в рабочем каталоге
+        buffer = await bot.download(document)
+        price_list = await asyncio.to_thread(parse_price_file, buffer.getvalue(), file_type)
+        report = await update_prices(price_list, db)
+        await message.reply(f"Прайс применен.\n{report}")
+    except PriceImportError as e:
+        logger.warning(f"Некорректный файл прайса {document.file_name}: {e}")
+        await message.reply(f"Ошибка в файле: {e}")
+    except Exception as e:
+        logger.error(f"Ошибка при обработке файла прайса: {e}", exc_info=True)
+        await message.reply("Произошла ошибка при обработке файла. Проверьте его формат.")
+
+
+async def update_prices(price_list: PriceList, db: Database) -> str:
+    """Применяет прайс (курсы и цены доставки — одной транзакцией) и реквизиты оплаты; возвращает отчет."""
+    if "cny_to_rub" not in price_list.exchange_rates:
+        logger.warning("Курс cny_to_rub не найден в прайсе.")
+    diff = await db.apply_price_list(price_list.exchange_rates, price_list.delivery_prices)
+    logger.info(f"Прайс применен: добавлено {len(diff['added'])}, изменено {len(diff['changed'])}, "
+                f"без изменений {diff['unchanged']}, ошибок {len(price_list.errors)}")
+    report = format_import_report(diff, price_list.errors)
+
+    # Обновление параметров оплаты (только в JSON)
+    if price_list.payment_details:
+        payment_details = price_list.payment_details
+        phone_number = payment_details.get('phone_number')
+        card_number = payment_details.get('card_number')
+        FIO = payment_details.get('FIO')
+
+        if phone_number and card_number:
+            await db.add_or_update_payment_details(phone_number, card_number, FIO)
+            logger.info(
+                f"Параметры оплаты обновлены: phone_number={phone_number}, ФИО={FIO}, card_number=****** (скрыто)")
+            report += "\nРеквизиты оплаты обновлены."
         else:
-            logger.warning("Секция 'payment_details' не найдена в JSON.")
+            logger.warning("Не все параметры оплаты (phone_number, card_number, FIO) найдены в JSON.")
 
-        return True
-
-    except FileNotFoundError:
-        logger.error(f"Файл не найден: {file_path}", exc_info=True)
-        return False
-    except json.JSONDecodeError as e:
-        logger.error(f"Ошибка при декодировании JSON: {e}", exc_info=True)
-        return False
-    except Exception as e:
-        logger.error(f"Общая ошибка при обновлении данных из JSON: {e}", exc_info=True)
-        return False
\ No newline at end of file
+    return report
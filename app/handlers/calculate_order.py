@@ -4,16 +4,15 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram import types, F, Router, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (ReplyKeyboardRemove, CallbackQuery, InlineKeyboardButton, 
-                           InlineKeyboardMarkup, FSInputFile)
+                           InlineKeyboardMarkup)
 from app.keyboards.main_kb import main_keyboard
 from app.keyboards.calculate_order_kb import (order_type_keyboard, calculate_category_keyboard, 
                                               registration_keyboard, opt_keyboard)
 # from app.utils.currency import get_currency_cny
 from app.config import MANAGER_TELEGRAM_ID
 from app.database.database import Database
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, encoding='utf-8')
+from app.utils.outbound import OutboundQueue
+from app.utils.media import MediaRegistry
 
 router = Router()
 
@@ -61,7 +60,7 @@ async def process_order_type(callback_query: CallbackQuery, state: FSMContext):
     
 
 @router.callback_query(F.data == "opt_ask_manager")
-async def send_opt_request_to_manager(callback_query: CallbackQuery, bot: Bot, db: Database):
+async def send_opt_request_to_manager(callback_query: CallbackQuery, db: Database, outbox: OutboundQueue):
     """Sends opt price calculateion request to manager"""
 
     tg_id = callback_query.from_user.id
@@ -70,8 +69,8 @@ async def send_opt_request_to_manager(callback_query: CallbackQuery, bot: Bot, d
     # print(f"Пользователь {user.telegram_link if user.telegram_link else '' } \
     #                                 ({user.unique_code}) запросил расчет оптового заказа.")
     if user:
-        await bot.send_message(chat_id=MANAGER_TELEGRAM_ID, 
-                                text=f"Пользователь {user.telegram_link if user.telegram_link else '' } \
+        outbox.enqueue(MANAGER_TELEGRAM_ID,
+                       f"Пользователь {user.telegram_link if user.telegram_link else '' } \
                                     ({user.unique_code}) запросил расчет оптового заказа.")
         
         await callback_query.message.answer("Ваш запрос уже у нашего менеджера. Скоро он с Вами свяжется.")
@@ -79,11 +78,10 @@ async def send_opt_request_to_manager(callback_query: CallbackQuery, bot: Bot, d
     await callback_query.answer() # Acknowledge callback
 
 @router.callback_query(F.data == "shipping_cost")
-async def send_shipping_cost_document(callback_query: CallbackQuery, bot: Bot):
-    """Sends the shipping cost document to the user."""
-    document = FSInputFile("data/IR1047.xlsx") # REPLACE with correct path
-    await bot.send_document(callback_query.from_user.id, document=document, 
-                            caption="Шаблон для расчета стоимости доставки и упаковки")
+async def send_shipping_cost_document(callback_query: CallbackQuery, bot: Bot, media: MediaRegistry):
+    """Sends the shipping cost document to the user (by cached file_id after the first upload)."""
+    await media.send_document(bot, callback_query.from_user.id, "data/IR1047.xlsx",
+                              caption="Шаблон для расчета стоимости доставки и упаковки")
     await callback_query.answer() # Acknowledge callback
 
 @router.callback_query(OrderState.choosing_good, F.data.startswith("calculate_category:"))
@@ -3,7 +3,7 @@ import logging
 import datetime
 from aiogram import F, Router, Bot, types
 from aiogram.types import (Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, 
-                           InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile)
+                           InlineKeyboardButton, InlineKeyboardMarkup)
 from aiogram.utils.markdown import hlink
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -17,9 +17,10 @@ from app.keyboards.compile_order_kb import (delivery_keyboard, category_keyboard
 from app.keyboards.calculate_order_kb import registration_keyboard
 # from app.utils.currency import get_currency_cny
 from app.database.database import Database
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, encoding='utf-8')
-
+from app.utils.background import run_in_background
+from app.utils.outbound import OutboundQueue
+from app.utils.notifier import STATUS_HINTS, format_order_status
+from app.utils.logging_setup import set_log_context
 # Создаем роутер
 router = Router()
 
@@ -102,7 +103,7 @@ async def process_price(message: Message, state: FSMContext):
     """
     Обработчик ввода суммы товара.
     """
-    price = await validate_price(message.text)
+    price = validate_price(message.text)
     if price is None:
         await message.answer("Пожалуйста, введите корректную сумму в формате числа (например, 123.45).  Цена должна быть положительной.")
         return
@@ -123,7 +124,7 @@ async def process_size(message: Message, state: FSMContext):
     """
     Обработчик ввода размера товара.
     """
-    size = await validate_size(message.text)
+    size = validate_size(message.text)
     await state.update_data(size=size)
     await message.answer("Введите цвет товара (или напишите слово 'НЕТ') :")
     await state.set_state(OrderForm.waiting_for_color)
@@ -134,7 +135,7 @@ async def process_color(message: Message, state: FSMContext):
     """
     Обработчик ввода цвета товара.
     """
-    color = await validate_color(message.text)
+    color = validate_color(message.text)
     await state.update_data(color=color)
     await message.answer("Введите ссылку на товар:")
     await state.set_state(OrderForm.waiting_for_link)
@@ -145,7 +146,7 @@ async def process_link(message: Message, state: FSMContext):
     """
     Обработчик ввода ссылки на товар.
     """
-    link = await validate_link(message.text)
+    link = validate_link(message.text)
     if link is None:
         await message.answer("Пожалуйста, введите корректную ссылку на товар, начинающуюся с http:// или https://.")
         return
@@ -192,6 +193,19 @@ async def process_delivery_method(callback_query: CallbackQuery, state: FSMConte
     await display_cart(callback_query, state, db)
 
 
+def format_cart_items(cart_items: list[dict], item_prices: list[float]) -> str:
+    """
+    Форматирует список товаров корзины с их ценами в рублях (по строке на товар).
+    """
+    lines = ""
+    for i, (item, total_price) in enumerate(zip(cart_items, item_prices)):
+        category = item.get('category', 'Не указано')
+        size = item.get('size', 'Не указано')
+        color = item.get('color', 'Не указано')
+        lines += f"{i+1}. Категория: {category}, Размер: {size}, Цвет: {color}, Цена: {total_price:.2f}₽\n"
+    return lines
+
+
 async def display_cart(callback_query: CallbackQuery, state: FSMContext, db: Database):
     """
     Функция для отображения корзины.
@@ -225,34 +239,17 @@ async def display_cart(callback_query: CallbackQuery, state: FSMContext, db: Dat
                    f"Адрес: {user_data['address']}\n" \
                    f"‍ВЫБРАННЫЕ ТОВАРЫ ‍\n"
 
-    total_price_all_items = 0 #Переменная для хранения общей стоимости всех товаров
-
-    # Получаем текущий курс юаня к рублю из БД
-    cny_to_rub = await db.get_exchange_rate("cny_to_rub")
-    if cny_to_rub is None:
+    # Рассчитываем стоимость всех товаров корзины разом
+    cart_prices = await db.price_cart(cart_items)
+    if cart_prices is None:
         logging.error("Не удалось получить курс юаня из БД.")
         await callback_query.message.answer("Не удалось получить курс юаня из БД.")
         await state.clear()
         return None
+    item_prices, total_price_all_items = cart_prices
 
     # Добавляем информацию о каждом товаре
-    for i, item in enumerate(cart_items):
-        category = item.get('category', 'Не указано')
-        size = item.get('size', 'Не указано')
-        color = item.get('color', 'Не указано')
-        link = item.get('link', 'Не указано')
-        price = item.get('price', 'Не указано')
-        delivery_method = item.get('delivery_method', 'Не указано')
-
-        # Получаем стоимость доставки для текущего товара
-        delivery_price_rub = await db.get_delivery_price(category, delivery_method)
-        if delivery_price_rub is None:
-           logging.error(f"Не удалось получить цену доставки для категории '{category}' и типа '{delivery_method}' из БД.")
-           delivery_price_rub = 0 #Устанавливаем значение по умолчанию
-        price_rub = price * float(cny_to_rub)
-        total_price = price_rub + delivery_price_rub
-        total_price_all_items += total_price #Считаем общую стоимость
-        cart_message += f"{i+1}. Категория: {category}, Размер: {size}, Цвет: {color}, Цена: {total_price:.2f}₽\n"
+    cart_message += format_cart_items(cart_items, item_prices)
 
     cart_message += f"ОБЩАЯ СТОИМОСТЬ ВСЕХ ТОВАРОВ: {total_price_all_items:.2f}₽\n"
 
@@ -289,7 +286,7 @@ async def cancel_order(callback_query: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "continue_checkout")
 async def process_continue_checkout(callback_query: CallbackQuery, state: FSMContext, 
-                                    db: Database, bot: Bot):
+                                    db: Database, outbox: OutboundQueue):
     """
     Обработчик нажатия на кнопку "Продолжить оформление".
     """
@@ -313,36 +310,17 @@ async def process_continue_checkout(callback_query: CallbackQuery, state: FSMCon
                         f"Адрес: {user_data['address']}\n" \
                         f"‍ВЫБРАННЫЕ ТОВАРЫ ‍\n"
 
-    total_price_all_items = 0  # Переменная для хранения общей стоимости всех товаров
-
-    # Получаем текущий курс юаня к рублю из БД
-    cny_to_rub = await db.get_exchange_rate("cny_to_rub")
-    if cny_to_rub is None:
+    # Рассчитываем стоимость всех товаров корзины разом
+    cart_prices = await db.price_cart(cart_items)
+    if cart_prices is None:
         logging.error("Не удалось получить курс юаня из БД.")
         await callback_query.message.answer("Не удалось получить курс юаня из БД.")
         await state.clear()
         await callback_query.answer()
         return None
+    item_prices, total_price_all_items = cart_prices
 
-    for i, item in enumerate(cart_items):
-        category = item.get('category', 'Не указано')
-        size = item.get('size', 'Не указано')
-        color = item.get('color', 'Не указано')
-        link = item.get('link', 'Не указано')
-        price = item.get('price', 'Не указано')
-        delivery_method = item.get('delivery_method', 'Не указано')
-
-         # Получаем стоимость доставки в юанях из БД
-        delivery_price_rub = await db.get_delivery_price(category, delivery_method)
-        if delivery_price_rub is None:
-           logging.error(f"Не удалось получить цену доставки для категории '{category}' и типа '{delivery_method}' из БД.")
-           delivery_price_rub = 0
-
-        price_rub = price * float(cny_to_rub)
-        total_price = price_rub + delivery_price_rub
-        total_price_all_items += total_price  # Считаем общую стоимость
-
-        confirmation_message += f"{i+1}. Категория: {category}, Размер: {size}, Цвет: {color}, Цена: {total_price:.2f}₽\n"
+    confirmation_message += format_cart_items(cart_items, item_prices)
 
     confirmation_message += f"ОБЩАЯ СТОИМОСТЬ ВСЕХ ТОВАРОВ: {total_price_all_items:.2f}₽\n\n"
 
@@ -360,21 +338,19 @@ async def process_continue_checkout(callback_query: CallbackQuery, state: FSMCon
 
     await callback_query.message.answer(confirmation_message, reply_markup=confirmation_keyboard)
     await callback_query.answer()
-     # Сохраняем информацию о каждом товаре в базе данных
-    for item in cart_items:
-        category = item.get('category')
-        size = item.get('size')
-        color = item.get('color')
-        link = item.get('link')
-        price = item.get('price')
-        delivery_method = item.get('delivery_method')
-
-        # Добавляем заказ в базу данных
-        await db.add_order(user.id, category, size, color, link, price, delivery_method, total_price)
-        # Отправляем сообщение менеджеру
-        await bot.send_message(chat_id=MANAGER_TELEGRAM_ID, 
-                               text=f"Новый заказ от пользователя {user.unique_code}.")
-      
+    # Сохраняем все товары корзины в базе данных одной транзакцией
+    order_items = [dict(item, total_price=total_price) for item, total_price in zip(cart_items, item_prices)]
+    order_ids = await db.add_orders_bulk(user.id, order_items)
+    set_log_context(order_id=",".join(str(order_id) for order_id in order_ids))
+    # Запоминаем заказы этой корзины, к ним будет привязан скриншот оплаты
+    await state.update_data(order_ids=order_ids)
+
+    # Отправляем менеджеру одно сводное сообщение по всей корзине (через очередь, не дожидаясь отправки)
+    if order_ids:
+        outbox.enqueue(MANAGER_TELEGRAM_ID,
+                       f"Новый заказ от пользователя {user.unique_code}.\n"
+                       f"Коды заказов: {', '.join(str(order_id) for order_id in order_ids)}\n"
+                       f"Товаров: {len(order_ids)}, сумма: {total_price_all_items:.2f}₽")
 
 
 @router.callback_query(F.data == "back_to_cart")
@@ -390,55 +366,63 @@ async def process_confirm_payment(callback_query: CallbackQuery, state: FSMConte
     await state.set_state(OrderForm.waiting_for_payment_screenshot)
     await callback_query.answer()
 
+async def store_payment_screenshot(bot: Bot, db: Database, file_id: str, full_file_path: str,
+                                   tg_id: int, order_ids: list[int] | None):
+    """
+    Фоновое сохранение скриншота оплаты: скачивает файл в PAY_SCREENS_DIR,
+    привязывает его к заказам корзины и переводит их в статус "Оплачен".
+    """
+    await bot.download(file_id, destination=full_file_path)
+
+    if order_ids:
+        await db.save_payment_screenshots(order_ids, full_file_path)
+    else:
+        # В состоянии нет заказов (например, корзина оформлена до перезапуска бота) —
+        # привязываем скриншот к последнему неоплаченному заказу пользователя
+        order_id = await db.mark_latest_unpaid_order_paid(tg_id, full_file_path)
+        if order_id is None:
+            logging.warning(f"Нет неоплаченных заказов для скриншота оплаты пользователя {tg_id}")
+
+
 @router.message(OrderForm.waiting_for_payment_screenshot, F.photo)
 async def process_payment_screenshot(message: Message, state: FSMContext, bot: Bot, db: Database):
     """
     Обработчик получения скриншота оплаты.
+
+    Менеджеру фото пересылается по file_id (без повторной загрузки), а скачивание
+    файла и запись в БД выполняются в фоне.
     """
     photo = message.photo[-1]  # Берем фото наибольшего разрешения
     file_id = photo.file_id
-    file = await bot.get_file(file_id)
-    file_path = file.file_path
-    # Здесь можно сохранить файл, отправить его менеджеру и т.д.
 
-# Создаем имя файла для сохранения (можно использовать file_id или message_id)
+    # Создаем имя файла для сохранения (можно использовать file_id или message_id)
     file_name = f"payment_{message.from_user.id}_{message.message_id}.jpg"  # Добавляем user_id и message_id
     full_file_path = os.path.join(PAY_SCREENS_DIR, file_name)
 
-   # Создаем имя файла для сохранения (можно использовать file_id или message_id)
-    file_name = f"payment_{message.from_user.id}_{message.message_id}.jpg"  # Добавляем user_id и message_id
-    full_file_path = os.path.join(PAY_SCREENS_DIR, file_name)
+    data = await state.get_data()
+    order_ids = data.get('order_ids')
 
     try:
-        # Скачиваем файл и сохраняем его
-        await bot.download_file(file_path, full_file_path)
-
-        # Сохраняем путь к файлу в состояние (если нужно)
-        await state.update_data(payment_screenshot_path=full_file_path)
-
         await message.answer("Скриншот оплаты получен и отправлен на проверку.\nОжидайте подтверждения от менеджера.")
 
         user_id = message.from_user.id
-        username = message.from_user.username
         full_name = message.from_user.full_name
 
         # 1. Ссылка Markdown (лучший вариант)
         user_link_md = hlink(full_name, f"tg://user?id={user_id}")
+        caption = f"Новый скриншот оплаты от {user_link_md}"
+        if order_ids:
+            caption += f"\nКоды заказов: {', '.join(str(order_id) for order_id in order_ids)}"
 
-        # Отправляем скриншот менеджеру (пример)
-        await bot.send_photo(
-    chat_id=MANAGER_TELEGRAM_ID,
-    photo=FSInputFile(full_file_path),
-    caption=f"Новый скриншот оплаты от {user_link_md}"
-    )
+        # Отправляем скриншот менеджеру по file_id — Telegram не загружает фото заново
+        await bot.send_photo(chat_id=MANAGER_TELEGRAM_ID, photo=file_id, caption=caption)
         await message.reply("Информация о вашей оплате отправлена менеджеру.")  #
-        user = await db.get_user_by_tg_id(message.from_user.id)
-        active_orders = await db.get_active_orders_by_tg_id(user.tg_id)
-        order = active_orders[-1] #Берем последний заказ, так как он актуальный
-        await db.save_payment_screenshot(order.id, full_file_path)
+
+        run_in_background(store_payment_screenshot(bot, db, file_id, full_file_path, user_id, order_ids),
+                          name=f"store_payment_{message.message_id}")
 
     except Exception as e:
-        print(f"Ошибка при сохранении скриншота: {e}")
+        logging.error(f"Ошибка при обработке скриншота оплаты: {e}")
         await message.answer("Произошла ошибка при сохранении скриншота. Пожалуйста, попробуйте еще раз.")
 
     finally:
@@ -549,20 +533,37 @@ async def track_order_handler(callback_query: CallbackQuery):
 
 # === Дополнительные обработчики для кнопок отслеживания ===
 
+# Сколько последних заказов показывать в истории
+ORDER_HISTORY_LIMIT = 20
+
+
 @router.callback_query(F.data == "check_status")
-async def check_status_handler(callback_query: CallbackQuery):
+async def check_status_handler(callback_query: CallbackQuery, db: Database):
     """
-    Обработчик кнопки "Проверить статус".
+    Обработчик кнопки "Проверить статус": текущие статусы активных заказов клиента.
     """
-    await callback_query.message.answer("Текущий статус вашего заказа: ... (Замените на реальный статус)")
+    orders = await db.get_active_orders_by_tg_id(callback_query.from_user.id)
+    if orders:
+        orders = sorted(orders, key=lambda order: order.order_date, reverse=True)
+        text = "Статус ваших заказов:\n\n" + "\n\n".join(format_order_status(order) for order in orders)
+    else:
+        text = "У вас нет активных заказов."
+    await callback_query.message.answer(text)
     await callback_query.answer()
 
 @router.callback_query(F.data == "order_history")
-async def order_history_handler(callback_query: CallbackQuery):
+async def order_history_handler(callback_query: CallbackQuery, db: Database):
     """
-    Обработчик кнопки "История ваших заказов".
+    Обработчик кнопки "История ваших заказов": последние ORDER_HISTORY_LIMIT заказов.
     """
-    await callback_query.message.answer("История ваших заказов: ... (Замените на реальную историю)")
+    orders = await db.get_all_orders_by_tg_id(callback_query.from_user.id)
+    if orders:
+        orders = sorted(orders, key=lambda order: order.order_date, reverse=True)
+        text = f"История ваших заказов (всего {len(orders)}):\n\n"
+        text += "\n\n".join(format_order_status(order) for order in orders[:ORDER_HISTORY_LIMIT])
+    else:
+        text = "У вас пока нет заказов."
+    await callback_query.message.answer(text)
     await callback_query.answer()
 
 @router.callback_query(F.data == "status_info")
@@ -570,5 +571,7 @@ async def status_info_handler(callback_query: CallbackQuery):
     """
     Обработчик кнопки "Информация о статусах".
     """
-    await callback_query.message.answer("Информация о статусах: ... (Замените на реальную информацию)")
+    text = "Статусы заказа:\n" + "\n".join(f"• {status} — {hint}" for status, hint in STATUS_HINTS.items())
+    text += "\n\nПри смене статуса мы пришлем вам уведомление."
+    await callback_query.message.answer(text)
     await callback_query.answer()
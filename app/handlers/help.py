@@ -1,3 +1,4 @@
+import logging
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram import types, Router, Bot, F
@@ -44,13 +45,13 @@ async def send_message_to_manager(bot: Bot, manager_id: int, user: User, text: s
         await bot.send_message(chat_id=manager_id, text=message_text)
         return True
     except TelegramForbiddenError:
-        print(f"Менеджер с ID {manager_id} заблокировал бота.")
+        logging.warning(f"Менеджер с ID {manager_id} заблокировал бота.")
         return False
     except TelegramBadRequest as e:
-        print(f"Ошибка отправки сообщения менеджеру с ID {manager_id}: {e}")
+        logging.error(f"Ошибка отправки сообщения менеджеру с ID {manager_id}: {e}")
         return False
     except Exception as e:
-        print(f"Непредвиденная ошибка при отправке сообщения менеджеру с ID {manager_id}: {e}")
+        logging.exception(f"Непредвиденная ошибка при отправке сообщения менеджеру с ID {manager_id}: {e}")
         return False
 
 
@@ -1,3 +1,4 @@
+import logging
 from aiogram.fsm.state import State, StatesGroup
 from aiogram import types, F, Router, Bot
 from aiogram.fsm.context import FSMContext
@@ -56,11 +57,11 @@ async def track_order(callback_query: CallbackQuery, state: FSMContext, db: Data
             await bot.send_message(chat_id=MANAGER_TELEGRAM_ID, text=req_text)
             await callback_query.message.answer("Ваш запрос по трекингу заказа отправлен менеджеру")
         except TelegramForbiddenError:
-            print(f"Менеджер с ID {MANAGER_TELEGRAM_ID} заблокировал бота.")
+            logging.warning(f"Менеджер с ID {MANAGER_TELEGRAM_ID} заблокировал бота.")
         except TelegramBadRequest as e:
-            print(f"Ошибка отправки сообщения менеджеру с ID {MANAGER_TELEGRAM_ID}: {e}")
+            logging.error(f"Ошибка отправки сообщения менеджеру с ID {MANAGER_TELEGRAM_ID}: {e}")
         except Exception as e:
-            print(f"Непредвиденная ошибка при отправке сообщения менеджеру с ID {MANAGER_TELEGRAM_ID}: {e}")
+            logging.exception(f"Непредвиденная ошибка при отправке сообщения менеджеру с ID {MANAGER_TELEGRAM_ID}: {e}")
 
     await callback_query.answer()
 
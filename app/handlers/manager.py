@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 import logging
@@ -7,12 +8,17 @@ from aiogram.types import (Message, CallbackQuery, ReplyKeyboardMarkup, Keyboard
     InlineKeyboardButton, InlineKeyboardMarkup)
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from app.database.database import Database
 from app.database.models import Order
+from app.utils.logging_setup import set_log_context
+from app.utils.outbound import MESSAGE_LIMIT
+from app.utils.bulk_orders import (BULK_FILE_TYPES, BulkOrdersError, parse_order_ids, parse_tracking_file,
+                                   tracking_to_state, tracking_from_state, format_bulk_report)
 from app.keyboards.manager_kb import (create_inline_keyboard, CALLBACK_DATA_PREFIX, 
-                                    order_status_keyboard, manager_keyboard)
+                                    order_status_keyboard, manager_keyboard, orders_page_keyboard,
+                                    bulk_status_keyboard, BULK_STATUS_PREFIX, BULK_KEEP_STATUS)
 
 # Получите логгер
 logger = logging.getLogger(__name__)
@@ -23,6 +29,7 @@ router = Router()
 class ManagerStates(StatesGroup):
     waiting_for_order_code= State()
     waiting_for_user_code= State()
+    waiting_for_bulk_orders = State()
 
 
 # Вспомогательная функция для форматирования данных заказа в строку
@@ -113,7 +120,7 @@ async def process_order_code(message: Message, state: FSMContext, db: Database):
         order_message = f'Данные заказа({order_code}):\n'
         order_info = format_order_for_telegram(order)
         order_message += order_info
-        print(order_message)
+        logger.debug(order_message)
         await message.answer(f"{order_message} Укажите новый статус заказа:\n", 
                              reply_markup=order_status_keyboard)
     else:
@@ -142,7 +149,7 @@ async def process_user_tg_id(message: Message, state: FSMContext, db: Database):
             order_info = format_order_for_telegram(order)
             order_message += order_info
             order_message += '\n'
-        print(order_message)
+        logger.debug(order_message)
         await message.answer(
             f"Активные заказы пользователя ({user_code}): {order_message}")
             
@@ -188,6 +195,7 @@ async def process_status_selection(callback: CallbackQuery, state: FSMContext, d
         await callback.answer("Не найден order_code в state. Пожалуйста, выберите заказ заново.")
         return
 
+    set_log_context(order_id=order_code)
     # Обновляем статус заказа в базе данных
     success = await db.update_order_status(order_code, selected_status)
 
@@ -199,33 +207,143 @@ async def process_status_selection(callback: CallbackQuery, state: FSMContext, d
     await callback.answer() #Отвечаем на callback
     await callback.message.answer('Основное меню:', reply_markup=manager_keyboard)
  
+
+@router.callback_query(F.data == "manager_bulk_status")
+async def ask_for_bulk_orders(callback: CallbackQuery, state: FSMContext):
+    """Массовое обновление: запрашивает номера заказов или файл с трек-номерами."""
+    await callback.message.answer(
+        "Отправьте номера заказов через пробел или запятую, диапазоны через дефис (например: 101 105, 110-140)\n"
+        "или файл CSV/XLSX с колонками order_id, tracking_number, estimated_delivery (ДД.ММ.ГГГГ).")
+    await state.set_state(ManagerStates.waiting_for_bulk_orders)
+    await callback.answer()
+
+
+@router.message(ManagerStates.waiting_for_bulk_orders, F.text)
+async def process_bulk_order_ids(message: Message, state: FSMContext):
+    """Разбирает список/диапазоны номеров заказов и предлагает выбрать статус."""
+    try:
+        order_ids, errors = parse_order_ids(message.text)
+    except BulkOrdersError as e:
+        await message.answer(str(e))
+        return
+    if not order_ids:
+        await message.answer("Не найдено ни одного номера заказа. Попробуйте еще раз.")
+        return
+
+    await state.update_data(bulk_order_ids=order_ids, bulk_tracking={}, bulk_errors=errors)
+    text = f"Заказов: {len(order_ids)} ({order_ids[0]}…{order_ids[-1]})."
+    if errors:
+        text += f"\nНе распознано: {', '.join(errors)}"
+    await message.answer(f"{text}\nВыберите новый статус:", reply_markup=bulk_status_keyboard(keep_status=False))
+
+
+@router.message(ManagerStates.waiting_for_bulk_orders, F.document)
+async def process_bulk_orders_file(message: Message, state: FSMContext, bot: Bot):
+    """Разбирает файл с номерами заказов, трек-номерами и сроками доставки."""
+    document: Document = message.document
+    file_type = os.path.splitext(document.file_name or "")[1].lower()
+    if file_type not in BULK_FILE_TYPES:
+        await message.answer("Пожалуйста, загрузите файл CSV или XLSX.")
+        return
+    try:
+        buffer = await bot.download(document)
+        tracking, errors = await asyncio.to_thread(parse_tracking_file, buffer.getvalue(), file_type)
+    except BulkOrdersError as e:
+        await message.answer(f"Ошибка в файле: {e}")
+        return
+    if not tracking:
+        await message.answer("В файле нет ни одного заказа.")
+        return
+
+    await state.update_data(bulk_order_ids=sorted(tracking), bulk_tracking=tracking_to_state(tracking),
+                            bulk_errors=errors)
+    text = f"Заказов в файле: {len(tracking)}."
+    if errors:
+        text += f"\nПропущено строк: {len(errors)}"
+    await message.answer(f"{text}\nВыберите новый статус или оставьте текущий (обновятся только трек-номера):",
+                         reply_markup=bulk_status_keyboard(keep_status=True))
+
+
+@router.callback_query(F.data.startswith(BULK_STATUS_PREFIX))
+async def process_bulk_status_selection(callback: CallbackQuery, state: FSMContext, db: Database):
+    """Применяет статус и трек-номера ко всем выбранным заказам одной транзакцией."""
+    data = await state.get_data()
+    order_ids = data.get("bulk_order_ids")
+    if not order_ids:
+        await callback.answer("Список заказов не найден. Начните массовое обновление заново.")
+        return
+
+    selected_status = callback.data[len(BULK_STATUS_PREFIX):]
+    new_status = None if selected_status == BULK_KEEP_STATUS else selected_status
+    tracking = tracking_from_state(data.get("bulk_tracking") or {})
+    await state.clear()
+
+    results = await db.update_orders_bulk(order_ids, new_status=new_status, tracking=tracking)
+    logger.info(f"Bulk order update: {len(order_ids)} orders, status={new_status}, "
+                f"updated={sum(result == 'updated' for result in results.values())}")
+    await callback.message.answer(format_bulk_report(results, new_status, tracking, data.get("bulk_errors") or []))
+    await callback.answer()
+    await callback.message.answer('Основное меню:', reply_markup=manager_keyboard)
+
+
+# Размер страницы в списке заказов менеджера
+ORDERS_PAGE_SIZE = 20
+
+
+def format_orders_page(order_status: str, orders: List[Order]) -> Tuple[str, List[Order]]:
+    """
+    Текст страницы заказов не длиннее одного сообщения Telegram (MESSAGE_LIMIT).
+
+    Returns:
+        (текст, показанные заказы): не поместившиеся заказы не показываются, и страница
+        "Вперед" начинается сразу после последнего показанного.
+    """
+    message_text = f"Заказы со статусом «{order_status}»:\n"
+    shown = []
+    for order in orders:
+        order_text = format_order_data(order)
+        if shown and len(message_text) + len(order_text) > MESSAGE_LIMIT:
+            break
+        message_text += order_text
+        shown.append(order)
+    return message_text[:MESSAGE_LIMIT], shown
+
+
 # Основной обработчик callback-запросов
 @router.callback_query(F.data.startswith("manager_orders:"))  # Ловим callback, начинающиеся с 'manager_'
 async def process_manager_callback(callback: CallbackQuery, db: Database, bot: Bot):
+    """
+    Показывает одну страницу заказов с выбранным статусом.
+
+    callback_data: manager_orders:<статус>[:prev|next:<id заказа-курсора>].
+    Листание редактирует то же сообщение, из БД читается только одна страница.
+    """
+    parts = callback.data.split(":")
+    order_status = parts[1]
+    direction, cursor = (parts[2], int(parts[3])) if len(parts) == 4 else (None, None)
 
-    order_status = callback.data.split(":")[1]
+    orders, has_more = await db.get_orders_page_by_status(
+        order_status,
+        after_id=cursor if direction == "next" else None,
+        before_id=cursor if direction == "prev" else None,
+        limit=ORDERS_PAGE_SIZE,
+    )
 
-    orders = await db.get_orders_by_status(order_status)
     if orders:
-        message_text = ""
-        messages = []  # Список для хранения частей сообщений
-        for order in orders:
-            order_data = format_order_data(order)
-            if len(message_text) + len(order_data) > 4096:
-                # Текущее сообщение заполнено, отправляем его и начинаем новое
-                messages.append(message_text)
-                message_text = order_data  # Начинаем новое сообщение с текущего заказа
-            else:
-                message_text += order_data  # Добавляем заказ к текущему сообщению
-        # Отправляем последнее сообщение (если оно не пустое)
-        if message_text:
-            messages.append(message_text)
-
-        # Отправляем сообщения по частям
-        for message in messages:
-            await callback.message.answer(message)
+        if direction == "prev":
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = direction == "next", has_more
+
+        message_text, shown = format_orders_page(order_status, orders)
+        has_next = has_next or len(shown) < len(orders)
+        keyboard = orders_page_keyboard(order_status, shown[0].id, shown[-1].id, has_prev, has_next)
+
+        if direction:
+            await callback.message.edit_text(message_text, reply_markup=keyboard)
+        else:
+            await callback.message.answer(message_text, reply_markup=keyboard)
 
     else:
         await callback.message.answer("Нет заказов с указанным статусом.")
     await callback.answer()
-
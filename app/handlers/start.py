@@ -1,11 +1,12 @@
 from aiogram.filters import CommandStart
 from aiogram import types, F, Bot, Router
 from pathlib import Path
-from aiogram.types import ReplyKeyboardRemove, FSInputFile, CallbackQuery
+from aiogram.types import ReplyKeyboardRemove, CallbackQuery
 from app.keyboards.main_kb import main_keyboard, user_inline_menu
 from app.keyboards.admin_kb import admin_keyboard
 from app.keyboards.manager_kb import manager_keyboard
 from app.config import is_admin, is_manager
+from app.utils.media import MediaRegistry
 
 
 router = Router()
@@ -13,9 +14,10 @@ router = Router()
 
 
 @router.message(CommandStart())
-async def start_command(message: types.Message, bot: Bot):
+async def start_command(message: types.Message, bot: Bot, media: MediaRegistry):
     """
     Этот обработчик вызывается при команде /start. Отправляет приветственное сообщение и фото.
+    Фото загружается в Telegram один раз, дальше отправляется по file_id (см. MediaRegistry).
     """
     image_path = Path("./img/start.jpg")
 
@@ -24,29 +26,30 @@ async def start_command(message: types.Message, bot: Bot):
         return
 
     try:
-        photo = FSInputFile(path=str(image_path))
-        print("message.from_user.id=", message.from_user.id)
         if is_admin(message.from_user.id):
             # Пользователь - администратор, отправляем админ-меню
-            await bot.send_photo(
-                chat_id=message.chat.id,
-                photo=photo,
+            await media.send_photo(
+                bot,
+                message.chat.id,
+                str(image_path),
                 caption="Добро пожаловать, администратор!",
                 reply_markup=admin_keyboard # Отправляем клавиатуру администратора
             )
         elif is_manager(message.from_user.id):
             # Пользователь - администратор, отправляем админ-меню
-            await bot.send_photo(
-                chat_id=message.chat.id,
-                photo=photo,
+            await media.send_photo(
+                bot,
+                message.chat.id,
+                str(image_path),
                 caption="Добро пожаловать, менеджер!",
                 reply_markup=manager_keyboard # Отправляем клавиатуру менеджера
             )
         else:
             # Обычный пользователь, отправляем обычное меню
-            await bot.send_photo(
-                chat_id=message.chat.id,
-                photo=photo,
+            await media.send_photo(
+                bot,
+                message.chat.id,
+                str(image_path),
                 caption="Добро пожаловать!",
                 reply_markup=main_keyboard  # Отправляем основную клавиатуру
             )
@@ -10,6 +10,7 @@ from app.keyboards.calculate_order_kb import order_management_keyboard
 from app.database.database import Database  # Импортируйте класс Database
 from app.database.models import DATABASE_URL  # Импортируйте DATABASE_URL
 import asyncio # добавим асинхронность
+from app.utils.outbound import OutboundQueue
 
 class UserProfileData(StatesGroup):
     waiting_for_full_name = State()
@@ -17,8 +18,6 @@ class UserProfileData(StatesGroup):
     waiting_for_address = State()
 
 
-logging.basicConfig(level=logging.INFO, encoding='utf-8')
-
 router = Router()
 
 # Создаем экземпляр Database (важно: Singleton гарантирует, что он будет один)
@@ -59,7 +58,7 @@ async def register_phone_number(message: Message, state: FSMContext):
         await message.answer("Пожалуйста, введите корректный номер телефона.")
 
 @router.message(UserProfileData.waiting_for_address)
-async def register_user_status(message: Message, state: FSMContext, bot: Bot, db: Database): # Добавляем bot: Bot в аргументы
+async def register_user_status(message: Message, state: FSMContext, db: Database, outbox: OutboundQueue):
     address = message.text
     await state.update_data(address=address)
     data = await state.get_data()
@@ -94,11 +93,6 @@ async def register_user_status(message: Message, state: FSMContext, bot: Bot, db
             logging.warning("Failed to add user to database.  Possibly a duplicate unique_code.")
             success = False #или обрабатываем ошибку
 
-        if success:
-            print(f"Заказ пользователя ({data['tg_id']}) успешно добавлен.")
-        else:
-            print("Failed to add user profile.")
-
 
     except Exception as e:
         logging.error(f"Ошибка добавления нового заказа: {e}")
@@ -117,12 +111,9 @@ async def register_user_status(message: Message, state: FSMContext, bot: Bot, db
                 f"Telegram Link: {data.get('telegram_link')}" #Добавляем ссылку на профиль
 
     
-     # Отправляем сообщение менеджеру
-    try:
-        await bot.send_message(chat_id=MANAGER_TELEGRAM_ID, text=user_info)
-        logging.info(f"Заказ пользователя {message.from_user.id} отправлены менеджеру {MANAGER_TELEGRAM_ID}")
-    except Exception as e:
-        logging.error(f"Ошибка при отправке данных менеджеру: {e}")
+     # Отправляем сообщение менеджеру (через очередь исходящих сообщений)
+    outbox.enqueue(MANAGER_TELEGRAM_ID, user_info)
+    logging.info(f"Заказ пользователя {message.from_user.id} поставлен в очередь менеджеру {MANAGER_TELEGRAM_ID}")
 
     await message.answer(
          (
@@ -5,8 +5,13 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="Загрузить цены 📤", callback_data="update_prices")],
+    [InlineKeyboardButton(text="Статистика 📈", callback_data="admin_stats")],
     [InlineKeyboardButton(text="Отчет [Заказы] 📊", callback_data="orders_report")],
     [InlineKeyboardButton(text="Отчет [Пользователи] 👥", callback_data="users_report")],
+    [
+        InlineKeyboardButton(text="Заказы CSV 📊", callback_data="orders_report_csv"),
+        InlineKeyboardButton(text="Пользователи CSV 👥", callback_data="users_report_csv"),
+    ],
 ])
 
 
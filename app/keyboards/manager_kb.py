@@ -1,6 +1,7 @@
 from aiogram import types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from typing import Optional
 
 
 # Создан, Оплачен, В обработке, Отправлен, Завершен, Отменен
@@ -15,6 +16,7 @@ manager_keyboard = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="Завершены 🎉", callback_data="manager_orders:Завершен")],
     [InlineKeyboardButton(text="Отменены ❌", callback_data="manager_orders:Отменен")],
     [InlineKeyboardButton(text="Обновить статус", callback_data="manager_update_status")],   
+    [InlineKeyboardButton(text="Массовое обновление 📋", callback_data="manager_bulk_status")],
 ])
 
 
@@ -30,6 +32,38 @@ order_status_keyboard = InlineKeyboardMarkup(inline_keyboard=[
 ])
 
 
+# Префикс callback_data статуса в массовом обновлении; BULK_KEEP_STATUS — только трек-номера
+BULK_STATUS_PREFIX = "bulk_status_"
+BULK_KEEP_STATUS = "-"
+
+
+def bulk_status_keyboard(keep_status: bool) -> InlineKeyboardMarkup:
+    """Статусы для массового обновления (те же, что в order_status_keyboard)."""
+    rows = [[InlineKeyboardButton(text=row[0].text, callback_data=BULK_STATUS_PREFIX + row[0].text)]
+            for row in order_status_keyboard.inline_keyboard]
+    if keep_status:
+        rows.append([InlineKeyboardButton(text="Не менять статус",
+                                          callback_data=BULK_STATUS_PREFIX + BULK_KEEP_STATUS)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def orders_page_keyboard(status: str, first_id: int, last_id: int,
+                         has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """
+    Клавиатура листания списка заказов со статусом status.
+
+    В callback_data передается курсор: id первого (назад) или последнего (вперед) заказа страницы.
+    """
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"manager_orders:{status}:prev:{first_id}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"manager_orders:{status}:next:{last_id}"))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
 # ID обработчика (можно любой, но уникальный для роутера)
 CALLBACK_DATA_PREFIX = "order_id_"
 
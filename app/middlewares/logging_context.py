@@ -0,0 +1,23 @@
+# app/middlewares/logging_context.py
+from typing import Callable, Awaitable, Any
+from aiogram import BaseMiddleware
+from aiogram.types import Update, User
+
+from app.utils.logging_setup import set_log_context, reset_log_context
+
+
+class LoggingContextMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: все записи лога при обработке получают update_id и user_id."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any]
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        token = set_log_context(update_id=event.update_id, user_id=user.id if user else None)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_log_context(token)
@@ -0,0 +1,219 @@
+# app/middlewares/metrics.py
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import METRICS_LOG_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени обработчиков, сек.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class HandlerStats:
+    """Накопленные метрики одного обработчика."""
+
+    __slots__ = ("count", "errors", "seconds", "sql_queries", "sql_seconds", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, sql_queries: int, sql_seconds: float, failed: bool):
+        self.count += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.sql_queries += sql_queries
+        self.sql_seconds += sql_seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "errors": self.errors, "seconds": self.seconds,
+                "sql_queries": self.sql_queries, "sql_seconds": self.sql_seconds}
+
+
+class _UpdateSql:
+    """SQL-запросы, выполненные при обработке текущего обновления."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Контекст текущего обновления; contextvars доходят до обработчиков событий SQLAlchemy
+# (async-драйверы выполняют запросы в greenlet с контекстом вызывающей задачи)
+_current_update: contextvars.ContextVar[Optional[_UpdateSql]] = contextvars.ContextVar("metrics_update",
+                                                                                       default=None)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsCollector:
+    """
+    Метрики обработчиков: время, число SQL-запросов и время SQL по каждому обработчику.
+
+    Отдает их в текстовом формате Prometheus (render) и периодически пишет сводку
+    за интервал в лог одной JSON-строкой. Метрики свои у каждого процесса бота.
+    """
+
+    def __init__(self, log_interval: float = METRICS_LOG_INTERVAL):
+        self.log_interval = log_interval
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.sql_queries = 0  # Все запросы процесса, включая фоновые задачи
+        self.sql_seconds = 0.0
+        self._last_summary: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- SQLAlchemy ---
+
+    def instrument_engine(self, engine: AsyncEngine):
+        """Подписывается на события выполнения запросов движка (Database.engine)."""
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_query_start")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        self.sql_queries += 1
+        self.sql_seconds += elapsed
+        current = _current_update.get()
+        if current is not None:
+            current.queries += 1
+            current.seconds += elapsed
+
+    # --- Обработчики ---
+
+    def observe(self, handler: str, seconds: float, sql_queries: int, sql_seconds: float, failed: bool):
+        stats = self.handlers.get(handler)
+        if stats is None:
+            stats = self.handlers[handler] = HandlerStats()
+        stats.observe(seconds, sql_queries, sql_seconds, failed)
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus (text/plain; version=0.0.4)."""
+        lines = [
+            "# HELP bot_handler_seconds Handler wall time.",
+            "# TYPE bot_handler_seconds histogram",
+        ]
+        for name, stats in sorted(self.handlers.items()):
+            label = f'handler="{_escape_label(name)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'bot_handler_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'bot_handler_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+            lines.append(f"bot_handler_seconds_sum{{{label}}} {stats.seconds:.6f}")
+            lines.append(f"bot_handler_seconds_count{{{label}}} {stats.count}")
+
+        for metric, help_text, attr, fmt in (
+                ("bot_handler_errors_total", "Handler calls that raised.", "errors", "{}"),
+                ("bot_handler_sql_queries_total", "SQL statements executed by the handler.", "sql_queries", "{}"),
+                ("bot_handler_sql_seconds_total", "Time spent in SQL by the handler.", "sql_seconds", "{:.6f}")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in sorted(self.handlers.items()):
+                lines.append(f'{metric}{{handler="{_escape_label(name)}"}} {fmt.format(getattr(stats, attr))}')
+
+        lines += [
+            "# HELP bot_sql_queries_total SQL statements executed by the process.",
+            "# TYPE bot_sql_queries_total counter",
+            f"bot_sql_queries_total {self.sql_queries}",
+            "# HELP bot_sql_seconds_total Time spent in SQL by the process.",
+            "# TYPE bot_sql_seconds_total counter",
+            f"bot_sql_seconds_total {self.sql_seconds:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Метрики обработчиков за время с прошлой сводки, самые затратные первыми."""
+        rows = []
+        for name, stats in self.handlers.items():
+            current = stats.snapshot()
+            previous = self._last_summary.get(name, {})
+            delta = {key: value - previous.get(key, 0) for key, value in current.items()}
+            self._last_summary[name] = current
+            if delta["count"]:
+                rows.append({"handler": name, "count": delta["count"], "errors": delta["errors"],
+                             "avg_ms": round(delta["seconds"] / delta["count"] * 1000, 2),
+                             "sql_per_call": round(delta["sql_queries"] / delta["count"], 2),
+                             "sql_ms": round(delta["sql_seconds"] * 1000, 2),
+                             "total_ms": round(delta["seconds"] * 1000, 2)})
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    async def _log_loop(self):
+        while True:
+            await asyncio.sleep(self.log_interval)
+            rows = self.summary()
+            if rows:
+                logger.info("handler metrics " + json.dumps({"interval": self.log_interval, "handlers": rows},
+                                                            ensure_ascii=False))
+
+    async def start(self):
+        """Запускает периодическую сводку в лог (если log_interval > 0)."""
+        if self.log_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._log_loop(), name="metrics_log_summary")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Замеряет время обработчика и SQL-запросы, выполненные за время его работы."""
+
+    def __init__(self, collector: MetricsCollector):
+        self.collector = collector
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery | Message, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery | Message,
+        data: dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        name = f"{callback.__module__}.{callback.__qualname__}" if callback else type(event).__name__
+
+        sql = _UpdateSql()
+        token = _current_update.set(sql)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.collector.observe(name, time.perf_counter() - started, sql.queries, sql.seconds, failed)
+            _current_update.reset(token)
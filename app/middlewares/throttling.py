@@ -0,0 +1,46 @@
+# app/middlewares/throttling.py
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.utils.outbound import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingRequestMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: все исходящие запросы с chat_id (send_message, message.answer,
+    send_photo, ...) проходят через общий и поканальный token bucket, а ответ 429
+    (TelegramRetryAfter) повторяется после указанной Telegram паузы.
+    """
+
+    def __init__(self, limiter: RateLimiter, max_retries: int = 3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        attempt = 0
+        while True:
+            if chat_id is not None:
+                await self.limiter.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood control on {type(method).__name__} to {chat_id}, "
+                               f"retry in {e.retry_after}s ({attempt}/{self.max_retries})")
+                await asyncio.sleep(e.retry_after)
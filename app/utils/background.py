@@ -0,0 +1,28 @@
+import asyncio
+import logging
+from typing import Coroutine
+
+logger = logging.getLogger(__name__)
+
+# Ссылки на запущенные задачи, чтобы их не собрал сборщик мусора до завершения
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _on_task_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()!r}")
+
+
+def run_in_background(coro: Coroutine, name: str = None) -> asyncio.Task:
+    """Запускает корутину в фоне, не дожидаясь ее завершения; ошибки попадают в лог."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+async def wait_background_tasks():
+    """Дожидается завершения фоновых задач (при остановке бота)."""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
@@ -0,0 +1,154 @@
+import datetime
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.reports import read_table
+
+# Не больше стольких заказов за одно массовое обновление (защита от опечаток вида 1-100000)
+MAX_BULK_ORDERS = 1000
+
+BULK_FILE_TYPES = (".csv", ".xlsx")
+
+# Колонки файла с трек-номерами; допускаются и русские заголовки
+BULK_COLUMNS = {
+    "order_id": "order_id", "заказ": "order_id", "номер заказа": "order_id",
+    "tracking_number": "tracking_number", "трек": "tracking_number", "трек-номер": "tracking_number",
+    "estimated_delivery": "estimated_delivery", "дата доставки": "estimated_delivery",
+}
+
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d.%m.%y")
+
+_SEPARATORS = re.compile(r"[\s,;]+")
+_RANGE = re.compile(r"^(\d+)\s*[-–]\s*(\d+)$")
+
+# Трек-номер и срок доставки по id заказа; None — поле не меняется
+Tracking = Dict[int, Tuple[Optional[str], Optional[datetime.datetime]]]
+
+
+class BulkOrdersError(ValueError):
+    """Список заказов или файл не удалось разобрать."""
+
+
+def parse_order_ids(text: str) -> Tuple[List[int], List[str]]:
+    """
+    Разбирает номера заказов: "101 102, 110-120; 130".
+
+    Диапазон, который вывел бы список за MAX_BULK_ORDERS, не разворачивается и
+    попадает в нераспознанные фрагменты.
+
+    Returns:
+        (отсортированные уникальные id, нераспознанные фрагменты).
+    """
+    ids = set()
+    errors = []
+    for token in _SEPARATORS.split((text or "").replace(" - ", "-").strip()):
+        if not token:
+            continue
+        match = _RANGE.match(token)
+        if token.isdigit():
+            ids.add(int(token))
+        elif match and int(match.group(1)) <= int(match.group(2)):
+            first, last = int(match.group(1)), int(match.group(2))
+            # Размер диапазона проверяем до разворачивания: опечатка 1-300000000 не должна занимать память
+            if last - first + 1 + len(ids) > MAX_BULK_ORDERS:
+                errors.append(token)
+                continue
+            ids.update(range(first, last + 1))
+        else:
+            errors.append(token)
+        if len(ids) > MAX_BULK_ORDERS:
+            raise BulkOrdersError(f"Слишком много заказов: не больше {MAX_BULK_ORDERS} за раз")
+    return sorted(ids), errors
+
+
+def _parse_date(value: Any) -> Optional[datetime.datetime]:
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value).strip(), date_format)
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def parse_tracking_file(content: bytes, file_type: str) -> Tuple[Tracking, List[str]]:
+    """
+    Разбирает CSV/XLSX с колонками order_id и необязательными tracking_number, estimated_delivery
+    (дата в формате ДД.ММ.ГГГГ или ГГГГ-ММ-ДД). Функция синхронная (asyncio.to_thread).
+
+    Returns:
+        ({id заказа: (трек-номер, срок доставки)}, ошибки по строкам файла).
+    """
+    try:
+        table = read_table(content, file_type)
+    except ValueError as e:
+        raise BulkOrdersError(str(e)) from e
+    if not table:
+        raise BulkOrdersError("Пустой файл")
+
+    columns = [BULK_COLUMNS.get(str(name).strip().lower()) if name is not None else None for name in table[0]]
+    if "order_id" not in columns:
+        raise BulkOrdersError("Нет колонки order_id (номер заказа)")
+
+    tracking: Tracking = {}
+    errors: List[str] = []
+    for line, row in enumerate(table[1:], start=2):
+        record = {column: cell for column, cell in zip(columns, row) if column and cell not in (None, "")}
+        if not record:
+            continue
+        try:
+            order_id = int(float(str(record.get("order_id", "")).strip()))
+        except ValueError:
+            errors.append(f"строка {line}: номер заказа {record.get('order_id')!r}")
+            continue
+        try:
+            estimated = _parse_date(record["estimated_delivery"]) if "estimated_delivery" in record else None
+        except ValueError:
+            errors.append(f"строка {line}: дата {record['estimated_delivery']!r}")
+            continue
+        number = str(record["tracking_number"]).strip() if "tracking_number" in record else None
+        tracking[order_id] = (number or None, estimated)
+        if len(tracking) > MAX_BULK_ORDERS:
+            raise BulkOrdersError(f"Слишком много заказов: не больше {MAX_BULK_ORDERS} за раз")
+    return tracking, errors
+
+
+def tracking_to_state(tracking: Tracking) -> Dict[str, List[Optional[str]]]:
+    """Трек-номера в виде, пригодном для хранения в данных FSM (JSON)."""
+    return {str(order_id): [number, estimated.isoformat() if estimated else None]
+            for order_id, (number, estimated) in tracking.items()}
+
+
+def tracking_from_state(data: Dict[str, List[Optional[str]]]) -> Tracking:
+    return {int(order_id): (number, datetime.datetime.fromisoformat(estimated) if estimated else None)
+            for order_id, (number, estimated) in data.items()}
+
+
+def format_bulk_report(results: Dict[int, str], new_status: Optional[str], tracking: Tracking,
+                       errors: List[str], limit: int = 50) -> str:
+    """Отчет менеджеру по каждому заказу (результаты Database.update_orders_bulk)."""
+    updated = [order_id for order_id, result in results.items() if result == "updated"]
+    unchanged = [order_id for order_id, result in results.items() if result == "unchanged"]
+    not_found = [order_id for order_id, result in results.items() if result == "not_found"]
+
+    lines = [f"Обновлено заказов: {len(updated)}" + (f" (статус «{new_status}»)" if new_status else "")]
+    for order_id in updated[:limit]:
+        line = f"✅ №{order_id}"
+        number, estimated = tracking.get(order_id, (None, None))
+        if number:
+            line += f", трек {number}"
+        if estimated:
+            line += f", доставка {estimated.strftime('%d.%m.%Y')}"
+        lines.append(line)
+    if len(updated) > limit:
+        lines.append(f"… и еще {len(updated) - limit}")
+    if unchanged:
+        lines.append(f"Без изменений: {', '.join(map(str, unchanged[:limit]))}")
+    if not_found:
+        lines.append(f"❌ Не найдены: {', '.join(map(str, not_found[:limit]))}")
+    if errors:
+        lines.append("Пропущено: " + "; ".join(errors[:limit]))
+    return "\n".join(lines)
@@ -1,14 +1,109 @@
-import requests
-
-
-def get_currency_cny():
-    resp = requests.get('https://www.cbr-xml-daily.ru/daily_json.js', timeout=5)
-    if resp.status_code == 200:
-        data = resp.json()
-        currency = data.get('Valute')
-        cny = currency.get('CNY')
-        value = cny.get('Value')
-        return float(value)
-    
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from app.config import CBR_URL, CBR_RATE_NAME, CBR_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_currency_cny(session: aiohttp.ClientSession, url: str = CBR_URL,
+                             timeout: float = 5) -> Optional[float]:
+    """
+    Запрашивает курс юаня к рублю у ЦБ РФ (формат cbr-xml-daily.ru).
+
+    Returns:
+        Курс за 1 CNY в рублях или None, если ответ некорректный.
+    """
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        if resp.status != 200:
+            logger.warning(f"CBR responded with status {resp.status}")
+            return None
+        # Сервис отдает JSON с content-type application/javascript
+        data = await resp.json(content_type=None)
+    cny = data.get('Valute', {}).get('CNY')
+    if not cny:
+        return None
+    return float(cny['Value']) / float(cny.get('Nominal', 1))
+
+
+class CurrencyRateProvider:
+    """
+    Фоновое обновление курса юаня ЦБ РФ.
+
+    Курс запрашивается по расписанию в отдельной задаче и записывается в БД через
+    Database.add_or_update_exchange_rate, а обработчики читают закэшированное
+    значение (provider.rate или db.get_exchange_rate) без обращения к сети.
+    """
+
+    def __init__(self, db, url: str = CBR_URL, rate_name: str = CBR_RATE_NAME,
+                 interval: float = CBR_REFRESH_INTERVAL, timeout: float = 5):
+        self.db = db
+        self.url = url
+        self.rate_name = rate_name
+        self.interval = interval
+        self.timeout = timeout
+        self._rate: Optional[float] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Последний полученный курс (без сетевых запросов)."""
+        return self._rate
+
+    async def refresh(self) -> Optional[float]:
+        """Запрашивает курс и сохраняет его в БД. Ошибки сети только логируются."""
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        try:
+            rate = await fetch_currency_cny(self._session, self.url, self.timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logger.error(f"Error fetching CNY rate from CBR: {e}")
+            return None
+
+        if rate is None:
+            logger.warning("CBR response does not contain CNY rate")
+            return None
+
+        await self.db.add_or_update_exchange_rate(self.rate_name, rate)
+        self._rate = rate
+        logger.info(f"Курс {self.rate_name} обновлен: {rate}")
+        return rate
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing CNY rate: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """Загружает сохраненный курс из БД и запускает фоновое обновление."""
+        self._rate = await self.db.get_exchange_rate(self.rate_name)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую задачу и закрывает HTTP-сессию."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
 if __name__ == "__main__":
-    print(get_currency_cny())
\ No newline at end of file
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            print(await fetch_currency_cny(session))
+
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+class OrderStatusChanged:
+    """Статус заказа изменен (событие публикуется после commit, запись о нем уже в order_events)."""
+
+    __slots__ = ("event_id", "order_id", "old_status", "new_status")
+
+    def __init__(self, event_id: int, order_id: int, old_status: Optional[str], new_status: str):
+        self.event_id = event_id
+        self.order_id = order_id
+        self.old_status = old_status
+        self.new_status = new_status
+
+    def __repr__(self):
+        return (f"OrderStatusChanged(event_id={self.event_id}, order_id={self.order_id}, "
+                f"{self.old_status!r} -> {self.new_status!r})")
+
+
+class EventBus:
+    """
+    Шина событий внутри процесса: Database публикует события, потребители подписываются по типу.
+
+    Подписчики вызываются синхронно в publish и не должны блокировать: тяжелую работу
+    (отправку сообщений) они переносят в свои фоновые задачи, как OrderNotifier.
+    Ошибка подписчика логируется и не влияет на остальных и на публикующий код.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[type, List[Callable]] = defaultdict(list)
+
+    def subscribe(self, event_type: Type, callback: Callable):
+        self._subscribers[event_type].append(callback)
+
+    def unsubscribe(self, event_type: Type, callback: Callable):
+        if callback in self._subscribers.get(event_type, []):
+            self._subscribers[event_type].remove(callback)
+
+    def publish(self, event):
+        for callback in list(self._subscribers.get(type(event), ())):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in event subscriber {callback!r} for {event!r}: {e}")
@@ -0,0 +1,138 @@
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Any, Dict, Optional
+
+from app.config import LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_CONSOLE
+
+# Поля контекста, которые попадают в каждую запись лога текущего обновления
+CONTEXT_FIELDS = ("update_id", "user_id", "order_id")
+
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None  # После fork поток записи в дочернем процессе не работает
+
+
+def set_log_context(**fields) -> contextvars.Token:
+    """
+    Добавляет поля (update_id, user_id, order_id) к записям лога текущей задачи.
+
+    Возвращает токен для reset_log_context.
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: contextvars.Token):
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Переносит поля контекста в запись (в задаче, которая пишет в лог, до постановки в очередь)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля контекста."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат, дополненный полями контекста."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = " ".join(f"{field}={getattr(record, field)}" for field in CONTEXT_FIELDS
+                           if getattr(record, field, None) is not None)
+        return f"{line} [{context}]" if context else line
+
+
+class _PreformattedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который передает трейсбек отдельно от текста сообщения."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы и трейсбек форматируем здесь: в потоке записи объекты из args
+        # могут быть уже изменены, а exc_info не должен держать ссылки на кадры стека
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL, log_format: str = LOG_FORMAT,
+                  console: bool = LOG_CONSOLE) -> logging.handlers.QueueListener:
+    """
+    Настраивает логирование через очередь: обработчики вызывают только queue.put,
+    а запись в файл (с ротацией по размеру) и в консоль выполняет фоновый поток.
+
+    Вызывается один раз при запуске процесса; stop_logging дописывает очередь.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter()
+    handlers = []
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                                            backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _PreformattedQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    return _listener
+
+
+def stop_logging():
+    """Дописывает накопленные записи и останавливает поток записи."""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+from app.database.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 16) -> str:
+    """Считает sha256 содержимого файла (блокирующая функция, вызывать через asyncio.to_thread)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaRegistry:
+    """
+    Отправка статических файлов (start.jpg, шаблоны xlsx) по Telegram file_id.
+
+    Файл загружается в Telegram один раз, полученный file_id сохраняется в БД
+    (таблица media_files) вместе с sha256 содержимого. Дальше файл отправляется
+    по file_id. Если содержимое файла изменилось или Telegram не принял file_id,
+    файл загружается заново. Хэш пересчитывается, только когда меняются
+    размер или время изменения файла.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        # path -> (mtime_ns, size, sha256, file_id)
+        self._entries: Dict[str, Tuple[int, int, str, Optional[str]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _resolve(self, path: str) -> Tuple[str, Optional[str]]:
+        """Возвращает (sha256, file_id или None) для текущего содержимого файла."""
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2], entry[3]
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        file_id = await self.db.get_media_file_id(path, sha256)
+        self._entries[path] = (stat.st_mtime_ns, stat.st_size, sha256, file_id)
+        return sha256, file_id
+
+    def _forget(self, path: str):
+        entry = self._entries.get(path)
+        if entry:
+            self._entries[path] = (entry[0], entry[1], entry[2], None)
+
+    async def _send(self, send_method, kind: str, chat_id: int, path: str, **kwargs) -> Message:
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        sha256, file_id = await self._resolve(path)
+        if file_id:
+            try:
+                return await send_method(chat_id, file_id, **kwargs)
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached file_id for {path} rejected, re-uploading: {e}")
+                self._forget(path)
+
+        # Загружаем один раз, даже если /start пришел от нескольких пользователей одновременно
+        async with lock:
+            sha256, file_id = await self._resolve(path)
+            if file_id:
+                return await send_method(chat_id, file_id, **kwargs)
+            message = await send_method(chat_id, FSInputFile(path), **kwargs)
+            file_id = message.photo[-1].file_id if kind == "photo" else message.document.file_id
+            await self.db.save_media_file_id(path, sha256, file_id)
+            mtime_ns, size = self._entries[path][:2]
+            self._entries[path] = (mtime_ns, size, sha256, file_id)
+            logger.info(f"Uploaded {path} to Telegram, file_id cached")
+            return message
+
+    async def send_photo(self, bot: Bot, chat_id: int, path: str, **kwargs) -> Message:
+        """bot.send_photo для локального файла с повторным использованием file_id."""
+        return await self._send(bot.send_photo, "photo", chat_id, path, **kwargs)
+
+    async def send_document(self, bot: Bot, chat_id: int, path: str, **kwargs) -> Message:
+        """bot.send_document для локального файла с повторным использованием file_id."""
+        return await self._send(bot.send_document, "document", chat_id, path, **kwargs)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from app.config import NOTIFY_BATCH_SIZE, NOTIFY_FLUSH_INTERVAL, NOTIFY_POLL_INTERVAL, NOTIFY_RETRY_DELAY
+from app.database.models import Order
+from app.utils.events import OrderStatusChanged
+from app.utils.outbound import OutboundQueue
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых повтор не поможет (бот заблокирован, чат удален, сообщение отклонено):
+# такие уведомления считаются обработанными, чтобы не отправлять их бесконечно
+FINAL_SEND_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+# Предел паузы перед повтором отправки клиенту, сек.
+MAX_RETRY_DELAY = 3600
+
+# Пояснение для клиента к новому статусу заказа
+STATUS_HINTS = {
+    "Создан": "⏳ Ожидает оплаты.",
+    "Оплачен": "✅ Оплата получена, ожидаем подтверждения.",
+    "В обработке": "🛠️ Заказ в обработке.",
+    "Доставка по Китаю": "🇨🇳 Заказ едет на склад в Китае.",
+    "Доставка по РФ": "🇷🇺 Заказ отправлен в Россию.",
+    "Отправлен": "🚀 Заказ отправлен!",
+    "Завершен": "🎉 Заказ завершен. Спасибо за покупку!",
+    "Отменен": "❌ Заказ отменен.",
+}
+
+
+def format_order_status(order: Order) -> str:
+    """Короткая строка о заказе для клиента: номер, товар, статус, трек-номер и срок доставки."""
+    text = f"📦 Заказ №{order.id} ({order.category}, {order.order_date.strftime('%d.%m.%Y')}): {order.status}"
+    if order.tracking_number:
+        text += f"\n🔎 Номер отслеживания: {order.tracking_number}"
+    if order.estimated_delivery:
+        text += f"\n🚚 Ожидаемая дата доставки: {order.estimated_delivery.strftime('%d.%m.%Y')}"
+    return text
+
+
+class OrderNotifier:
+    """
+    Уведомляет клиентов о смене статуса заказа из outbox-таблицы order_events.
+
+    Database.update_order_status пишет событие в той же транзакции, что и статус,
+    и публикует OrderStatusChanged; нотификатор по сигналу ждет flush_interval,
+    чтобы собрать пачку, и отправляет каждому клиенту одно сообщение обо всех его
+    заказах через OutboundQueue (с ее лимитами отправки). События отмечаются
+    отправленными только для чатов, куда сообщение дошло (или окончательно
+    отклонено Telegram), остальные досылаются позже и после перезапуска
+    (возможен повтор, но не потеря). Клиент с неудачной отправкой пропускается
+    при выборке событий retry_delay секунд (пауза удваивается с каждой неудачей),
+    чтобы его события не занимали каждую пачку и не задерживали остальных.
+
+    Запускается в одном процессе бота; события других процессов подхватываются
+    опросом таблицы раз в poll_interval.
+    """
+
+    def __init__(self, db, outbox: OutboundQueue, batch_size: int = NOTIFY_BATCH_SIZE,
+                 flush_interval: float = NOTIFY_FLUSH_INTERVAL, poll_interval: float = NOTIFY_POLL_INTERVAL,
+                 retry_delay: float = NOTIFY_RETRY_DELAY):
+        self.db = db
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._retry_at: Dict[int, Tuple[int, float]] = {}  # tg_id -> (число неудач, когда повторить)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_status_changed(self, event: OrderStatusChanged):
+        self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Отправляет одну пачку неотправленных событий; возвращает число выбранных
+        событий (отправленных, отклоненных и отложенных).
+        """
+        now = time.monotonic()
+        postponed = [tg_id for tg_id, (_, retry_at) in self._retry_at.items() if retry_at > now]
+        pending = await self.db.get_pending_order_events(self.batch_size, exclude_tg_ids=postponed)
+        if not pending:
+            return 0
+
+        # По каждому заказу сообщаем только текущий статус, даже если он менялся несколько раз
+        orders_by_chat: Dict[int, Dict[int, Order]] = {}
+        events_by_chat: Dict[int, List[int]] = {}
+        for event, order, tg_id in pending:
+            orders_by_chat.setdefault(tg_id, {})[order.id] = order
+            events_by_chat.setdefault(tg_id, []).append(event.id)
+        deliveries = {}
+        for tg_id, orders in orders_by_chat.items():
+            lines = ["🔔 Изменился статус заказа:" if len(orders) == 1 else "🔔 Изменились статусы заказов:"]
+            for order in orders.values():
+                lines.append(format_order_status(order))
+                hint = STATUS_HINTS.get(order.status)
+                if hint:
+                    lines.append(hint)
+            deliveries[tg_id] = self.outbox.enqueue(tg_id, "\n".join(lines))
+
+        await asyncio.wait(deliveries.values())
+        sent_ids = []
+        for tg_id, delivery in deliveries.items():
+            error = None if delivery.cancelled() else delivery.exception()
+            if delivery.cancelled() or (error is not None and not isinstance(error, FINAL_SEND_ERRORS)):
+                self._postpone(tg_id)
+                continue
+            self._retry_at.pop(tg_id, None)
+            sent_ids += events_by_chat[tg_id]
+        await self.db.mark_order_events_sent(sent_ids)
+        logger.info(f"Order status notifications sent: {len(sent_ids)} of {len(pending)} events, "
+                    f"{len(orders_by_chat)} customers")
+        return len(pending)
+
+    def _postpone(self, tg_id: int):
+        """Откладывает повтор отправки клиенту: пауза удваивается с каждой неудачей."""
+        failures = self._retry_at.get(tg_id, (0, 0.0))[0] + 1
+        delay = min(self.retry_delay * 2 ** (failures - 1), MAX_RETRY_DELAY)
+        self._retry_at[tg_id] = (failures, time.monotonic() + delay)
+        logger.warning(f"Order notification to {tg_id} failed ({failures} times), retry in {delay:.0f}s")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                if not self._stopping:
+                    await asyncio.sleep(self.flush_interval)  # Собираем события в пачку
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while not self._stopping and await self.flush() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Error sending order status notifications: {e}")
+
+    async def start(self):
+        """Подписывается на события БД и запускает отправку (сразу досылает накопленное)."""
+        if self._task is None:
+            self._stopping = False
+            self.db.events.subscribe(OrderStatusChanged, self._on_status_changed)
+            self._wakeup.set()
+            self._task = asyncio.create_task(self._run(), name="order_notifier")
+
+    async def stop(self):
+        """Дожидается текущей пачки и останавливается; остальное отправится после перезапуска."""
+        if self._task is not None:
+            self.db.events.unsubscribe(OrderStatusChanged, self._on_status_changed)
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=30)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+            self._task = None
@@ -0,0 +1,100 @@
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+CANCELLED_STATUS = "Отменен"
+NO_KEY = "—"  # Заказ без категории или даты
+
+# Изменение заказа для агрегатов: (старый статус или None для нового заказа, новый статус,
+# total_price, order_date, category)
+OrderChange = Tuple[Optional[str], str, Optional[float], Optional[datetime.datetime], Optional[str]]
+# (kind, key) -> (число заказов, сумма)
+Stats = Dict[Tuple[str, str], Tuple[int, float]]
+
+
+def _day_key(order_date) -> str:
+    return order_date.strftime("%Y-%m-%d") if order_date else NO_KEY
+
+
+def order_stat_deltas(changes: Iterable[OrderChange]) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Приращения агрегатов order_stats для новых заказов и смен статуса.
+
+    Строки status учитывают все заказы; day и category — только неотмененные, поэтому
+    отмена заказа (и ее снятие) меняет и их.
+    """
+    deltas: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+    for old_status, new_status, total_price, order_date, category in changes:
+        total = total_price or 0.0
+        if old_status is not None:
+            deltas[("status", old_status)][0] -= 1
+            deltas[("status", old_status)][1] -= total
+        deltas[("status", new_status)][0] += 1
+        deltas[("status", new_status)][1] += total
+
+        was_counted = old_status is not None and old_status != CANCELLED_STATUS
+        counted = new_status != CANCELLED_STATUS
+        if counted != was_counted:
+            sign = 1 if counted else -1
+            for key in (("day", _day_key(order_date)), ("category", category or NO_KEY)):
+                deltas[key][0] += sign
+                deltas[key][1] += sign * total
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def compute_order_stats(rows: List[Tuple[str, Optional[float], Optional[datetime.datetime], Optional[str]]]) -> Stats:
+    """
+    Пересчет агрегатов с нуля по строкам заказов (status, total_price, order_date, category)
+    группировками pandas. Функция синхронная: вызывается через asyncio.to_thread.
+    """
+    frame = pd.DataFrame(rows, columns=["status", "total_price", "order_date", "category"])
+    if frame.empty:
+        return {}
+    frame["total_price"] = frame["total_price"].fillna(0.0)
+    frame["status"] = frame["status"].fillna(NO_KEY)
+    frame["category"] = frame["category"].fillna(NO_KEY)
+    frame["day"] = pd.to_datetime(frame["order_date"]).dt.strftime("%Y-%m-%d").fillna(NO_KEY)
+    active = frame[frame["status"] != CANCELLED_STATUS]
+
+    stats: Stats = {}
+    for kind, data, column in (("status", frame, "status"), ("day", active, "day"), ("category", active, "category")):
+        grouped = data.groupby(column)["total_price"].agg(["count", "sum"])
+        stats.update({(kind, str(key)): (int(count), float(total))
+                      for key, count, total in grouped.itertuples()})
+    return stats
+
+
+def diff_order_stats(current: Stats, rebuilt: Stats, tolerance: float = 0.01) -> List[Tuple[str, str, Tuple, Tuple]]:
+    """Расхождения инкрементальных агрегатов с пересчитанными: (kind, key, было, стало)."""
+    mismatches = []
+    for key in sorted(set(current) | set(rebuilt)):
+        old, new = current.get(key, (0, 0.0)), rebuilt.get(key, (0, 0.0))
+        if old[0] != new[0] or abs(old[1] - new[1]) > tolerance:
+            mismatches.append((key[0], key[1], old, new))
+    return mismatches
+
+
+def format_stats_dashboard(stats: Stats, days: int = 14) -> str:
+    """Сводка для администратора: заказы по статусам, выручка по дням и категориям."""
+    by_kind: Dict[str, Dict[str, Tuple[int, float]]] = defaultdict(dict)
+    for (kind, key), value in stats.items():
+        by_kind[kind][key] = value
+
+    statuses = by_kind["status"]
+    total_orders = sum(count for count, _ in statuses.values())
+    lines = [f"📊 Статистика заказов (всего {total_orders})", "", "🚦 По статусам:"]
+    lines += [f"  {status}: {count} шт. на {total:,.0f} ₽".replace(",", " ")
+              for status, (count, total) in sorted(statuses.items(), key=lambda item: -item[1][0]) if count]
+
+    since = _day_key(datetime.datetime.utcnow() - datetime.timedelta(days=days - 1))
+    recent = sorted(((day, value) for day, value in by_kind["day"].items() if since <= day != NO_KEY), reverse=True)
+    lines += ["", f"📅 Выручка за последние {days} дн. (без отмененных):"]
+    lines += [f"  {day}: {count} шт. на {total:,.0f} ₽".replace(",", " ") for day, (count, total) in recent if count]
+
+    lines += ["", "🏷️ По категориям (без отмененных):"]
+    lines += [f"  {category}: {count} шт. на {total:,.0f} ₽".replace(",", " ")
+              for category, (count, total) in sorted(by_kind["category"].items(), key=lambda item: -item[1][1])
+              if count]
+    return "\n".join(lines)
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from aiogram import Bot
+
+from app.config import TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+ChatId = Union[int, str]
+
+
+def chat_key(chat_id: ChatId) -> ChatId:
+    """
+    Ключ чата для лимитов и очереди: числовой id строкой ("123", как MANAGER_TELEGRAM_ID из .env)
+    и числом (message.answer) — один и тот же чат; @username остается строкой.
+    """
+    if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+        return int(chat_id)
+    return chat_id
+
+
+# Сообщение в очереди: текст, параметры send_message и future с результатом отправки
+QueuedMessage = Tuple[str, Dict[str, Any], asyncio.Future]
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Ждет, пока появится токен, и забирает его."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Ограничение исходящих запросов к Telegram: общий лимит бота и лимит на каждый чат.
+
+    Корзины чатов хранятся в LRU-словаре ограниченного размера.
+    """
+
+    def __init__(self, global_rate: float = TG_GLOBAL_RATE, chat_rate: float = TG_CHAT_RATE,
+                 chat_burst: float = TG_CHAT_BURST, max_chats: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self._chat_buckets: "OrderedDict[ChatId, TokenBucket]" = OrderedDict()
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        chat_id = chat_key(chat_id)
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            while len(self._chat_buckets) > self.max_chats:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def acquire(self, chat_id: Optional[ChatId]):
+        if chat_id is not None:
+            await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+
+class OutboundQueue:
+    """
+    Очередь исходящих уведомлений (менеджеру, клиентам), которые не нужно ждать в обработчике.
+
+    enqueue возвращает управление сразу; воркеры отправляют сообщения через bot
+    (запросы проходят через ThrottlingRequestMiddleware). Подряд идущие простые
+    тексты в один чат склеиваются в одно сообщение до MESSAGE_LIMIT символов.
+
+    enqueue возвращает future: результат True после отправки или исключение
+    Telegram, если сообщение отправить не удалось (ждать ее не обязательно).
+    """
+
+    def __init__(self, bot: Bot, workers: int = 4):
+        self.bot = bot
+        self.workers = workers
+        self._pending: Dict[ChatId, Deque[QueuedMessage]] = {}
+        self._ready: "asyncio.Queue[ChatId]" = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    def enqueue(self, chat_id: ChatId, text: str, **kwargs) -> asyncio.Future:
+        """Ставит сообщение в очередь (kwargs — параметры bot.send_message); возвращает future отправки."""
+        delivery = asyncio.get_running_loop().create_future()
+        chat_id = chat_key(chat_id)
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            pending = self._pending[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        pending.append((text, kwargs, delivery))
+        return delivery
+
+    @staticmethod
+    def coalesce(items: Deque[QueuedMessage]) -> List[Tuple[str, Dict[str, Any], List[asyncio.Future]]]:
+        """Склеивает подряд идущие сообщения без доп. параметров, не превышая MESSAGE_LIMIT."""
+        batches: List[Tuple[str, Dict[str, Any], List[asyncio.Future]]] = []
+        for text, kwargs, delivery in items:
+            if batches and not kwargs and not batches[-1][1] \
+                    and len(batches[-1][0]) + len(text) + 2 <= MESSAGE_LIMIT:
+                batches[-1] = (batches[-1][0] + "\n\n" + text, {}, batches[-1][2] + [delivery])
+            else:
+                batches.append((text, kwargs, [delivery]))
+        return batches
+
+    async def _send_chat(self, chat_id: ChatId):
+        # Чат остается в _pending, пока воркер не закончит: сообщения, поставленные во время
+        # отправки, дописываются сюда же и не достаются другому воркеру (порядок в чате сохраняется)
+        pending = self._pending[chat_id]
+        batches = []
+        try:
+            while pending:
+                batches = self.coalesce(pending)
+                pending.clear()
+                for text, kwargs, deliveries in batches:
+                    try:
+                        await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                    except Exception as e:
+                        logger.error(f"Error sending queued message to {chat_id}: {e}")
+                        for delivery in deliveries:
+                            if not delivery.done():
+                                delivery.set_exception(e)
+                                delivery.exception()  # помечаем исключение как полученное, если никто не ждет
+                    else:
+                        for delivery in deliveries:
+                            if not delivery.done():
+                                delivery.set_result(True)
+        finally:
+            del self._pending[chat_id]
+            # Воркер остановлен посреди отправки: ожидающие результата не должны зависнуть
+            for delivery in [delivery for _, _, deliveries in batches for delivery in deliveries] + \
+                    [delivery for _, _, delivery in pending]:
+                if not delivery.done():
+                    delivery.cancel()
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                await self._send_chat(chat_id)
+            finally:
+                self._ready.task_done()
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def join(self):
+        """Ждет отправки всех сообщений, поставленных в очередь."""
+        await self._ready.join()
+
+    async def stop(self):
+        """Дожидается отправки очереди и останавливает воркеры."""
+        if self._tasks:
+            await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
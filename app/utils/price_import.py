@@ -0,0 +1,184 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.regex import validate_price, validate_records
+from app.utils.reports import read_table
+
+# Поддерживаемые форматы прайса: расширение файла -> MIME-типы, которые присылает Telegram
+PRICE_FILE_TYPES = {
+    ".json": ("application/json",),
+    ".csv": ("text/csv", "text/comma-separated-values", "application/csv"),
+    ".xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",),
+}
+
+# Колонки таблицы цен (CSV/XLSX); допускаются и русские заголовки
+SHEET_COLUMNS = {
+    "delivery_type": "delivery_type", "способ доставки": "delivery_type",
+    "category": "category", "категория": "category",
+    "price": "price", "цена": "price",
+}
+
+# Строка таблицы с таким delivery_type задает курс: category — имя курса, price — значение
+SHEET_RATE_ROW = "exchange_rate"
+
+
+class PriceImportError(ValueError):
+    """Файл прайса не удалось разобрать."""
+
+
+class PriceList:
+    """Разобранный прайс: курсы, цены доставки по (категория, способ доставки) и реквизиты оплаты."""
+
+    def __init__(self, exchange_rates: Dict[str, float], delivery_prices: Dict[Tuple[str, str], float],
+                 payment_details: Optional[Dict[str, Any]] = None,
+                 errors: Optional[List[Tuple[str, str, Any]]] = None):
+        self.exchange_rates = exchange_rates
+        self.delivery_prices = delivery_prices
+        self.payment_details = payment_details
+        self.errors = errors or []  # Отброшенные строки: (строка или ключ цены, поле, значение)
+
+
+def price_file_type(file_name: Optional[str], mime_type: Optional[str]) -> Optional[str]:
+    """Определяет формат прайса по расширению, а если его нет — по MIME-типу."""
+    extension = os.path.splitext(file_name or "")[1].lower()
+    if extension in PRICE_FILE_TYPES:
+        return extension
+    for extension, mime_types in PRICE_FILE_TYPES.items():
+        if mime_type in mime_types:
+            return extension
+    return None
+
+
+def _non_empty(value: Any) -> Optional[str]:
+    text = str(value).strip() if value is not None else ""
+    return text or None
+
+
+def _non_negative_price(value: Any) -> Optional[float]:
+    """Цена доставки: число >= 0 (бесплатная доставка допустима)."""
+    try:
+        price = float(str(value).replace(",", ".")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price >= 0 else None
+
+
+def _positive_rate(value: Any) -> Optional[float]:
+    """Курс: положительное число (в CSV допускается десятичная запятая)."""
+    rate = _non_negative_price(value)
+    return validate_price(rate) if rate is not None else None
+
+
+PRICE_ROW_RULES = {"delivery_type": _non_empty, "category": _non_empty, "price": _non_negative_price}
+RATE_ROW_RULES = {"category": _non_empty, "price": _positive_rate}
+
+
+def _row_label(row: Dict[str, Any]) -> str:
+    if "line" in row:
+        return f"строка {row['line']}"
+    return " / ".join(str(row[key]) for key in ("delivery_type", "category") if row.get(key))
+
+
+def _from_rows(rows: List[Dict[str, Any]], payment_details: Optional[Dict[str, Any]] = None,
+               exchange_rates: Optional[Dict[str, Any]] = None) -> PriceList:
+    """Проверяет строки прайса и собирает PriceList (при повторе пары побеждает последняя строка)."""
+    rate_rows = [row for row in rows if row.get("delivery_type") == SHEET_RATE_ROW]
+    price_rows = [row for row in rows if row.get("delivery_type") != SHEET_RATE_ROW]
+    rate_rows += [{"category": name, "price": value} for name, value in (exchange_rates or {}).items()]
+
+    prices, price_errors = validate_records(price_rows, PRICE_ROW_RULES)
+    rates, rate_errors = validate_records(rate_rows, RATE_ROW_RULES)
+    errors = [(_row_label(price_rows[index]), field, value) for index, field, value in price_errors]
+    errors += [(_row_label(rate_rows[index]), field, value) for index, field, value in rate_errors]
+
+    return PriceList(
+        exchange_rates={row["category"]: row["price"] for row in rates},
+        delivery_prices={(row["category"], row["delivery_type"]): row["price"] for row in prices},
+        payment_details=payment_details,
+        errors=errors,
+    )
+
+
+def _json_object(data: Dict[str, Any], key: str, path: str = "") -> Dict[str, Any]:
+    """Значение data[key], которое должно быть JSON-объектом (отсутствующее или null — пустой объект)."""
+    value = data.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise PriceImportError(f"«{path}{key}» должен быть объектом {{...}}, а не {type(value).__name__}")
+    return value
+
+
+def parse_json(content: bytes) -> PriceList:
+    """
+    JSON прежнего формата: {"exchange_rate": {...}, "delivery_types": {тип: {категория: цена}},
+    "payment_details": {...}}.
+    """
+    try:
+        data = json.loads(content.decode("utf-8-sig"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise PriceImportError(f"Некорректный JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise PriceImportError("Ожидается JSON-объект")
+
+    exchange_rates = _json_object(data, "exchange_rate")
+    payment_details = _json_object(data, "payment_details")
+    delivery_types = _json_object(data, "delivery_types")
+    rows = [{"delivery_type": delivery_type, "category": category, "price": price}
+            for delivery_type in delivery_types
+            for category, price in _json_object(delivery_types, delivery_type, "delivery_types.").items()]
+    return _from_rows(rows, payment_details=payment_details or None, exchange_rates=exchange_rates)
+
+
+def _sheet_rows(header: List[Any], rows) -> List[Dict[str, Any]]:
+    columns = [SHEET_COLUMNS.get(str(name).strip().lower()) if name is not None else None for name in header]
+    missing = {"delivery_type", "category", "price"} - set(columns)
+    if missing:
+        raise PriceImportError(f"Нет колонок: {', '.join(sorted(missing))}")
+    records = []
+    for line, row in enumerate(rows, start=2):  # Первая строка — заголовок
+        if not any(cell not in (None, "") for cell in row):
+            continue  # Пустые строки в конце листа
+        record = {column: cell for column, cell in zip(columns, row) if column}
+        record["line"] = line
+        record["delivery_type"] = _non_empty(record.get("delivery_type"))
+        record["category"] = _non_empty(record.get("category"))
+        records.append(record)
+    return records
+
+
+def parse_sheet(content: bytes, file_type: str) -> PriceList:
+    """CSV или первый лист .xlsx с колонками delivery_type, category, price."""
+    try:
+        table = read_table(content, file_type)
+    except ValueError as e:
+        raise PriceImportError(str(e)) from e
+    if not table:
+        raise PriceImportError("Пустой файл")
+    return _from_rows(_sheet_rows(table[0], table[1:]))
+
+
+def parse_price_file(content: bytes, file_type: str) -> PriceList:
+    """
+    Разбирает файл прайса. Функция синхронная: вызывается через asyncio.to_thread,
+    чтобы разбор большого листа не блокировал event loop.
+    """
+    if file_type == ".json":
+        return parse_json(content)
+    return parse_sheet(content, file_type)
+
+
+def format_import_report(diff: Dict[str, Any], errors: List[Tuple[str, str, Any]], limit: int = 20) -> str:
+    """Текст отчета об импорте для администратора (изменения из Database.apply_price_list)."""
+    lines = [f"Добавлено: {len(diff['added'])}, изменено: {len(diff['changed'])}, "
+             f"без изменений: {diff['unchanged']}"]
+    changes = [f"+ {name}: {new}" for name, new in diff["added"]]
+    changes += [f"~ {name}: {old} → {new}" for name, old, new in diff["changed"]]
+    lines += changes[:limit]
+    if len(changes) > limit:
+        lines.append(f"… и еще {len(changes) - limit}")
+    if errors:
+        lines.append(f"Пропущено строк с ошибками: {len({label for label, _, _ in errors})}")
+        lines += [f"! {label}: {field} = {value!r}" for label, field, value in errors[:limit]]
+    return "\n".join(lines)
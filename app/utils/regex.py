@@ -1,13 +1,30 @@
 ## -*- coding: utf-8 -*-
 
 import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 
 # Шаблонные регулярные выражения
 EMAIL_REGEX = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
 PHONE_REGEX = r"^\+?\d[\d\s\-]+(?:\d)$"
+NAME_PART_REGEX = r"^[A-Za-zА-Яа-яёЁ\s\-]+$"
+CITY_NAME_REGEX = r"^[A-Za-zА-Яа-яёЁ\s\-\']+$"
+
+# Все шаблоны компилируются один раз при импорте модуля
+EMAIL_PATTERN = re.compile(EMAIL_REGEX)
+PHONE_PATTERN = re.compile(PHONE_REGEX)
+NAME_PART_PATTERN = re.compile(NAME_PART_REGEX)
+CITY_NAME_PATTERN = re.compile(CITY_NAME_REGEX)
+PHONE_JUNK_PATTERN = re.compile(r"[^0-9+]")
+
+
+@lru_cache(maxsize=128)
+def _compile(regex: str) -> re.Pattern:
+  return re.compile(regex)
+
 
 def check_regex(regex, string):
-  pattern = re.compile(regex)
+  pattern = regex if isinstance(regex, re.Pattern) else _compile(regex)
   if pattern.fullmatch(string):
     return True
   else:
@@ -27,7 +44,7 @@ def validate_email(email: str) -> bool:
     """
     if not isinstance(email, str):
         return False
-    return bool(re.match(EMAIL_REGEX, email))
+    return bool(EMAIL_PATTERN.match(email))
 
 
 
@@ -44,7 +61,7 @@ def normolize_phone_number(phone_number: str) -> str:
   """
 
   # Удаляем все символы, кроме цифр и плюса
-  cleaned_number = re.sub(r"[^0-9+]", "", phone_number)
+  cleaned_number = PHONE_JUNK_PATTERN.sub("", phone_number)
 
   # Удаляем плюс, если он не в начале
   if "+" in cleaned_number and cleaned_number[0] != "+":
@@ -103,7 +120,7 @@ def validate_phone(phone: str) -> bool:
     """
     if not isinstance(phone, str):
         return False
-    return bool(re.match(PHONE_REGEX, phone))
+    return bool(PHONE_PATTERN.match(phone))
 
 
 def validate_age(age: str) -> bool:
@@ -144,9 +161,8 @@ def validate_full_name(full_name: str) -> bool:
         return False
 
     # Проверяем каждое слово на соответствие шаблону
-    pattern = r"^[A-Za-zА-Яа-яёЁ\s\-]+$"
     for part in parts:
-        if not re.match(pattern, part):
+        if not NAME_PART_PATTERN.match(part):
             return False  # Если хоть одно слово содержит невалидные символы
 
 
@@ -174,16 +190,16 @@ def validate_city_name(city_name: str) -> bool:
     # [A-Za-zА-Яа-яёЁ\s\-\'] - любой символ из букв, пробелов, дефисов или апострофов
     # + - как минимум один символ должен быть в названии города
     # $ - конец строки
-    pattern = r"^[A-Za-zА-Яа-яёЁ\s\-\']+$"
-    if not re.match(pattern, city_name):
+    if not CITY_NAME_PATTERN.match(city_name):
         return False  # Если название города содержит невалидные символы
 
     return True  # Если все проверки пройдены, название города корректно
 
 
 # --- Функции валидации ---
+# Синхронные: это чистая работа CPU, корутина только добавляла накладные расходы
 
-async def validate_price(price: str) -> float | None:
+def validate_price(price: str) -> float | None:
     """Проверяет, является ли введенное значение ценой."""
     try:
         price_float = float(price)
@@ -191,31 +207,74 @@ async def validate_price(price: str) -> float | None:
             return price_float
         else:
             return None  # Цена должна быть положительной
-    except ValueError:
+    except (TypeError, ValueError):
         return None  # Не удалось преобразовать в число
 
-async def validate_size(size: str) -> str:
+def validate_size(size: str) -> str:
     """Проверяет, что размер - это строка, или 'нет'."""
     size = size.lower()
     if size == "нет":
         return "нет"
     return size #Размер может быть любым
 
-async def validate_color(color: str) -> str:
+def validate_color(color: str) -> str:
     """Проверяет, что цвет - это строка, или 'нет'."""
     color = color.lower()
     if color == "нет":
         return "нет"
     return color #Цвет может быть любым
 
-async def validate_link(link: str) -> str | None:
+def validate_link(link: str) -> str | None:
     """Проверяет, что ссылка похожа на URL. (Базовая проверка)"""
-    if link.startswith("http://") or link.startswith("https://"):
+    if link.startswith(("http://", "https://")):
         return link
     else:
         return None  # Некорректная ссылка
 
 
+# --- Пакетная проверка (массовый импорт) ---
+
+def validate_many(validator: Callable[[Any], Any], values: Iterable[Any]) -> List[Any]:
+    """
+    Применяет валидатор ко всем значениям за один проход.
+
+    Returns:
+        Список результатов валидатора в том же порядке (None/False — значение некорректно).
+    """
+    return [validator(value) for value in values]
+
+
+def validate_records(records: Iterable[Dict[str, Any]],
+                     rules: Dict[str, Callable[[Any], Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str, Any]]]:
+    """
+    Проверяет записи (например, строки импортируемого файла) по правилам {поле: валидатор}.
+
+    Валидатор может вернуть bool (validate_full_name) или нормализованное значение
+    (validate_price): False/None считаются ошибкой, True оставляет значение как есть,
+    иначе в запись подставляется результат.
+
+    Returns:
+        (корректные записи с нормализованными полями, ошибки [(номер записи, поле, значение)]).
+    """
+    valid: List[Dict[str, Any]] = []
+    errors: List[Tuple[int, str, Any]] = []
+    rule_items = list(rules.items())
+    for index, record in enumerate(records):
+        cleaned = dict(record)
+        ok = True
+        for field, validator in rule_items:
+            value = record.get(field)
+            result = validator(value)
+            if result is None or result is False:
+                errors.append((index, field, value))
+                ok = False
+            elif result is not True:
+                cleaned[field] = result
+        if ok:
+            valid.append(cleaned)
+    return valid, errors
+
+
 
 
 if __name__ == '__main__':
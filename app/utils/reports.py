@@ -0,0 +1,81 @@
+import csv
+import io
+from typing import Iterable, List, Sequence
+
+from openpyxl import Workbook, load_workbook
+
+
+class ExcelReportWriter:
+    """
+    Построчная запись отчета в .xlsx в режиме write-only.
+
+    Строки сразу сбрасываются во временный файл openpyxl, поэтому память не
+    растет вместе с размером таблицы. Методы синхронные: вызываются из
+    рабочего потока (asyncio.to_thread), чтобы не блокировать event loop.
+    """
+
+    def __init__(self, filename: str, headers: Sequence[str]):
+        self.filename = filename
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(list(headers))
+
+    def write_rows(self, rows: Iterable[Sequence]):
+        for row in rows:
+            self.sheet.append(list(row))
+
+    def close(self):
+        self.workbook.save(self.filename)
+
+
+class CsvReportWriter:
+    """Построчная запись отчета в .csv (utf-8 с BOM, чтобы Excel корректно открывал кириллицу)."""
+
+    def __init__(self, filename: str, headers: Sequence[str]):
+        self.filename = filename
+        self.file = open(filename, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows: Iterable[Sequence]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+REPORT_WRITERS = {
+    'xlsx': ExcelReportWriter,
+    'csv': CsvReportWriter,
+}
+
+
+def read_table(content: bytes, file_type: str) -> List[list]:
+    """
+    Читает загруженную таблицу (.csv или первый лист .xlsx) в список строк, первая — заголовок.
+
+    CSV: utf-8 (с BOM или без) либо cp1251, разделитель , ; или табуляция.
+    Функция синхронная (вызывается через asyncio.to_thread); ValueError — файл не читается.
+    """
+    if file_type == ".csv":
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = content.decode("cp1251")  # CSV, сохраненный Excel в русской локали
+        try:
+            dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        return list(csv.reader(io.StringIO(text), dialect))
+
+    if file_type == ".xlsx":
+        try:
+            workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Некорректный файл Excel: {e}") from e
+        try:
+            return [list(row) for row in workbook.active.iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+
+    raise ValueError(f"Неподдерживаемый формат таблицы: {file_type}")
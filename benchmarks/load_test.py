@@ -0,0 +1,331 @@
+"""
+Нагрузочный тест: синтетические пользователи проходят всю воронку заказа через настоящие роутеры.
+
+Каждый пользователь: /start → регистрация → корзина из нескольких товаров → оформление →
+подтверждение оплаты → скриншот. Параллельно менеджер листает оформленные заказы и меняет
+их статусы, а администратор загружает CSV-прайс (getFile + скачивание файла), смотрит /stats
+и выгружает отчет по заказам. Обновления подаются в dp.feed_raw_update, запросы к Bot API
+обрабатывает фейковая сессия (без сети), БД — отдельный SQLite во временной папке.
+
+Выводит p50/p95/p99 времени обработки по шагам, число SQL-запросов на шаг и пропускную способность.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_test --users 200 --concurrency 50 --items 2 --api-latency 0.05
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime
+import itertools
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANAGER_ID = 900000001
+ADMIN_ID = 900000002
+USER_ID_BASE = 100000000
+
+# Конфигурация читается при импорте app.config, поэтому окружение и рабочую папку
+# (БД, pay_screens, логи) подготавливаем до импорта модулей бота
+WORK_DIR = tempfile.mkdtemp(prefix="poizon_load_")
+for _static_dir in ("img", "data"):
+    shutil.copytree(os.path.join(PROJECT_DIR, _static_dir), os.path.join(WORK_DIR, _static_dir))
+os.environ.update({
+    "BOT_TOKEN": "123456:LOADTEST",
+    "MANAGER_TELEGRAM_ID": str(MANAGER_ID),
+    "ADMIN_TELEGRAM_IDS": str(ADMIN_ID),
+    "SQLITE_FILE": "load_test.db",
+    "CBR_REFRESH_INTERVAL": "0",
+    "BOT_RUN_MODE": "polling",
+})
+os.chdir(WORK_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import GetFile, SendDocument, SendPhoto, TelegramMethod  # noqa: E402
+from aiogram.types import Chat, Document, File, Message, PhotoSize  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database.database import Database  # noqa: E402
+from app.database.models import DATABASE_URL  # noqa: E402
+from app.utils.logging_setup import setup_logging, stop_logging  # noqa: E402
+from bot import create_dispatcher  # noqa: E402
+
+CATEGORIES = ["Одежда", "Верхняя одежда", "Летняя обувь", "Зимняя обувь", "Парфюм"]
+DELIVERY_METHODS = ["Автоэкспресс", "Авиаэкспресс"]
+
+# Счетчик SQL-запросов текущего обновления (contextvars доходят до обработчиков событий SQLAlchemy)
+_sql_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("sql_queries", default=None)
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия Bot API без сети: считает вызовы и возвращает правдоподобные ответы."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.files: Dict[str, bytes] = {}  # file_path -> содержимое документов, «присланных» пользователями
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, GetFile):
+            file_path = f"documents/{method.file_id}"
+            if file_path not in self.files:
+                file_path = f"photos/{method.file_id}.jpg"
+            return File(file_id=method.file_id, file_unique_id=method.file_id, file_path=file_path)
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return True  # answerCallbackQuery, deleteWebhook и т.п.
+        message = {"message_id": next(self._message_ids), "date": datetime.datetime.now(),
+                   "chat": Chat(id=int(chat_id), type="private"), "text": getattr(method, "text", None)}
+        if isinstance(method, SendPhoto):
+            message["photo"] = [PhotoSize(file_id=f"photo_{message['message_id']}",
+                                          file_unique_id=f"photo_{message['message_id']}", width=1, height=1)]
+        elif isinstance(method, SendDocument):
+            message["document"] = Document(file_id=f"doc_{message['message_id']}",
+                                           file_unique_id=f"doc_{message['message_id']}")
+        return Message(**message)
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        for file_path in list(self.files):
+            if url.endswith("/" + file_path):
+                yield self.files.pop(file_path)
+                return
+        yield b"\xff\xd8fake-jpeg\xff\xd9"
+
+    async def close(self):
+        pass
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.updates = 0
+
+
+class UpdateFeeder:
+    """Собирает JSON обновлений Telegram и подает их в диспетчер, замеряя время и SQL-запросы."""
+
+    def __init__(self, dp, bot: Bot, stats: Stats):
+        self.dp = dp
+        self.bot = bot
+        self.stats = stats
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(tg_id: int) -> dict:
+        return {"id": tg_id, "is_bot": False, "first_name": "Load", "last_name": str(tg_id),
+                "username": f"load{tg_id}"}
+
+    def _message(self, tg_id: int, **content) -> dict:
+        return {"message_id": next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": tg_id, "type": "private"}, "from": self._user(tg_id), **content}
+
+    async def _feed(self, step: str, update: dict):
+        counter = [0]
+        token = _sql_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_raw_update(self.bot, {"update_id": next(self._update_ids), **update})
+        except Exception as e:
+            self.stats.errors[f"{step}: {type(e).__name__}: {e}"] += 1
+        finally:
+            self.stats.latencies[step].append(time.perf_counter() - started)
+            self.stats.queries[step].append(counter[0])
+            self.stats.updates += 1
+            _sql_queries.reset(token)
+
+    async def text(self, step: str, tg_id: int, text: str):
+        await self._feed(step, {"message": self._message(tg_id, text=text)})
+
+    async def photo(self, step: str, tg_id: int):
+        file_id = f"screen_{tg_id}_{next(self._message_ids)}"
+        await self._feed(step, {"message": self._message(tg_id, photo=[
+            {"file_id": file_id, "file_unique_id": file_id, "width": 720, "height": 1280}])})
+
+    async def document(self, step: str, tg_id: int, file_name: str, mime_type: str, content: bytes):
+        file_id = f"doc_{tg_id}_{next(self._message_ids)}"
+        self.bot.session.files[f"documents/{file_id}"] = content  # Отдаст фейковая сессия при скачивании
+        await self._feed(step, {"message": self._message(tg_id, document={
+            "file_id": file_id, "file_unique_id": file_id, "file_name": file_name, "mime_type": mime_type,
+            "file_size": len(content)})})
+
+    async def callback(self, step: str, tg_id: int, data: str):
+        await self._feed(step, {"callback_query": {
+            "id": str(next(self._update_ids)), "from": self._user(tg_id), "chat_instance": str(tg_id),
+            "data": data, "message": self._message(tg_id, text="menu")}})
+
+
+async def user_funnel(feeder: UpdateFeeder, index: int, items: int):
+    tg_id = USER_ID_BASE + index
+    await feeder.text("start", tg_id, "/start")
+    await feeder.callback("assemble_unregistered", tg_id, "assemble_order")
+    await feeder.callback("registration", tg_id, "registration")
+    await feeder.text("full_name", tg_id, "Иван Нагрузочный")
+    await feeder.text("phone", tg_id, f"+7 900 {index:07}")
+    await feeder.text("address", tg_id, "Москва, Южные ворота")
+    await feeder.callback("assemble_order", tg_id, "assemble_order")
+    for item in range(items):
+        if item:
+            await feeder.callback("add_another_item", tg_id, "add_another_item")
+        await feeder.callback("category", tg_id, f"category:{CATEGORIES[(index + item) % len(CATEGORIES)]}")
+        await feeder.text("price", tg_id, str(100 + index % 900))
+        await feeder.text("size", tg_id, "M")
+        await feeder.text("color", tg_id, "нет")
+        await feeder.text("link", tg_id, f"https://dw4.co/t/A/{index}{item}")
+        await feeder.callback("delivery_method", tg_id,
+                              f"delivery:{DELIVERY_METHODS[(index + item) % len(DELIVERY_METHODS)]}")
+    await feeder.callback("continue_checkout", tg_id, "continue_checkout")
+    await feeder.callback("confirm_payment", tg_id, "confirm_payment")
+    await feeder.photo("payment_screenshot", tg_id)
+
+
+async def manager_loop(feeder: UpdateFeeder, db: Database, stop: asyncio.Event, pause: float):
+    """Менеджер листает оформленные заказы и переводит самый старый в обработку."""
+    while not stop.is_set():
+        await feeder.callback("manager_orders", MANAGER_ID, "manager_orders:Создан")
+        orders, _ = await db.get_orders_page_by_status("Создан", limit=1)
+        if orders:
+            await feeder.callback("manager_select_order", MANAGER_ID, f"order_id_{orders[0].id}")
+            await feeder.callback("manager_set_status", MANAGER_ID, "status_В обработке")
+        await asyncio.sleep(pause)
+
+
+def price_csv(delivery_price: float) -> bytes:
+    """Прайс в CSV (формат загрузки администратора): курс и цены доставки для всех категорий."""
+    lines = ["delivery_type;category;price", "exchange_rate;cny_to_rub;12,5"]
+    lines += [f"{delivery_method};{category};{delivery_price:g}"
+              for category in CATEGORIES for delivery_method in DELIVERY_METHODS]
+    return "\n".join(lines).encode("utf-8")
+
+
+async def admin_loop(feeder: UpdateFeeder, stop: asyncio.Event, pause: float):
+    """Администратор загружает прайс (каждый второй меняет цены), смотрит /stats и выгружает отчет."""
+    for round_index in itertools.count():
+        if stop.is_set():
+            break
+        await feeder.document("admin_price_upload", ADMIN_ID, "prices.csv", "text/csv",
+                              price_csv(1500.0 + round_index % 2 * 100))
+        await feeder.text("admin_stats", ADMIN_ID, "/stats")
+        await feeder.callback("admin_orders_report", ADMIN_ID, "orders_report_csv")
+        await asyncio.sleep(pause)
+
+
+async def seed_pricing(db: Database):
+    await db.add_or_update_exchange_rate("cny_to_rub", 12.5, refresh_cache=False)
+    for category in CATEGORIES:
+        for delivery_method in DELIVERY_METHODS:
+            await db.add_or_update_delivery_price(category, delivery_method, 1500.0, refresh_cache=False)
+    await db.add_or_update_payment_details("+79000000000", "0000 0000 0000 0000", "Тест Тестов")
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def print_report(stats: Stats, session: FakeTelegramSession, users: int, elapsed: float, total_queries: int):
+    print(f"\n{'шаг':<24}{'n':>7}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'SQL/шаг':>10}")
+    for step, values in stats.latencies.items():
+        print(f"{step:<24}{len(values):>7}"
+              f"{percentile(values, 0.50) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}{statistics.mean(stats.queries[step]):>10.1f}")
+    all_latencies = [value for values in stats.latencies.values() for value in values]
+    print(f"\nПользователей: {users}, обновлений: {stats.updates}, время: {elapsed:.2f} с")
+    print(f"Пропускная способность: {stats.updates / elapsed:.1f} обновлений/с, {users / elapsed:.1f} воронок/с")
+    print(f"Все обновления: p50 {percentile(all_latencies, 0.5) * 1000:.1f} мс, "
+          f"p95 {percentile(all_latencies, 0.95) * 1000:.1f} мс, p99 {percentile(all_latencies, 0.99) * 1000:.1f} мс")
+    print(f"SQL-запросов всего: {total_queries} ({total_queries / max(stats.updates, 1):.1f} на обновление)")
+    print("Вызовы Bot API: " + ", ".join(f"{name}={count}" for name, count in session.calls.most_common()))
+    if stats.errors:
+        print("\nОшибки:")
+        for error, count in stats.errors.most_common(10):
+            print(f"  {count} × {error}")
+
+
+async def run(users: int, concurrency: int, items: int, api_latency: float, manager_pause: float,
+              admin_pause: float):
+    db = Database(DATABASE_URL)
+    session = FakeTelegramSession(latency=api_latency)
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = create_dispatcher(db, bot)
+    stats = Stats()
+    feeder = UpdateFeeder(dp, bot, stats)
+
+    total_queries = 0
+
+    def count_query(*args):
+        nonlocal total_queries
+        total_queries += 1
+        counter = _sql_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    await db.create_db_and_tables()
+    await seed_pricing(db)
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    event.listen(db.engine.sync_engine, "before_cursor_execute", count_query)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int):
+        async with semaphore:
+            await user_funnel(feeder, index, items)
+
+    stop_manager = asyncio.Event()
+    started = time.perf_counter()
+    manager = asyncio.create_task(manager_loop(feeder, db, stop_manager, manager_pause))
+    admin = asyncio.create_task(admin_loop(feeder, stop_manager, admin_pause))
+    await asyncio.gather(*(limited(index) for index in range(users)))
+    elapsed = time.perf_counter() - started
+    stop_manager.set()
+    await asyncio.gather(manager, admin)
+    await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+
+    print_report(stats, session, users, elapsed, total_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="число синтетических пользователей")
+    parser.add_argument("--concurrency", type=int, default=25, help="сколько пользователей активны одновременно")
+    parser.add_argument("--items", type=int, default=2, help="товаров в корзине каждого пользователя")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, сек.")
+    parser.add_argument("--manager-pause", type=float, default=0.05, help="пауза между действиями менеджера, сек.")
+    parser.add_argument("--admin-pause", type=float, default=0.5,
+                        help="пауза между загрузками прайса администратором, сек.")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="дублировать лог бота в консоль с этого уровня (по умолчанию только в load_test.log)")
+    parser.add_argument("--keep", action="store_true", help=f"не удалять рабочую папку с БД ({WORK_DIR})")
+    args = parser.parse_args()
+    # Как в боте: запись лога в фоновом потоке
+    setup_logging(log_file="load_test.log", level=args.log_level or "INFO", console=bool(args.log_level))
+    try:
+        asyncio.run(run(args.users, args.concurrency, args.items, args.api_latency, args.manager_pause,
+                        args.admin_pause))
+    finally:
+        stop_logging()
+        os.chdir(PROJECT_DIR)
+        if args.keep:
+            print(f"Рабочая папка: {WORK_DIR}")
+        else:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Сравнение пропускной способности SQLite до и после настройки профиля (WAL, PRAGMA, пул).
+
+Создает синтетическую таблицу заказов и в течение заданного времени параллельно
+выполняет чтения (get_order_by_id / get_active_orders_by_tg_id) и записи
+(add_orders_bulk / update_order_status).
+
+Запуск из корня проекта:
+    python -m benchmarks.sqlite_profile --orders 20000 --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from app.database.database import Database
+
+STATUSES = ["Создан", "Оплачен", "В обработке", "Доставка по Китаю", "Доставка по РФ", "Завершен", "Отменен"]
+
+
+async def seed(db: Database, users: int, orders: int):
+    await db.create_db_and_tables()
+    user_ids = []
+    for i in range(users):
+        user = await db.add_or_update_user(tg_id=1000 + i, full_name="Тест Тестов", phone_number=f"+7999{i:07}",
+                                           main_address="Москва", unique_code=f"A{i % 999 + 1:03}")
+        user_ids.append(user.id)
+    per_user = orders // users
+    for user_id in user_ids:
+        items = [{'category': 'Одежда', 'size': 'M', 'color': 'нет', 'link': 'https://example.com',
+                  'price': 100.0, 'delivery_method': 'Автоэкспресс', 'total_price': 2250.0}
+                 for _ in range(per_user)]
+        order_ids = await db.add_orders_bulk(user_id, items)
+        for order_id in order_ids[::3]:
+            await db.update_order_status(order_id, random.choice(STATUSES))
+
+
+async def run_load(db: Database, users: int, readers: int, writers: int, seconds: float) -> dict:
+    counters = {'reads': 0, 'writes': 0, 'errors': 0}
+    deadline = time.perf_counter() + seconds
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < 0.5:
+                    await db.get_order_by_id(random.randrange(1, 1000))
+                else:
+                    await db.get_active_orders_by_tg_id(1000 + random.randrange(users))
+                counters['reads'] += 1
+            except Exception:
+                counters['errors'] += 1
+
+    async def writer():
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < 0.5:
+                    await db.add_orders_bulk(random.randrange(1, users + 1), [
+                        {'category': 'Парфюм', 'price': 50.0, 'delivery_method': 'Авиаэкспресс',
+                         'total_price': 4125.0}])
+                else:
+                    await db.update_order_status(random.randrange(1, 1000), random.choice(STATUSES))
+                counters['writes'] += 1
+            except Exception:
+                counters['errors'] += 1
+
+    await asyncio.gather(*[reader() for _ in range(readers)], *[writer() for _ in range(writers)])
+    return {name: value / seconds if name != 'errors' else value for name, value in counters.items()}
+
+
+async def bench(label: str, sqlite_pragmas, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", sqlite_pragmas=sqlite_pragmas)
+        try:
+            await seed(db, args.users, args.orders)
+            result = await run_load(db, args.users, args.readers, args.writers, args.seconds)
+        finally:
+            await db.close()
+    print(f"{label:<10} reads/s: {result['reads']:>9.1f}  writes/s: {result['writes']:>8.1f}  "
+          f"errors: {result['errors']}")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    await bench("default", {}, args)  # без PRAGMA — режим rollback journal
+    await bench("tuned", None, args)  # профиль SQLITE_PRAGMAS из app.config
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Микробенчмарк валидаторов ввода из app/utils/regex.py.
+
+Сравнивает:
+  * check_regex с компиляцией шаблона на каждый вызов (как было) и с предкомпилированным;
+  * вызов валидаторов цены/размера/цвета/ссылки напрямую и через await асинхронной обертки
+    (как они были объявлены раньше);
+  * пачку значений поштучно через await асинхронного валидатора (как было) и через validate_many.
+
+Запуск из корня проекта:
+    python -m benchmarks.validators --number 200000
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from app.utils.regex import (check_regex, validate_price, validate_size, validate_color, validate_link,
+                             validate_full_name, validate_international_phone_number_basic,
+                             normolize_phone_number, validate_many, PHONE_REGEX)
+
+PRICES = ["123.45", "0", "-5", "abc", "999", "17.5"]
+SIZES = ["XS", "52", "нет", "41", "37,5", "M"]
+COLORS = ["Черный", "нет", "white", "Красный", "бежевый", "нет"]
+LINKS = ["https://dw4.co/t/A/1", "http://x.ru", "ftp://bad", "dw4.co", "https://poizon.com/p/2", "bad"]
+NAMES = ["Иван Иванов", "Anna Smith", "Иван123", "", "Петр-Иванов", "Иван   Иванов Иванович"]
+PHONES = ["+7 (900) 123-45-67", "89001234567", "+4917612345678", "12345", "+7-900-000-00-00", "abc"]
+
+
+def legacy_check_regex(regex, string):
+    """check_regex до изменений: шаблон компилируется при каждом вызове."""
+    pattern = re.compile(regex)
+    return bool(pattern.fullmatch(string))
+
+
+def bench(label: str, func, number: int, repeat: int = 3) -> float:
+    """Лучшее время из repeat прогонов (первый прогон прогревает кэши)."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(number)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    print(f"{label:<52}{elapsed / number * 1e9:>10.0f} нс/вызов")
+    return elapsed
+
+
+def run_sync(validator, values):
+    def loop(number):
+        n = len(values)
+        for i in range(number):
+            validator(values[i % n])
+    return loop
+
+
+def run_async(validator, values):
+    async def wrapper(value):
+        return validator(value)
+
+    def loop(number):
+        async def main():
+            n = len(values)
+            for i in range(number):
+                await wrapper(values[i % n])
+        asyncio.run(main())
+    return loop
+
+
+def run_async_batch(validator, batch):
+    """Пачка значений через await асинхронного валидатора по одному (как было)."""
+    async def wrapper(value):
+        return validator(value)
+
+    def loop(number):
+        async def main():
+            return [await wrapper(value) for value in batch]
+        return asyncio.run(main())
+    return loop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200000, help="вызовов на каждый замер")
+    args = parser.parse_args()
+    number = args.number
+
+    print("check_regex:")
+    phones = [normolize_phone_number(phone) for phone in PHONES]
+    bench("  компиляция на каждый вызов (было)", run_sync(lambda s: legacy_check_regex(PHONE_REGEX, s), phones), number)
+    bench("  предкомпилированный шаблон", run_sync(lambda s: check_regex(PHONE_REGEX, s), phones), number)
+
+    print("\nВалидаторы сообщений (sync / через await, как было):")
+    for name, validator, values in (("validate_price", validate_price, PRICES),
+                                    ("validate_size", validate_size, SIZES),
+                                    ("validate_color", validate_color, COLORS),
+                                    ("validate_link", validate_link, LINKS)):
+        sync_time = bench(f"  {name} sync", run_sync(validator, values), number)
+        async_time = bench(f"  {name} await", run_async(validator, values), number)
+        print(f"  {'':<50}x{async_time / sync_time:.1f}")
+
+    print("\nРегистрация:")
+    bench("  validate_full_name", run_sync(validate_full_name, NAMES), number)
+    bench("  normolize + validate phone",
+          run_sync(lambda s: validate_international_phone_number_basic(normolize_phone_number(s)), PHONES), number)
+
+    print("\nПакетная проверка:")
+    batch = (PRICES * (number // len(PRICES) + 1))[:number]
+    await_time = bench("  поштучно через await (было)", run_async_batch(validate_price, batch), number)
+    many_time = bench("  validate_many", lambda n: validate_many(validate_price, batch), number)
+    print(f"  {'':<50}x{await_time / many_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import asyncio
 import logging
+import multiprocessing
 import os
+import signal
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from dotenv import load_dotenv
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
@@ -9,23 +13,102 @@ from aiogram.enums import ParseMode
 from app.handlers import (calculate_order, start, main_menu, user_registration, compile_order, help, 
                           admin, manager)
 from app.database import database
-from app.config import BOT_TOKEN
+from app.config import (BOT_TOKEN, LOG_FILE, CBR_REFRESH_INTERVAL, BOT_RUN_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH,
+                        WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_WORKERS, METRICS_HOST, METRICS_PORT,
+                        FSM_STORAGE, TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST)
 from app.database.database import Database  # Импортируйте класс Database
 from app.database.models import DATABASE_URL  # Импортируйте DATABASE_URL
+from app.database.fsm_storage import create_fsm_storage
 from app.middlewares.database import DatabaseMiddleware
+from app.middlewares.throttling import ThrottlingRequestMiddleware
+from app.middlewares.metrics import MetricsCollector, MetricsMiddleware
+from app.middlewares.logging_context import LoggingContextMiddleware
+from app.utils.currency import CurrencyRateProvider
+from app.utils.background import wait_background_tasks
+from app.utils.outbound import OutboundQueue, RateLimiter
+from app.utils.media import MediaRegistry
+from app.utils.notifier import OrderNotifier
+from app.utils.logging_setup import setup_logging, stop_logging
 
-async def main():
-    if not BOT_TOKEN:
-        exit("Error: No telegram bot token provided")
+async def on_startup(bot: Bot, db: Database, outbox: OutboundQueue, metrics: MetricsCollector,
+                     currency_provider: CurrencyRateProvider, notifier: OrderNotifier, worker_index: int,
+                     workers: int):
+    """Запуск бота (общий для polling и webhook): БД, кэши и фоновые задачи."""
+    # При нескольких процессах таблицы уже создал prepare_database до их запуска
+    if workers == 1:
+        await db.create_db_and_tables() #Убедитесь, что таблицы созданы
+    await db.load_pricing_cache()  # Курсы и цены доставки держим в памяти
+    if worker_index == 0:
+        await db.ensure_order_stats()  # Агрегаты для /stats на базе, созданной до их появления
 
-    db = Database(DATABASE_URL)  # Создаем экземпляр Database
+    # Фоновое обновление курса юаня ЦБ РФ: курс общий (таблица exchange_rates), его обновляет один процесс
+    if CBR_REFRESH_INTERVAL > 0 and worker_index == 0:
+        await currency_provider.start()
+    await outbox.start()
+    await metrics.start()
+    # Уведомления клиентов о смене статуса отправляет один процесс (outbox order_events общий)
+    if worker_index == 0:
+        await notifier.start()
+
+    if BOT_RUN_MODE == "webhook":
+        # Webhook регистрирует только первый процесс, остальные лишь принимают запросы
+        if WEBHOOK_BASE_URL and worker_index == 0:
+            await bot.set_webhook(WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+                                  secret_token=WEBHOOK_SECRET or None)
+    else:
+        await bot.delete_webhook()  # getUpdates не работает, пока установлен webhook
+
+
+async def on_shutdown(dispatcher: Dispatcher, db: Database, outbox: OutboundQueue, metrics: MetricsCollector,
+                      currency_provider: CurrencyRateProvider, notifier: OrderNotifier):
+    """Остановка бота: дописываем отложенную работу до закрытия сессии бота."""
+    await wait_background_tasks()  # Дописываем скриншоты оплаты и т.п.
+    await notifier.stop()
+    await outbox.stop()
+    await currency_provider.stop()
+    await metrics.stop()
+    await dispatcher.storage.close()
+    await db.close()
+
+
+# Ключ коллектора метрик в aiohttp-приложении
+METRICS_APP_KEY = web.AppKey("metrics", MetricsCollector)
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """Проверка живости процесса для обратного прокси / мониторинга."""
+    return web.json_response({"status": "ok", "pid": os.getpid()})
 
-    # Создаем экземпляр Bot с использованием DefaultBotProperties
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher()
 
-    await db.create_db_and_tables() #Убедитесь, что таблицы созданы
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Метрики обработчиков в формате Prometheus."""
+    metrics: MetricsCollector = request.app[METRICS_APP_KEY]
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Worker-Pid": str(os.getpid())})
+
+
+def create_dispatcher(db: Database, bot: Bot, worker_index: int = 0, workers: int = 1) -> Dispatcher:
+    storage = create_fsm_storage(db)  # memory / sqlite / redis (FSM_STORAGE в .env)
+    dp = Dispatcher(storage=storage)
+
+    # Объекты, доступные в обработчиках и хуках запуска/остановки
+    dp["db"] = db
+    outbox = dp["outbox"] = OutboundQueue(bot)  # Очередь исходящих уведомлений
+    dp["notifier"] = OrderNotifier(db, outbox)  # Уведомления клиентов о смене статуса заказа
+    dp["media"] = MediaRegistry(db)  # file_id для img/start.jpg, data/IR1047.xlsx и т.п.
+    dp["currency_provider"] = CurrencyRateProvider(db)
+    dp["worker_index"] = worker_index
+    dp["workers"] = workers
+    # Время обработчиков и SQL-запросы (события движка SQLAlchemy)
+    metrics = dp["metrics"] = MetricsCollector()
+    metrics.instrument_engine(db.engine)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
     # Зарегистрируйте Middleware
+    dp.update.outer_middleware(LoggingContextMiddleware())  # update_id / user_id в записях лога
+    dp.message.middleware(MetricsMiddleware(metrics))
+    dp.callback_query.middleware(MetricsMiddleware(metrics))
     dp.message.middleware(DatabaseMiddleware(db))
     dp.callback_query.middleware(DatabaseMiddleware(db))
 
@@ -38,19 +121,133 @@ async def main():
     dp.include_router(help.router)
     dp.include_router(admin.router)
     dp.include_router(manager.router)
- 
+    return dp
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token: str = WEBHOOK_SECRET) -> web.Application:
+    """aiohttp-приложение режима webhook: POST на WEBHOOK_PATH, /healthz и /metrics."""
+    app = web.Application()
+    app[METRICS_APP_KEY] = dp["metrics"]
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics_handler)
+    # Хуки диспетчера регистрируем раньше обработчика webhook: он при остановке закрывает сессию бота
+    setup_application(app, dp, bot=bot)
+    SimpleRequestHandler(dispatcher=dp, bot=bot,
+                         secret_token=secret_token or None).register(app, path=WEBHOOK_PATH)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Принимает обновления через aiohttp-сервер (POST на WEBHOOK_PATH) вместо long polling."""
+    app = create_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT, reuse_port=WEBHOOK_WORKERS > 1)
+    await site.start()
+    logging.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    # SIGTERM (systemd) и SIGINT останавливают сервер штатно, с хуками остановки
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def start_metrics_server(metrics: MetricsCollector) -> web.AppRunner:
+    """Отдельный HTTP-сервер с /metrics для режима polling."""
+    app = web.Application()
+    app[METRICS_APP_KEY] = metrics
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=METRICS_HOST, port=METRICS_PORT).start()
+    logging.info(f"Metrics server listening on {METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
+
+
+async def main(worker_index: int = 0, workers: int = 1):
+    if not BOT_TOKEN:
+        exit("Error: No telegram bot token provided")
+
+    # Кэши профилей и цен в памяти процесса не видят изменений из других процессов
+    db = Database(DATABASE_URL, local_caches=workers == 1)  # Создаем экземпляр Database
+
+    # Создаем экземпляр Bot с использованием DefaultBotProperties
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Все исходящие запросы проходят через лимиты Telegram и повтор после 429.
+    # Лимиты общие для бота, поэтому делим их между процессами.
+    limiter = RateLimiter(global_rate=TG_GLOBAL_RATE / workers, chat_rate=TG_CHAT_RATE / workers,
+                          chat_burst=max(1.0, TG_CHAT_BURST / workers))
+    bot.session.middleware(ThrottlingRequestMiddleware(limiter))
+    dp = create_dispatcher(db, bot, worker_index, workers)
+
     # Запускаем бота
+    if BOT_RUN_MODE == "webhook":
+        await run_webhook(dp, bot)
+    else:
+        metrics_runner = await start_metrics_server(dp["metrics"]) if METRICS_PORT else None
+        try:
+            await dp.start_polling(bot)
+        finally:
+            if metrics_runner:
+                await metrics_runner.cleanup()
+
+
+def run_worker(worker_index: int, workers: int):
+    # У каждого процесса свой файл лога: ротация одного файла из нескольких процессов небезопасна
+    log_root, log_ext = os.path.splitext(LOG_FILE)
+    setup_logging(log_file=f"{log_root}.worker{worker_index}{log_ext}" if LOG_FILE else LOG_FILE)
+    try:
+        asyncio.run(main(worker_index, workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_logging()
+
+
+async def prepare_database():
+    """Создает таблицы один раз до запуска процессов, чтобы они не делали это одновременно."""
+    db = Database(DATABASE_URL)
     try:
-        await dp.start_polling(bot)
+        await db.create_db_and_tables()
     finally:
-        await bot.session.close()
+        await db.close()
+
+
+def run_webhook_workers(workers: int):
+    # Состояния FSM должны быть общими: следующее обновление пользователя может попасть в другой процесс,
+    # а DatabaseStorage держит записи в памяти своего процесса
+    if FSM_STORAGE != "redis":
+        exit(f"Error: WEBHOOK_WORKERS={workers} requires FSM_STORAGE=redis (got '{FSM_STORAGE}')")
+    asyncio.run(prepare_database())
+    processes = [multiprocessing.Process(target=run_worker, args=(index, workers), name=f"bot-worker-{index}")
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
 
 
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
+    setup_logging()
     try:
-        asyncio.run(main())
+        if BOT_RUN_MODE == "webhook" and WEBHOOK_WORKERS > 1:
+            run_webhook_workers(WEBHOOK_WORKERS)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print('Бот выключен.')
     except Exception as e:
-        logging.error(f"Произошла ошибка при запуске бота: {e}")
+        logging.exception(f"Произошла ошибка при запуске бота: {e}")
+    finally:
+        stop_logging()
@@ -0,0 +1,102 @@
+"""Массовое обновление заказов: разбор номеров и файла трек-номеров, Database.update_orders_bulk."""
+import asyncio
+import datetime
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app.database.database import Database
+from app.utils.bulk_orders import (MAX_BULK_ORDERS, BulkOrdersError, parse_order_ids, parse_tracking_file,
+                                   tracking_from_state, tracking_to_state)
+
+
+def test_parse_order_ids():
+    assert parse_order_ids("101 102, 110-112; 130\n101") == ([101, 102, 110, 111, 112, 130], [])
+    assert parse_order_ids("5 - 7 8–9") == ([5, 6, 7, 8, 9], [])
+    assert parse_order_ids("1 abc 9-3 #4") == ([1], ["abc", "9-3", "#4"])
+    assert parse_order_ids("") == ([], [])
+
+
+def test_parse_order_ids_limits():
+    # Огромный диапазон не разворачивается, остальные номера разбираются
+    assert parse_order_ids("1-300000000 5 7-9") == ([5, 7, 8, 9], ["1-300000000"])
+    assert parse_order_ids(f"1-{MAX_BULK_ORDERS}")[0] == list(range(1, MAX_BULK_ORDERS + 1))
+    with pytest.raises(BulkOrdersError):
+        parse_order_ids(" ".join(str(number) for number in range(1, MAX_BULK_ORDERS + 2)))
+
+
+def test_parse_tracking_csv():
+    content = ("Номер заказа;Трек-номер;Дата доставки\n"
+               "1;TR1;01.11.2026\n"
+               "2;;2026-11-02\n"
+               "3;TR3;\n"
+               "x;TR4;01.11.2026\n"
+               "5;TR5;31.02.2026\n"
+               ";;\n").encode("cp1251")
+    tracking, errors = parse_tracking_file(content, ".csv")
+    assert tracking == {1: ("TR1", datetime.datetime(2026, 11, 1)),
+                        2: (None, datetime.datetime(2026, 11, 2)),
+                        3: ("TR3", None)}
+    assert errors == ["строка 5: номер заказа 'x'", "строка 6: дата '31.02.2026'"]
+    assert tracking_from_state(tracking_to_state(tracking)) == tracking
+
+
+def test_parse_tracking_xlsx():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["order_id", "tracking_number", "estimated_delivery"])
+    sheet.append([7, "TR7", datetime.datetime(2026, 12, 1)])
+    sheet.append([8.0, 12345, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    tracking, errors = parse_tracking_file(buffer.getvalue(), ".xlsx")
+    assert tracking == {7: ("TR7", datetime.datetime(2026, 12, 1)), 8: ("12345", None)}
+    assert errors == []
+
+
+def test_parse_tracking_file_errors():
+    with pytest.raises(BulkOrdersError):
+        parse_tracking_file(b"", ".csv")
+    with pytest.raises(BulkOrdersError):
+        parse_tracking_file("трек\nTR1\n".encode(), ".csv")
+    with pytest.raises(BulkOrdersError):
+        parse_tracking_file(b"not an xlsx", ".xlsx")
+
+
+def test_update_orders_bulk(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'bulk.db'}")
+        try:
+            await db.create_db_and_tables()
+            await db.add_or_update_user(1, "Клиент", "+79000000001", "Москва", "A001")
+            user = await db.get_user_by_tg_id(1)
+            for _ in range(4):
+                await db.add_order(user.id, "Обувь", "42", "черный", "https://dw4.co/t/A/1", 100.0, "Авиа", 1500.0)
+            await db.update_order_status("2", "Отправлен")
+            delivery = datetime.datetime(2026, 11, 1)
+            await db.update_order_tracking_info(4, "T4", delivery)
+
+            results = await db.update_orders_bulk(
+                [1, 2, 99], "Отправлен",
+                {3: ("T3", None), 4: ("T4", delivery), 98: ("T98", None)})
+            assert results == {1: "updated", 2: "unchanged", 3: "updated", 4: "unchanged",
+                               98: "not_found", 99: "not_found"}
+
+            orders = {order.id: order for order in await db.get_orders_by_user_code("A001")}
+            assert orders[1].status == "Отправлен"
+            # Заказ только из tracking получает трек-номер, но не новый статус
+            assert (orders[3].status, orders[3].tracking_number) == ("Создан", "T3")
+            assert orders[4].tracking_number == "T4" and orders[4].estimated_delivery == delivery
+
+            # События — только для реально смененных статусов (заказы 2 и 1)
+            events = await db.get_pending_order_events(10)
+            assert [(event.order_id, event.old_status, event.new_status) for event, _, _ in events] == \
+                [(2, "Создан", "Отправлен"), (1, "Создан", "Отправлен")]
+            assert await db.rebuild_order_stats() == []
+
+            assert await db.update_orders_bulk([], None, {}) == {}
+        finally:
+            await db.close()
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+"""fetch_currency_cny и CurrencyRateProvider против локальной заглушки сервиса ЦБ (aiohttp)."""
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from app.database.database import Database
+from app.utils.currency import CurrencyRateProvider, fetch_currency_cny
+
+DAILY = {"Date": "2026-10-18T11:30:00+03:00", "Valute": {
+    "USD": {"CharCode": "USD", "Nominal": 1, "Value": 92.5},
+    "CNY": {"CharCode": "CNY", "Nominal": 10, "Value": 128.4},
+}}
+
+
+async def _daily(request: web.Request) -> web.Response:
+    # Как настоящий сервис: JSON с content-type application/javascript
+    return web.Response(text=json.dumps(DAILY), content_type="application/javascript")
+
+
+async def _no_cny(request: web.Request) -> web.Response:
+    return web.json_response({"Valute": {"USD": DAILY["Valute"]["USD"]}})
+
+
+async def _error(request: web.Request) -> web.Response:
+    return web.Response(status=503, text="Service Unavailable")
+
+
+async def _broken(request: web.Request) -> web.Response:
+    return web.Response(text="<html>not json</html>", content_type="text/html")
+
+
+async def _slow(request: web.Request) -> web.Response:
+    await asyncio.sleep(2)
+    return await _daily(request)
+
+
+def _with_stub(scenario):
+    async def run():
+        app = web.Application()
+        for path, handler in (("/daily", _daily), ("/no_cny", _no_cny), ("/error", _error),
+                              ("/broken", _broken), ("/slow", _slow)):
+            app.router.add_get(path, handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                await scenario(session, base_url)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_fetch_rate_per_one_yuan():
+    async def scenario(session, base_url):
+        assert await fetch_currency_cny(session, f"{base_url}/daily") == pytest.approx(12.84)
+
+    _with_stub(scenario)
+
+
+def test_fetch_errors():
+    async def scenario(session, base_url):
+        assert await fetch_currency_cny(session, f"{base_url}/no_cny") is None
+        assert await fetch_currency_cny(session, f"{base_url}/error") is None
+        with pytest.raises(ValueError):
+            await fetch_currency_cny(session, f"{base_url}/broken")
+        with pytest.raises(asyncio.TimeoutError):
+            await fetch_currency_cny(session, f"{base_url}/slow", timeout=0.2)
+
+    _with_stub(scenario)
+
+
+def test_provider_updates_pricing_rate(tmp_path):
+    async def scenario(session, base_url):
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'rates.db'}")
+        await db.create_db_and_tables()
+        await db.add_or_update_exchange_rate("cny_to_rub", 13.5)
+        try:
+            # Ошибка сети не трогает сохраненный курс
+            failing = CurrencyRateProvider(db, url=f"{base_url}/slow", timeout=0.2)
+            assert await failing.refresh() is None
+            await failing.stop()
+            assert await db.get_exchange_rate("cny_to_rub") == 13.5
+
+            provider = CurrencyRateProvider(db, url=f"{base_url}/daily")
+            assert await provider.refresh() == pytest.approx(12.84)
+            await provider.stop()
+            # Курс ЦБ попадает в тот курс, по которому считаются цены
+            assert await db.get_exchange_rate("cny_to_rub") == pytest.approx(12.84)
+            assert provider.rate == pytest.approx(12.84)
+        finally:
+            await db.close()
+
+    _with_stub(scenario)
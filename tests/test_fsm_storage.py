@@ -0,0 +1,68 @@
+"""DatabaseStorage: вытеснение записей из памяти на временной базе SQLite."""
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app.database.database import Database
+from app.database.fsm_storage import DatabaseStorage
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_records_are_bounded_and_reloaded(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'fsm.db'}")
+        await db.create_db_and_tables()
+        storage = DatabaseStorage(db, flush_delay=60, max_records=5)
+        try:
+            for user_id in range(20):
+                await storage.set_state(_key(user_id), f"Order:step{user_id}")
+                await storage.set_data(_key(user_id), {"cart": [user_id]})
+            # Несохраненные изменения не вытесняются
+            assert len(storage._records) == 20
+
+            await storage.flush()
+            assert len(storage._records) == 5
+
+            # Вытесненная запись читается из БД, недавние остаются в памяти
+            assert await storage.get_state(_key(0)) == "Order:step0"
+            assert await storage.get_data(_key(0)) == {"cart": [0]}
+            assert await storage.get_data(_key(19)) == {"cart": [19]}
+            assert len(storage._records) == 5
+
+            # Чтение новых ключей тоже не раздувает память
+            for user_id in range(100, 120):
+                assert await storage.get_state(_key(user_id)) is None
+            assert len(storage._records) == 5
+        finally:
+            await storage.close()
+            await db.close()
+
+    asyncio.run(run())
+
+
+def test_clearing_state_removes_record(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'fsm.db'}")
+        await db.create_db_and_tables()
+        storage = DatabaseStorage(db, flush_delay=60, max_records=1)
+        try:
+            await storage.set_state(_key(1), "Order:step1")
+            await storage.set_data(_key(1), {"cart": [1]})
+            await storage.flush()
+            await storage.set_state(_key(1), None)
+            await storage.set_data(_key(1), {})
+            await storage.get_state(_key(2))  # Вытесняет запись 1 из памяти только после записи в БД
+            await storage.flush()
+            await storage.get_state(_key(3))
+
+            restarted = DatabaseStorage(db, flush_delay=60, max_records=1)
+            assert await restarted.get_state(_key(1)) is None
+            assert await restarted.get_data(_key(1)) == {}
+        finally:
+            await storage.close()
+            await db.close()
+
+    asyncio.run(run())
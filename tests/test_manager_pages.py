@@ -0,0 +1,30 @@
+"""Страница заказов менеджера укладывается в одно сообщение Telegram."""
+from app.database.models import Order, User
+from app.handlers.manager import format_orders_page
+from app.utils.outbound import MESSAGE_LIMIT
+
+
+def _order(order_id: int, address: str) -> Order:
+    return Order(id=order_id, user=User(unique_code=f"A{order_id:03}", main_address=address))
+
+
+def test_page_stops_at_message_limit():
+    orders = [_order(order_id, "Москва, " + "очень длинный адрес " * 20) for order_id in range(1, 21)]
+    text, shown = format_orders_page("Создан", orders)
+    assert len(text) <= MESSAGE_LIMIT
+    assert 0 < len(shown) < len(orders)
+    assert shown == orders[:len(shown)]
+    assert f"Код заказа: {shown[-1].id}\n" in text
+    assert f"Код заказа: {orders[len(shown)].id}\n" not in text
+
+
+def test_short_page_is_shown_whole():
+    orders = [_order(order_id, "Москва") for order_id in range(1, 21)]
+    text, shown = format_orders_page("Создан", orders)
+    assert shown == orders
+    assert text.count("Код заказа:") == 20
+
+
+def test_single_huge_order_is_truncated():
+    text, shown = format_orders_page("Создан", [_order(1, "х" * 5000)])
+    assert len(shown) == 1 and len(text) == MESSAGE_LIMIT
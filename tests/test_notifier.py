@@ -0,0 +1,134 @@
+"""Outbox order_events, EventBus и OrderNotifier на временной базе SQLite с фейковым ботом."""
+import asyncio
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+
+from app.database.database import Database
+from app.utils.events import EventBus, OrderStatusChanged
+from app.utils.notifier import OrderNotifier
+from app.utils.outbound import OutboundQueue
+
+DOWN_CHAT = 2
+BLOCKED_CHAT = 3
+
+
+class FakeBot:
+    """send_message: DOWN_CHAT — сетевая ошибка (пока down), BLOCKED_CHAT — бот заблокирован."""
+
+    def __init__(self):
+        self.sent = []
+        self.down = True
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id == DOWN_CHAT and self.down:
+            raise TelegramNetworkError(method=None, message="connection reset")
+        if chat_id == BLOCKED_CHAT:
+            raise TelegramForbiddenError(method=None, message="Forbidden: bot was blocked by the user")
+        self.sent.append((chat_id, text))
+
+
+def _run(tmp_path, scenario, **notifier_options):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'notify.db'}")
+        await db.create_db_and_tables()
+        bot = FakeBot()
+        outbox = OutboundQueue(bot)
+        await outbox.start()
+        try:
+            await scenario(db, bot, OrderNotifier(db, outbox, **notifier_options))
+        finally:
+            await outbox.stop()
+            await db.close()
+
+    asyncio.run(run())
+
+
+async def _orders(db: Database, tg_id: int, count: int):
+    await db.add_or_update_user(tg_id, f"Клиент {tg_id}", f"+7900000000{tg_id}", "Москва", f"A00{tg_id}")
+    user = await db.get_user_by_tg_id(tg_id)
+    return [(await db.add_order(user.id, "Обувь", "42", "черный", "https://dw4.co/t/A/1", 100.0, "Авиа",
+                                1500.0)).id for _ in range(count)]
+
+
+async def _pending_chats(db: Database):
+    return sorted({tg_id for _, _, tg_id in await db.get_pending_order_events(100)})
+
+
+def test_event_bus():
+    bus = EventBus()
+    received = []
+
+    def broken(event):
+        raise RuntimeError("subscriber failed")
+
+    bus.subscribe(OrderStatusChanged, broken)
+    bus.subscribe(OrderStatusChanged, received.append)
+    event = OrderStatusChanged(1, 10, "Создан", "Оплачен")
+    bus.publish(event)  # Ошибка одного подписчика не мешает остальным
+    bus.publish("другое событие")
+    bus.unsubscribe(OrderStatusChanged, received.append)
+    bus.publish(event)
+    assert received == [event]
+
+
+def test_status_change_writes_outbox_and_publishes(tmp_path):
+    async def scenario(db, bot, notifier):
+        order_id, = await _orders(db, 1, 1)
+        published = []
+        db.events.subscribe(OrderStatusChanged, published.append)
+        assert await db.update_order_status(str(order_id), "Оплачен")
+        assert await db.update_order_status(str(order_id), "Оплачен")  # Тот же статус — без события
+        events = await db.get_pending_order_events(10)
+        assert [(event.order_id, event.old_status, event.new_status) for event, _, _ in events] == \
+            [(order_id, "Создан", "Оплачен")]
+        assert [(item.event_id, item.new_status) for item in published] == [(events[0][0].id, "Оплачен")]
+
+    _run(tmp_path, scenario)
+
+
+def test_marks_sent_only_delivered_and_final(tmp_path):
+    async def scenario(db, bot, notifier):
+        for tg_id in (1, DOWN_CHAT, BLOCKED_CHAT):
+            order_id, = await _orders(db, tg_id, 1)
+            await db.update_order_status(str(order_id), "Оплачен")
+
+        assert await notifier.flush() == 3
+        assert [chat_id for chat_id, _ in bot.sent] == [1]
+        assert "Оплачен" in bot.sent[0][1]
+        # Заблокировавший бота клиент отмечен (повтор не поможет), сетевая ошибка — нет
+        assert await _pending_chats(db) == [DOWN_CHAT]
+
+    _run(tmp_path, scenario)
+
+
+def test_retry_after_backoff(tmp_path):
+    async def scenario(db, bot, notifier):
+        order_id, = await _orders(db, DOWN_CHAT, 1)
+        await db.update_order_status(str(order_id), "Оплачен")
+
+        assert await notifier.flush() == 1
+        bot.down = False
+        assert await notifier.flush() == 0  # Повтор отложен
+        await asyncio.sleep(0.25)
+        assert await notifier.flush() == 1
+        assert [chat_id for chat_id, _ in bot.sent] == [DOWN_CHAT]
+        assert await _pending_chats(db) == []
+
+    _run(tmp_path, scenario, retry_delay=0.2)
+
+
+def test_failing_chat_does_not_block_others(tmp_path):
+    async def scenario(db, bot, notifier):
+        # У недоступного клиента событий больше, чем помещается в пачку, и они старше
+        for order_id in await _orders(db, DOWN_CHAT, 5):
+            await db.update_order_status(str(order_id), "Оплачен")
+        order_id, = await _orders(db, 1, 1)
+        await db.update_order_status(str(order_id), "Оплачен")
+
+        assert await notifier.flush() == 3
+        assert bot.sent == []
+        assert await notifier.flush() == 1
+        assert [chat_id for chat_id, _ in bot.sent] == [1]
+        assert await _pending_chats(db) == [DOWN_CHAT]
+
+    _run(tmp_path, scenario, batch_size=3, retry_delay=60)
@@ -0,0 +1,99 @@
+"""Инкрементальные агрегаты order_stats против пересчета compute_order_stats (SQLite)."""
+import asyncio
+import datetime
+import random
+
+from app.database.database import Database
+from app.utils.order_stats import (CANCELLED_STATUS, NO_KEY, compute_order_stats, diff_order_stats,
+                                   order_stat_deltas)
+
+STATUSES = ["Создан", "Оплачен", "В обработке", "Отправлен", "Завершен", CANCELLED_STATUS]
+CATEGORIES = ["Обувь", "Одежда", None]
+
+
+def _apply(stats, deltas):
+    for key, (orders, revenue) in deltas.items():
+        old = stats.get(key, (0, 0.0))
+        stats[key] = (old[0] + orders, old[1] + revenue)
+    return {key: value for key, value in stats.items() if value[0] or abs(value[1]) > 0.001}
+
+
+def test_deltas_match_recompute():
+    rng = random.Random(7)
+    day = datetime.datetime(2026, 10, 1)
+    orders = {}  # id -> [status, total_price, order_date, category]
+    stats = {}
+    for step in range(500):
+        if not orders or rng.random() < 0.3:
+            order = ["Создан", rng.choice([None, 999.5, 1500.0]), rng.choice([None, day, day.replace(day=2)]),
+                     rng.choice(CATEGORIES)]
+            orders[step] = order
+            stats = _apply(stats, order_stat_deltas([(None, *order)]))
+        else:
+            order = orders[rng.choice(list(orders))]
+            new_status = rng.choice(STATUSES)
+            stats = _apply(stats, order_stat_deltas([(order[0], new_status, *order[1:])]))
+            order[0] = new_status
+
+    rebuilt = compute_order_stats([tuple(order) for order in orders.values()])
+    assert diff_order_stats(stats, rebuilt) == []
+    assert ("category", NO_KEY) in rebuilt and ("day", NO_KEY) in rebuilt
+
+
+def _seed_user(db: Database, tg_id: int):
+    return db.add_or_update_user(tg_id, f"Клиент {tg_id}", f"+7900000{tg_id:04}", "Москва", f"A{tg_id:03}")
+
+
+def test_database_increments_match_rebuild(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+        try:
+            await db.create_db_and_tables()
+            rng = random.Random(11)
+            order_ids = []
+            for tg_id in range(1, 4):
+                await _seed_user(db, tg_id)
+                user = await db.get_user_by_tg_id(tg_id)
+                for _ in range(5):
+                    order = await db.add_order(user.id, rng.choice(["Обувь", "Одежда"]), "42", "черный",
+                                               "https://dw4.co/t/A/1", 100.0, "Авиа", rng.choice([1200.0, 2300.5]))
+                    order_ids.append(order.id)
+            await db.save_payment_screenshots(order_ids[:3], "pay_screens/1.jpg")
+            await db.mark_latest_unpaid_order_paid(2, "pay_screens/2.jpg")
+            for order_id in order_ids[5:12]:
+                await db.update_order_status(str(order_id), rng.choice(STATUSES))
+            await db.update_orders_bulk(order_ids[8:], CANCELLED_STATUS)
+            await db.update_orders_bulk(order_ids[10:13], "В обработке")
+
+            assert await db.rebuild_order_stats() == []
+            stats = await db.get_order_stats()
+            assert sum(orders for (kind, _), (orders, _) in stats.items() if kind == "status") == 15
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+
+def test_rebuild_does_not_lose_concurrent_increments(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+        try:
+            await db.create_db_and_tables()
+            await _seed_user(db, 1)
+            user = await db.get_user_by_tg_id(1)
+            order_ids = [(await db.add_order(user.id, "Обувь", "42", "черный", "https://dw4.co/t/A/1", 100.0,
+                                             "Авиа", 1000.0)).id for _ in range(200)]
+
+            async def change_statuses():
+                for order_id in order_ids[:40]:
+                    await db.update_order_status(str(order_id), "Оплачен")
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(db.rebuild_order_stats(), change_statuses(), db.rebuild_order_stats())
+            assert await db.rebuild_order_stats() == []
+            stats = await db.get_order_stats()
+            assert stats[("status", "Оплачен")] == (40, 40000.0)
+        finally:
+            await db.close()
+
+    asyncio.run(run())
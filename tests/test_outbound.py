@@ -0,0 +1,140 @@
+"""OutboundQueue и ThrottlingRequestMiddleware против фейкового сервера Bot API (aiohttp)."""
+import asyncio
+import time
+from collections import defaultdict
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramForbiddenError
+from aiohttp import web
+
+from app.middlewares.throttling import ThrottlingRequestMiddleware
+from app.utils.outbound import OutboundQueue, RateLimiter, chat_key
+
+TOKEN = "42:TEST"
+BLOCKED_CHAT = 403
+FLOODED_CHAT = 429
+
+
+class FakeBotApi:
+    """sendMessage с задержкой; чат FLOODED_CHAT первый раз получает 429, BLOCKED_CHAT — 403."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.messages = defaultdict(list)  # chat_id -> тексты в порядке получения
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+        self.flooded = False
+        self.sent_at = []
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        if chat_id == BLOCKED_CHAT:
+            return web.json_response({"ok": False, "error_code": 403,
+                                      "description": "Forbidden: bot was blocked by the user"}, status=403)
+        if chat_id == FLOODED_CHAT and not self.flooded:
+            self.flooded = True
+            return web.json_response({"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                      "parameters": {"retry_after": 1}}, status=429)
+        self.in_flight[chat_id] += 1
+        self.max_in_flight[chat_id] = max(self.max_in_flight[chat_id], self.in_flight[chat_id])
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight[chat_id] -= 1
+        self.messages[chat_id].append(data["text"])
+        self.sent_at.append(time.monotonic())
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(self.sent_at), "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "text": data["text"]}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def _run_with_api(scenario, limiter: RateLimiter = None):
+    async def run():
+        api = FakeBotApi()
+        await api.start()
+        bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+        bot.session.middleware(ThrottlingRequestMiddleware(limiter or RateLimiter(1000, 1000, 1000)))
+        outbox = OutboundQueue(bot, workers=4)
+        await outbox.start()
+        try:
+            await scenario(api, outbox)
+        finally:
+            await outbox.stop()
+            await bot.session.close()
+            await api.stop()
+
+    asyncio.run(run())
+
+
+def test_messages_to_one_chat_keep_order():
+    async def scenario(api: FakeBotApi, outbox: OutboundQueue):
+        first = outbox.enqueue(1, "1")
+        await asyncio.sleep(api.latency / 2)  # Первое сообщение уже отправляется
+        later = [outbox.enqueue(1, str(number)) for number in range(2, 6)]
+        others = [outbox.enqueue(chat_id, "x") for chat_id in range(2, 6)]
+        assert await asyncio.gather(first, *later, *others) == [True] * 9
+
+        # Сообщения, поставленные во время отправки, склеены и пришли после первого
+        assert api.messages[1] == ["1", "2\n\n3\n\n4\n\n5"]
+        assert api.max_in_flight[1] == 1
+        assert all(api.messages[chat_id] == ["x"] for chat_id in range(2, 6))
+
+    _run_with_api(scenario)
+
+
+def test_send_results_and_retry_after():
+    async def scenario(api: FakeBotApi, outbox: OutboundQueue):
+        flooded = outbox.enqueue(FLOODED_CHAT, "после паузы")
+        blocked = outbox.enqueue(BLOCKED_CHAT, "не дойдет")
+        assert await flooded is True
+        assert api.messages[FLOODED_CHAT] == ["после паузы"]
+        with pytest.raises(TelegramForbiddenError):
+            await blocked
+
+    _run_with_api(scenario)
+
+
+def test_global_rate_limit():
+    async def scenario(api: FakeBotApi, outbox: OutboundQueue):
+        api.latency = 0
+        await asyncio.gather(*(outbox.enqueue(chat_id, "x") for chat_id in range(40)))
+        # 20 сообщений в запасе общей корзины, остальные 20 — со скоростью 20 в секунду
+        assert api.sent_at[-1] - api.sent_at[0] >= 0.9
+
+    _run_with_api(scenario, RateLimiter(global_rate=20, chat_rate=1, chat_burst=1))
+
+
+def test_chat_id_as_string_and_int_is_one_chat():
+    assert chat_key("123") == chat_key(123) == 123
+    assert chat_key("-100200") == -100200
+    assert chat_key("@channel") == "@channel"
+
+    limiter = RateLimiter(global_rate=1000, chat_rate=1, chat_burst=1)
+    assert limiter._chat_bucket("7") is limiter._chat_bucket(7)
+
+    async def scenario(api: FakeBotApi, outbox: OutboundQueue):
+        # MANAGER_TELEGRAM_ID приходит строкой, ответы обработчиков — числом: одна очередь и одно сообщение
+        deliveries = [outbox.enqueue("8", "a"), outbox.enqueue(8, "b")]
+        assert await asyncio.gather(*deliveries) == [True, True]
+        assert api.messages[8] == ["a\n\nb"]
+
+    _run_with_api(scenario)
@@ -0,0 +1,124 @@
+"""Импорт прайса: разбор JSON/CSV/XLSX и Database.apply_price_list (временная база SQLite)."""
+import asyncio
+import io
+import json
+
+import pytest
+from openpyxl import Workbook
+
+from app.database.database import Database
+from app.utils.price_import import (PriceImportError, format_import_report, parse_json, parse_price_file,
+                                    price_file_type)
+
+PRICE_JSON = {
+    "exchange_rate": {"cny_to_rub": 13.1},
+    "delivery_types": {"Авиаэкспресс": {"Обувь": 1500, "Одежда": 0}, "Автоэкспресс": {"Обувь": "900"}},
+    "payment_details": {"phone_number": "+79000000000", "card_number": "0000", "FIO": "Тест"},
+}
+
+
+def test_price_file_type():
+    assert price_file_type("prices.XLSX", None) == ".xlsx"
+    assert price_file_type("prices", "text/csv") == ".csv"
+    assert price_file_type("prices.txt", "text/plain") is None
+
+
+def test_parse_json():
+    price_list = parse_json(json.dumps(PRICE_JSON).encode("utf-8-sig"))
+    assert price_list.exchange_rates == {"cny_to_rub": 13.1}
+    assert price_list.delivery_prices == {("Обувь", "Авиаэкспресс"): 1500.0, ("Одежда", "Авиаэкспресс"): 0.0,
+                                          ("Обувь", "Автоэкспресс"): 900.0}
+    assert price_list.payment_details == PRICE_JSON["payment_details"]
+    assert price_list.errors == []
+
+
+def test_parse_json_invalid_values():
+    price_list = parse_json(json.dumps({"exchange_rate": {"cny_to_rub": 0, "usd": "abc"},
+                                        "delivery_types": {"Авиа": {"Обувь": -5, "Одежда": 100}}}).encode())
+    assert price_list.delivery_prices == {("Одежда", "Авиа"): 100.0}
+    assert price_list.exchange_rates == {}
+    assert sorted(price_list.errors, key=repr) == [("cny_to_rub", "price", 0), ("usd", "price", "abc"),
+                                                   ("Авиа / Обувь", "price", -5)]
+
+
+@pytest.mark.parametrize("content, message", [
+    ("{not json", "Некорректный JSON"),
+    ("[1, 2]", "Ожидается JSON-объект"),
+    ('{"exchange_rate": [13.1]}', "«exchange_rate»"),
+    ('{"delivery_types": "Авиа"}', "«delivery_types»"),
+    ('{"delivery_types": {"Авиа": [1500]}}', "«delivery_types.Авиа»"),
+    ('{"payment_details": "card"}', "«payment_details»"),
+])
+def test_parse_json_structure_errors(content, message):
+    with pytest.raises(PriceImportError, match=message):
+        parse_json(content.encode())
+
+
+def test_parse_csv():
+    content = ("Способ доставки;Категория;Цена\n"
+               "exchange_rate;cny_to_rub;13,1\n"
+               "Авиаэкспресс;Обувь;1500\n"
+               "Авиаэкспресс;Одежда;abc\n"
+               ";Парфюм;100\n"
+               "Автоэкспресс;Обувь;1 000\n"
+               "Авиаэкспресс;Обувь;1600\n"
+               ";;\n").encode("cp1251")
+    price_list = parse_price_file(content, ".csv")
+    assert price_list.exchange_rates == {"cny_to_rub": 13.1}
+    # При повторе пары побеждает последняя строка
+    assert price_list.delivery_prices == {("Обувь", "Авиаэкспресс"): 1600.0}
+    assert [(label, field) for label, field, _ in price_list.errors] == \
+        [("строка 4", "price"), ("строка 5", "delivery_type"), ("строка 6", "price")]
+
+
+def test_parse_csv_missing_columns():
+    with pytest.raises(PriceImportError, match="price"):
+        parse_price_file(b"delivery_type,category\n", ".csv")
+    with pytest.raises(PriceImportError):
+        parse_price_file(b"", ".csv")
+
+
+def test_parse_xlsx():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["delivery_type", "category", "price"])
+    sheet.append(["exchange_rate", "cny_to_rub", 12.9])
+    sheet.append(["Авиаэкспресс", "Обувь", 1500])
+    sheet.append([None, None, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    price_list = parse_price_file(buffer.getvalue(), ".xlsx")
+    assert price_list.exchange_rates == {"cny_to_rub": 12.9}
+    assert price_list.delivery_prices == {("Обувь", "Авиаэкспресс"): 1500.0}
+    with pytest.raises(PriceImportError):
+        parse_price_file(b"not an xlsx", ".xlsx")
+
+
+def test_apply_price_list_diff(tmp_path):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'prices.db'}")
+        try:
+            await db.create_db_and_tables()
+            await db.add_or_update_exchange_rate("cny_to_rub", 13.0)
+            await db.add_or_update_delivery_price("Обувь", "Авиа", 1500.0)
+            await db.add_or_update_delivery_price("Одежда", "Авиа", 800.0)
+
+            rates = {"cny_to_rub": 13.5, "usd_to_rub": 92.0}
+            prices = {("Обувь", "Авиа"): 1500.0, ("Одежда", "Авиа"): 900.0, ("Парфюм", "Авто"): 300.0}
+            diff = await db.apply_price_list(rates, prices)
+            assert sorted(diff["added"]) == [("usd_to_rub", 92.0), ("Авто / Парфюм", 300.0)]
+            assert sorted(diff["changed"]) == [("cny_to_rub", 13.0, 13.5), ("Авиа / Одежда", 800.0, 900.0)]
+            assert diff["unchanged"] == 1
+            # Кэш цен перечитан
+            assert await db.get_exchange_rate("cny_to_rub") == 13.5
+            assert await db.get_delivery_price("Парфюм", "Авто") == 300.0
+
+            # Повторный импорт ничего не меняет
+            assert await db.apply_price_list(rates, prices) == {"added": [], "changed": [], "unchanged": 5}
+            report = format_import_report(diff, [("строка 4", "price", "abc")])
+            assert report.startswith("Добавлено: 2, изменено: 2, без изменений: 1")
+            assert "! строка 4: price = 'abc'" in report
+        finally:
+            await db.close()
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+"""
+Планы горячих запросов бота (SQLite EXPLAIN QUERY PLAN).
+
+Запросы перехватываются на движке во время вызова настоящих методов Database,
+поэтому тест падает, если запрос или индексы разойдутся и поиск превратится в
+полный просмотр таблицы orders или users.
+"""
+import asyncio
+import re
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from app.database.database import Database
+
+SCAN_RE = re.compile(r"\bSCAN (TABLE )?(orders|users)(_\d+)?\b")
+SEARCH_INDEX_RE = re.compile(r"\bSEARCH (TABLE )?\w+( AS \w+)? USING (COVERING )?INDEX\b")
+
+
+async def _seed(db: Database):
+    await db.create_db_and_tables()
+    for number in range(1, 4):
+        await db.add_or_update_user(number, f"Клиент {number}", f"+7900000000{number}", "Москва", f"A00{number}")
+        user = await db.get_user_by_tg_id(number)
+        for _ in range(3):
+            await db.add_order(user.id, "Обувь", "42", "черный", "https://dw4.co/t/A/1", 100.0, "Авиа", 1500.0)
+    db.user_cache.clear()
+
+
+async def _capture(db: Database, call):
+    """Выполняет вызов и возвращает SELECT-запросы (SQL, параметры), отправленные в БД."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await call(db)
+    finally:
+        event.remove(db.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def _query_plans(path, call):
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{path}")
+        try:
+            await _seed(db)
+            return await _capture(db, call)
+        finally:
+            await db.close()
+
+    statements = asyncio.run(run())
+    assert statements, "метод не выполнил ни одного SELECT"
+    with sqlite3.connect(path) as conn:
+        return [[row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                for statement, parameters in statements]
+
+
+@pytest.mark.parametrize("call", [
+    pytest.param(lambda db: db.get_user_by_tg_id(2), id="get_user_by_tg_id"),
+    pytest.param(lambda db: db.get_orders_by_status("Создан"), id="get_orders_by_status"),
+    pytest.param(lambda db: db.get_active_orders_by_tg_id(2), id="get_active_orders_by_tg_id"),
+    pytest.param(lambda db: db.get_orders_by_user_code("A002"), id="get_orders_by_user_code"),
+])
+def test_hot_queries_use_indexes(tmp_path, call):
+    for plan in _query_plans(tmp_path / "plans.db", call):
+        details = "\n".join(plan)
+        assert any(SEARCH_INDEX_RE.search(line) for line in plan), details
+        assert not any(SCAN_RE.search(line) for line in plan), details
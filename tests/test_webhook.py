@@ -0,0 +1,90 @@
+"""Режим webhook локально: синтетическое обновление POST-запросом в aiohttp-приложение бота."""
+import asyncio
+import datetime
+import itertools
+import time
+from collections import Counter
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendPhoto, TelegramMethod
+from aiogram.types import Chat, Message, PhotoSize
+from aiohttp.test_utils import TestClient, TestServer
+
+import bot as bot_module
+from app.config import WEBHOOK_PATH
+from app.database.database import Database
+
+SECRET = "local-secret"
+USER_ID = 555000111
+
+
+class RecordingSession(BaseSession):
+    """Сессия Bot API без сети: запоминает вызовы (метод, chat_id)."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        self.calls[(type(method).__name__, chat_id)] += 1
+        if chat_id is None:
+            return True
+        message_id = next(self._message_ids)
+        photo = [PhotoSize(file_id=f"photo_{message_id}", file_unique_id=f"photo_{message_id}",
+                           width=1, height=1)] if isinstance(method, SendPhoto) else None
+        return Message(message_id=message_id, date=datetime.datetime.now(), chat=Chat(id=int(chat_id), type="private"),
+                       text=getattr(method, "text", None), photo=photo)
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def _start_update(update_id: int) -> dict:
+    user = {"id": USER_ID, "is_bot": False, "first_name": "Webhook"}
+    return {"update_id": update_id, "message": {
+        "message_id": 1, "date": int(time.time()), "chat": {"id": USER_ID, "type": "private"}, "from": user,
+        "text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}}
+
+
+def test_webhook_accepts_update_and_healthz(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_module, "CBR_REFRESH_INTERVAL", 0)  # Без запросов к ЦБ
+
+    async def run():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'webhook.db'}")
+        session = RecordingSession()
+        bot = Bot("42:WEBHOOK", session=session)
+        dp = bot_module.create_dispatcher(db, bot)
+        client = TestClient(TestServer(bot_module.create_webhook_app(dp, bot, secret_token=SECRET)))
+        await client.start_server()  # Хуки запуска диспетчера: таблицы, кэши, фоновые задачи
+        try:
+            response = await client.get("/healthz")
+            assert response.status == 200
+            assert (await response.json())["status"] == "ok"
+
+            # Без секретного заголовка Telegram обновление не принимается
+            response = await client.post(WEBHOOK_PATH, json=_start_update(1))
+            assert response.status == 401
+
+            response = await client.post(WEBHOOK_PATH, json=_start_update(2),
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            assert response.status == 200
+            # Обновление обрабатывается в фоне: ждем приветствие
+            for _ in range(100):
+                if session.calls[("SendPhoto", USER_ID)]:
+                    break
+                await asyncio.sleep(0.05)
+            assert session.calls[("SendPhoto", USER_ID)] == 1
+
+            response = await client.get("/metrics")
+            assert response.status == 200
+        finally:
+            await client.close()  # Хуки остановки закрывают БД
+
+    asyncio.run(run())